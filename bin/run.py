@@ -15,6 +15,8 @@ PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 os.chdir(PROJECT_ROOT)
 
+from bin.serve import build_server_command
+
 def main():
     """Inicia todo el sistema."""
     print("⚖️  Chat FJ - Facilitadoras y Facilitadores Judiciales")
@@ -28,8 +30,7 @@ def main():
         # Iniciar API (sin capturar output para evitar buffer lleno)
         print("📡 Iniciando API en puerto 8000...")
         api_process = subprocess.Popen(
-            [sys.executable, "-m", "uvicorn", "src.api:app", 
-             "--host", "0.0.0.0", "--port", "8000"],
+            build_server_command(),
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL
         )
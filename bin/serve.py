@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Sistema de Facilitadores Judiciales - Servidor API (uno o varios procesos)
+
+API_WORKERS=1  -> un solo proceso uvicorn (comportamiento original)
+API_WORKERS>1  -> gunicorn con preload: el modelo de embeddings se carga una vez
+                  en el proceso maestro y los workers lo comparten por copy-on-write.
+                  En Windows (sin fork) se usa uvicorn --workers, cada worker carga su copia.
+"""
+import os
+import sys
+import subprocess
+import importlib.util
+from pathlib import Path
+from typing import List
+
+from dotenv import load_dotenv
+
+# Configurar path
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# Misma configuración que usa la API (API_WORKERS puede venir de config.env)
+load_dotenv(PROJECT_ROOT / "config" / "config.env")
+load_dotenv()
+
+HOST = "0.0.0.0"
+PORT = "8000"
+
+
+def build_server_command() -> List[str]:
+    """Arma el comando para levantar la API según API_WORKERS."""
+    workers = max(1, int(os.getenv("API_WORKERS", "1")))
+    if workers > 1:
+        # El cache de respuestas ya se comparte vía SQLite; el rate limiting también debe compartirse
+        os.environ.setdefault("RATE_LIMIT_DB_PATH", str(PROJECT_ROOT / "data" / "cache" / "rate_limits.sqlite3"))
+
+    if workers > 1 and os.name != "nt" and importlib.util.find_spec("gunicorn"):
+        return [
+            sys.executable, "-m", "gunicorn", "src.api:app",
+            "--config", str(PROJECT_ROOT / "config" / "gunicorn.conf.py"),
+            "--workers", str(workers),
+            "--bind", f"{HOST}:{PORT}"
+        ]
+
+    command = [sys.executable, "-m", "uvicorn", "src.api:app", "--host", HOST, "--port", PORT]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    return command
+
+
+def main():
+    """Inicia solo el servidor API."""
+    os.chdir(PROJECT_ROOT)
+    command = build_server_command()
+    print(f"🚀 Iniciando API: {' '.join(command[1:])}")
+    sys.exit(subprocess.call(command))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 os.chdir(PROJECT_ROOT)
 
+from bin.serve import build_server_command
+
 def main():
     """Inicia solo el servidor API."""
     print("🤖 Bot de Facilitadores Judiciales")
@@ -27,12 +29,7 @@ def main():
     print("⏳ Esperando que el servidor esté listo...")
     
     # Iniciar el servidor
-    subprocess.run([
-        sys.executable, "-m", "uvicorn",
-        "src.api:app",
-        "--host", "0.0.0.0",
-        "--port", "8000"
-    ])
+    subprocess.run(build_server_command())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
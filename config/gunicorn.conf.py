@@ -0,0 +1,25 @@
+"""
+Configuración de gunicorn para servir la API con varios procesos (pre-fork).
+
+Uso: API_WORKERS=4 python bin/serve.py
+"""
+
+import gc
+import os
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("API_WORKERS", "2"))
+bind = f"0.0.0.0:{os.getenv('API_PORT', '8000')}"
+timeout = 120
+
+# Importar la app en el maestro antes de hacer fork
+preload_app = True
+
+
+def when_ready(server):
+    """Carga los pesos de embeddings en el maestro para compartirlos copy-on-write."""
+    from src.api import bot
+    bot.preload()
+    # Sacar los objetos ya cargados del GC para que no ensucie páginas compartidas
+    gc.freeze()
+    server.log.info("Modelos precargados en el proceso maestro")
@@ -6,12 +6,64 @@ Módulo de seguridad simplificado para el bot de Facilitadores Judiciales.
 import os
 import secrets
 import hashlib
+import sqlite3
+import threading
 import time
-from typing import Optional, Dict, Any
+from pathlib import Path
+from typing import Optional, Dict, Any, Set
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class SharedRateLimitStore:
+    """
+    Contadores de rate limiting en SQLite, compartidos entre procesos
+    (necesario cuando la API corre con varios workers).
+    Usa ventanas fijas de 60 segundos por IP.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self._connect()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._connect)
+    
+    def _connect(self) -> None:
+        self.conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            " client TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL,"
+            " PRIMARY KEY (client, window))"
+        )
+    
+    def hit(self, client_ip: str, now: float) -> int:
+        """
+        Registra un request y retorna cuántos lleva la IP en la ventana actual.
+        """
+        window = int(now // 60)
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT INTO rate_limits (client, window, count) VALUES (?, ?, 1) "
+                    "ON CONFLICT(client, window) DO UPDATE SET count = count + 1",
+                    (client_ip, window)
+                )
+                (count,) = self.conn.execute(
+                    "SELECT count FROM rate_limits WHERE client = ? AND window = ?",
+                    (client_ip, window)
+                ).fetchone()
+                self.conn.execute("DELETE FROM rate_limits WHERE window < ?", (window - 1,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return count
+
 class SecurityManager:
     """
     Gestor de seguridad simplificado.
@@ -26,6 +78,12 @@ class SecurityManager:
         self.active_tokens: Dict[str, Dict[str, Any]] = {}
         self.request_counts: Dict[str, list] = {}
         
+        # Con varios workers los contadores deben vivir fuera del proceso
+        rate_limit_db = os.getenv("RATE_LIMIT_DB_PATH", "")
+        self.shared_rate_limits: Optional[SharedRateLimitStore] = (
+            SharedRateLimitStore(rate_limit_db) if rate_limit_db else None
+        )
+        
         # Tokens de desarrollo
         self.dev_tokens = {
             "admin": "dev-admin-token-12345",
@@ -91,6 +149,13 @@ class SecurityManager:
         Verifica rate limiting.
         """
         now = time.time()
+        
+        if self.shared_rate_limits is not None:
+            if self.shared_rate_limits.hit(client_ip, now) > self.max_requests_per_minute:
+                logger.warning(f"Rate limit excedido para IP: {client_ip}")
+                return False
+            return True
+        
         minute_ago = now - 60
         
         # Limpiar requests antiguos
@@ -158,6 +223,23 @@ class SecurityManager:
 # Instancia global
 security_manager = SecurityManager()
 
+def rate_limit_client(peer_ip: str, forwarded_for: str, trusted_ips: Set[str]) -> Optional[str]:
+    """
+    IP que se cuenta para el rate limiting.
+    Si quien se conecta no es de confianza, es esa IP. Si es de confianza (interfaz local o
+    proxy inverso), se recorre X-Forwarded-For de derecha a izquierda salteando los proxies de
+    confianza: la primera IP ajena la agregó nuestro proxy. Las entradas de la izquierda las
+    escribe el cliente y se pueden falsificar.
+    Retorna None para un cliente de confianza sin cabecera (no se limita).
+    """
+    if peer_ip not in trusted_ips:
+        return peer_ip
+    hops = [hop.strip() for hop in (forwarded_for or "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in trusted_ips:
+            return hop
+    return None
+
 def validate_auth_header(auth_header: str) -> Optional[Dict[str, Any]]:
     """
     Valida el header de autorización.
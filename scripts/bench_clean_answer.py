@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark del post-procesamiento de respuestas (AnswerFilter) frente a la versión anterior
+de clean_answer, que recompilaba los patrones y hacía varias pasadas en cada llamada.
+Usa respuestas largas (~1500 tokens) con metainstrucciones, líneas en blanco y teléfonos.
+
+Uso: python scripts/bench_clean_answer.py [--tokens 1500] [--rounds 300]
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.postprocess import AnswerFilter
+from src.retrieval import estimate_tokens
+
+LINES = [
+    "Entiendo tu situación con la pensión alimentaria. Te explico paso a paso qué hacer:",
+    "🏛️ **Dónde ir:** Juzgado de Familia de tu circuito judicial",
+    "• Acta de nacimiento del menor (original y copia)",
+    "1. Presenta demanda en el Juzgado de Familia y solicita medidas cautelares si hay urgencia",
+    "📞 Poder Judicial: 2295-3000 (pedir comunicar con pensiones alimentarias)",
+    "",
+    "",
+    "Fuente: Código de Familia",
+    "Respuesta estructurada:",
+    "💡 **Consejo:** Lleva todo organizado y pregunta por medidas provisionales.",
+    "Teléfono de la oficina: +506 2287 3700",
+]
+
+
+def long_answer(tokens: int, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    lines = []
+    while estimate_tokens("\n".join(lines)) < tokens:
+        lines.append(rng.choice(LINES))
+    return "\n".join(lines)
+
+
+def legacy_clean_answer(raw_text: str) -> str:
+    """clean_answer antes de AnswerFilter (ALLOW_CONTACTS=false)."""
+    forbidden_patterns = [
+        r"^\s*fuente\s*:", r"^\s*fuentes\s*:", r"^\s*tiempo\s*:", r"estructura\s+sugerida",
+        r"si no hay provincia", r"^\s*contexto\s*:", r"^\s*pregunta\s*:", r"^\s*respuesta\s*:",
+        r"ahora responde", r"respuesta estructurada", r"^\s*tel"
+    ]
+    forbidden_regexes = [re.compile(pat, re.IGNORECASE) for pat in forbidden_patterns]
+    phone_like = re.compile(r"(?:\+?\d[\d\s().-]{7,}\d)")
+    cleaned_lines = [
+        line for line in raw_text.splitlines()
+        if not any(rx.search(line) for rx in forbidden_regexes) and "XXXX" not in line
+    ]
+    cleaned = "\n".join(cleaned_lines).strip()
+    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
+    return phone_like.sub("[consultar directorio oficial]", cleaned)
+
+
+async def _stream_once(answer_filter: AnswerFilter, words: list) -> str:
+    async def tokens():
+        for word in words:
+            yield word
+    return "".join([part async for part in answer_filter.stream(tokens())])
+
+
+def timed(fn, rounds: int) -> float:
+    """Microsegundos promedio por respuesta."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de clean_answer")
+    parser.add_argument("--tokens", type=int, default=1500)
+    parser.add_argument("--rounds", type=int, default=300)
+    args = parser.parse_args()
+
+    answer = long_answer(args.tokens)
+    words = re.findall(r"\S+\s*|\s+", answer)
+    answer_filter = AnswerFilter(redact_contacts=True)
+
+    streamed = asyncio.run(_stream_once(answer_filter, words))
+    assert streamed == answer_filter.clean(answer), "clean y stream no coinciden"
+
+    loop = asyncio.new_event_loop()
+    legacy_us = timed(lambda: legacy_clean_answer(answer), args.rounds)
+    clean_us = timed(lambda: answer_filter.clean(answer), args.rounds)
+    stream_us = timed(lambda: loop.run_until_complete(_stream_once(answer_filter, words)), args.rounds)
+    loop.close()
+
+    print(f"Respuesta de ~{estimate_tokens(answer)} tokens, {answer.count(chr(10)) + 1} líneas, {len(words)} fragmentos")
+    print(f"{'clean_answer anterior':<24} {legacy_us:>9.1f}µs")
+    print(f"{'AnswerFilter.clean':<24} {clean_us:>9.1f}µs  ({legacy_us / clean_us:.1f}x)")
+    print(f"{'AnswerFilter.stream':<24} {stream_us:>9.1f}µs  (por respuesta, tokens de a uno)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark de backends de embeddings (torch, onnx, onnx-int8).
+Cada backend corre en un subproceso para medir su memoria residente por separado:
+tiempo de carga, latencia por consulta (p50/p95), throughput en lotes y RSS pico.
+
+Uso: python scripts/bench_embeddings.py [--backends torch onnx onnx-int8] [--queries 200]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.embeddings import EMBEDDING_BACKENDS, create_embeddings
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+QUESTIONS = [
+    "¿Cómo solicito una pensión alimentaria?",
+    "Mi jefe no me paga las vacaciones, ¿qué hago?",
+    "¿Dónde queda la Defensa Pública en Cartago?",
+    "¿Cuáles son los requisitos para ser facilitador judicial?",
+    "¿Qué dice el artículo 29 de la Constitución?",
+    "¿Cuánto dura un proceso de conciliación?",
+]
+
+
+def run_backend(backend: str, queries: int, batch_size: int) -> dict:
+    """Mide un backend dentro del proceso actual."""
+    start = time.perf_counter()
+    embedder = create_embeddings(backend, MODEL_NAME, batch_size=batch_size)
+    embedder.embed_query("calentamiento")
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        embedder.embed_query(f"{QUESTIONS[i % len(QUESTIONS)]} {i}")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    texts = [f"{QUESTIONS[i % len(QUESTIONS)]} {i}" for i in range(queries)]
+    start = time.perf_counter()
+    embedder.embed_documents(texts)
+    batch_seconds = time.perf_counter() - start
+
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    return {
+        "backend": backend,
+        "implementation": type(embedder).__name__,
+        "load_s": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "batch_qps": queries / batch_seconds,
+        "rss_mb": rss_mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de embeddings")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_backend(args.backends[0], args.queries, args.batch_size)))
+        return
+
+    print(f"{'Backend':<10} {'Clase':<30} {'Carga':>7} {'p50':>8} {'p95':>8} {'Lote q/s':>9} {'RSS MB':>8}")
+    print("-" * 86)
+    for backend in args.backends:
+        command = [sys.executable, __file__, "--single", "--backends", backend,
+                   "--queries", str(args.queries), "--batch-size", str(args.batch_size)]
+        output = subprocess.run(command, capture_output=True, text=True)
+        if output.returncode != 0:
+            print(f"{backend:<10} error: {output.stderr.strip().splitlines()[-1] if output.stderr.strip() else output.returncode}")
+            continue
+        r = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{r['backend']:<10} {r['implementation']:<30} {r['load_s']:>6.1f}s {r['p50_ms']:>6.1f}ms "
+              f"{r['p95_ms']:>6.1f}ms {r['batch_qps']:>9.0f} {r['rss_mb']:>8.0f}")
+    print("\nSi un backend ONNX aparece como SentenceTransformerEmbeddings, falta el modelo exportado "
+          "(python scripts/export_onnx.py).")
+
+
+if __name__ == "__main__":
+    main()
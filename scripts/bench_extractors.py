@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extractores de PDF sobre data/docs.
+Compara tiempo, caracteres extraídos y (con --memory) memoria pico de Python por archivo.
+La memoria se mide en una pasada aparte porque tracemalloc distorsiona los tiempos.
+
+Uso: python scripts/bench_extractors.py [--extractors pypdf unstructured] [--limit N] [--memory]
+"""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+from ingest import DATA_DIR, EXTRACTORS, _PYPDF_AVAILABLE
+
+
+def bench_file(extract, file_path: Path, measure_memory: bool = False):
+    """Mide un extractor sobre un archivo: (segundos, MB pico o 0, páginas, caracteres)."""
+    start = time.perf_counter()
+    docs = extract(file_path)
+    elapsed = time.perf_counter() - start
+    chars = sum(len(doc.page_content) for doc in docs)
+
+    peak_mb = 0.0
+    if measure_memory:
+        tracemalloc.start()
+        extract(file_path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / (1024 * 1024)
+    return elapsed, peak_mb, len(docs), chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extractores de PDF")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--extractors", nargs="+", default=sorted(EXTRACTORS['.pdf']))
+    parser.add_argument("--limit", type=int, default=0, help="Máximo de PDFs a medir (0 = todos)")
+    parser.add_argument("--memory", action="store_true", help="Medir también memoria pico (pasada extra, lenta)")
+    args = parser.parse_args()
+
+    if "pypdf" in args.extractors and not _PYPDF_AVAILABLE:
+        print("⚠️ pypdf no está instalado, se omite")
+        args.extractors.remove("pypdf")
+
+    pdfs = sorted(Path(args.data_dir).rglob("*.pdf"))
+    if args.limit:
+        pdfs = pdfs[:args.limit]
+    if not pdfs:
+        print(f"No se encontraron PDFs en {args.data_dir}")
+        return
+
+    totals = {name: [0.0, 0.0, 0] for name in args.extractors}
+    print(f"{'Archivo':<45} {'Extractor':<13} {'Tiempo':>8} {'Mem MB':>8} {'Págs':>5} {'Caracteres':>11}")
+    print("-" * 95)
+    for file_path in pdfs:
+        for name in args.extractors:
+            try:
+                elapsed, peak_mb, pages, chars = bench_file(EXTRACTORS['.pdf'][name], file_path, args.memory)
+            except Exception as e:
+                print(f"{file_path.name[:44]:<45} {name:<13} error: {e}")
+                continue
+            totals[name][0] += elapsed
+            totals[name][1] = max(totals[name][1], peak_mb)
+            totals[name][2] += chars
+            print(f"{file_path.name[:44]:<45} {name:<13} {elapsed:>7.2f}s {peak_mb:>8.1f} {pages:>5} {chars:>11}")
+
+    print("-" * 95)
+    for name, (elapsed, peak_mb, chars) in totals.items():
+        print(f"{'TOTAL':<45} {name:<13} {elapsed:>7.2f}s {peak_mb:>8.1f} {'':>5} {chars:>11}")
+
+
+if __name__ == "__main__":
+    main()
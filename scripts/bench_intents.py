@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del enrutador de intenciones (IntentRouter) frente al escaneo lineal
+de palabras clave que usaba la API, con cantidades crecientes de intenciones sintéticas.
+
+Uso: python scripts/bench_intents.py [--intents 10 100 1000 5000] [--rounds 2000]
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.intents import IntentRouter
+from src.normalization import fold_text
+
+QUESTIONS = [
+    "¿Cómo solicito una pensión alimentaria para mi hijo en Heredia?",
+    "Mi jefe no me paga las vacaciones, ¿qué hago?",
+    "¿Cuánto dura un proceso de conciliación?",
+    "¿Cuáles son los requisitos para ser facilitador judicial?",
+    "tengo problemas con mi jefe, mal salario y no tengo vacaciones soy de alajuela",
+]
+
+
+def synthetic_intents(count: int, phrases_per_intent: int = 5, seed: int = 7) -> dict:
+    """Intenciones con frases aleatorias de 1 a 3 palabras, más las reales al final."""
+    rng = random.Random(seed)
+    word = lambda: "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+    intents = {
+        f"intent_{i}": [" ".join(word() for _ in range(rng.randint(1, 3))) for _ in range(phrases_per_intent)]
+        for i in range(count)
+    }
+    intents["pension"] = ["pensión", "alimentos", "manutención"]
+    intents["laboral"] = ["jefe", "salario", "vacaciones"]
+    return intents
+
+
+def linear_scan(intents: dict, question: str) -> list:
+    """Lo que hacían los llamadores antes: un `in` por frase y por intención."""
+    text = fold_text(question)
+    return [name for name, phrases in intents.items() if any(phrase in text for phrase in phrases)]
+
+
+def timed(fn, rounds: int) -> float:
+    """Microsegundos promedio por consulta."""
+    start = time.perf_counter()
+    for i in range(rounds):
+        fn(QUESTIONS[i % len(QUESTIONS)])
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del enrutador de intenciones")
+    parser.add_argument("--intents", nargs="+", type=int, default=[10, 100, 1000, 5000])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'Intenciones':>11} {'Frases':>7} {'Compilar':>9} {'Router':>10} {'Lineal':>10} {'Mejora':>7}")
+    print("-" * 60)
+    for count in args.intents:
+        intents = synthetic_intents(count)
+        folded = {name: [fold_text(p) for p in phrases] for name, phrases in intents.items()}
+
+        start = time.perf_counter()
+        router = IntentRouter({"topic": intents})
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for question in QUESTIONS:
+            assert router.route(question).get("topic", []) == linear_scan(folded, question), question
+
+        router_us = timed(router.route, args.rounds)
+        linear_us = timed(lambda q: linear_scan(folded, q), args.rounds)
+        print(f"{count:>11} {router.num_phrases:>7} {build_ms:>7.1f}ms {router_us:>8.1f}µs "
+              f"{linear_us:>8.1f}µs {linear_us / router_us:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Exporta el modelo de embeddings (all-MiniLM-L6-v2) a ONNX para servirlo en CPU sin PyTorch.
+Genera model.onnx, model-int8.onnx (cuantización dinámica) y tokenizer.json en
+models/embeddings/<modelo>/, que es donde los busca EMBEDDING_BACKEND=onnx|onnx-int8.
+
+Uso: python scripts/export_onnx.py [--model sentence-transformers/all-MiniLM-L6-v2] [--output DIR]
+Requiere (solo para exportar): torch, sentence-transformers, onnx, onnxruntime
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Configurar path para importar módulos de src/
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.embeddings import ONNX_MODEL_FILES, onnx_model_dir
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+
+def export(model_name: str, output_dir: Path, opset: int = 14) -> None:
+    """Exporta el transformer (sin pooling: se hace en OnnxEmbeddings) y su versión int8."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    sample = tokenizer(["Consulta de ejemplo sobre pensión alimentaria"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = output_dir / ONNX_MODEL_FILES["onnx"]
+    logger.info(f"📦 Exportando {model_name} a {fp32_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    int8_path = output_dir / ONNX_MODEL_FILES["onnx-int8"]
+    logger.info(f"🗜️ Cuantizando a int8: {int8_path}...")
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    tokenizer.backend_tokenizer.save(str(output_dir / "tokenizer.json"))
+    for path in (fp32_path, int8_path):
+        logger.info(f"✅ {path.name}: {path.stat().st_size / (1024 * 1024):.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar embeddings a ONNX")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--output", default=None, help="Carpeta de salida (por defecto models/embeddings/<modelo>)")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output) if args.output else onnx_model_dir(args.model)
+    export(args.model, output_dir)
+    print("Para usarlo: EMBEDDING_BACKEND=onnx-int8 (o onnx) en config/config.env")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,27 @@ Procesa documentos PDF, DOCX y TXT, los fragmenta y genera embeddings.
 
 import os
 import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 import logging
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Configurar path para importar módulos de src/
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.embeddings import create_embeddings
+from src.retrieval import BM25Index
+from src.vector_store import NumpyVectorStore
+
 # Importaciones de LangChain
 try:
     from langchain.document_loaders import (
@@ -23,7 +36,6 @@ try:
         DirectoryLoader
     )
     from langchain.text_splitter import RecursiveCharacterTextSplitter
-    from langchain.embeddings import SentenceTransformerEmbeddings
     from langchain.vectorstores import Chroma
     from langchain.schema import Document
 except ImportError as e:
@@ -31,72 +43,126 @@ except ImportError as e:
     logger.error("Ejecuta: pip install langchain langchain-community")
     sys.exit(1)
 
+# Extractor rápido de PDFs con capa de texto (pypdf)
+try:
+    from pypdf import PdfReader
+    _PYPDF_AVAILABLE = True
+except ImportError:
+    _PYPDF_AVAILABLE = False
+
 # Configuración
 DATA_DIR = os.getenv("DATA_DIR", "./data/docs")
 PERSIST_DIR = os.getenv("VECTOR_DB_DIR", "./data/chroma")
 MODEL_EMBED = "all-MiniLM-L6-v2"  # Modelo ligero y eficiente
+# torch | onnx | onnx-int8 (modelo exportado con scripts/export_onnx.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 150
+EMBED_BATCH_SIZE = 64
+# Chunks por página al exportar la colección a los índices BM25 y NumPy
+EXPORT_PAGE_SIZE = 1000
+SUPPORTED_EXTENSIONS = {'.txt', '.pdf', '.docx'}
+# Extractor de PDF por defecto: "pypdf" (rápido, por página) o "unstructured" (PDFs escaneados o complejos)
+PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "pypdf")
+# Menos caracteres por página que esto sugiere un PDF escaneado (sin capa de texto)
+MIN_CHARS_PER_PAGE = 20
+# Registro de archivos ya indexados (ruta, tamaño, mtime, hash y IDs de sus chunks)
+MANIFEST_NAME = "ingest_manifest.json"
+# Índice léxico BM25 (se abre con memory-map en la API)
+BM25_DIR_NAME = "bm25"
+# Matriz de embeddings para el backend NumPy (VECTOR_STORE=numpy en la API)
+VECTORS_DIR_NAME = "vectors"
 
-def load_documents(data_dir: str) -> List[Document]:
+def find_files(data_dir: str) -> List[Path]:
     """
-    Carga documentos desde el directorio especificado.
-    Soporta: .txt, .pdf, .docx
+    Busca los archivos soportados (.txt, .pdf, .docx) en el directorio.
     """
-    documents = []
     data_path = Path(data_dir)
     
     if not data_path.exists():
         logger.error(f"Directorio {data_dir} no existe. Creándolo...")
         data_path.mkdir(parents=True, exist_ok=True)
-        return documents
+        return []
     
-    # Buscar archivos soportados
-    supported_extensions = {'.txt', '.pdf', '.docx'}
     files_found = []
-    
-    for ext in supported_extensions:
+    for ext in sorted(SUPPORTED_EXTENSIONS):
         files_found.extend(data_path.rglob(f"*{ext}"))
     
     if not files_found:
         logger.warning(f"No se encontraron documentos en {data_dir}")
         logger.info("Formatos soportados: .txt, .pdf, .docx")
-        return documents
     
-    logger.info(f"Encontrados {len(files_found)} archivos para procesar")
+    return sorted(files_found)
+
+def _extract_txt(file_path: Path) -> List[Document]:
+    return TextLoader(str(file_path), encoding='utf-8').load()
+
+def _extract_docx(file_path: Path) -> List[Document]:
+    return Docx2txtLoader(str(file_path)).load()
+
+def _extract_pdf_unstructured(file_path: Path) -> List[Document]:
+    return UnstructuredPDFLoader(str(file_path)).load()
+
+def _extract_pdf_pypdf(file_path: Path) -> List[Document]:
+    """
+    Extracción página por página con pypdf; conserva el número de página.
+    Si el PDF parece escaneado (casi sin texto), recurre a Unstructured.
+    """
+    reader = PdfReader(str(file_path))
+    docs = []
+    total_chars = 0
+    for page_number, page in enumerate(reader.pages, start=1):
+        text = page.extract_text() or ""
+        total_chars += len(text.strip())
+        if text.strip():
+            docs.append(Document(page_content=text, metadata={'page': page_number}))
     
-    # Procesar cada archivo
-    for file_path in files_found:
-        try:
-            logger.info(f"Procesando: {file_path.name}")
-            
-            if file_path.suffix.lower() == '.txt':
-                loader = TextLoader(str(file_path), encoding='utf-8')
-            elif file_path.suffix.lower() == '.pdf':
-                loader = UnstructuredPDFLoader(str(file_path))
-            elif file_path.suffix.lower() == '.docx':
-                loader = Docx2txtLoader(str(file_path))
-            else:
-                continue
-            
-            docs = loader.load()
-            
-            # Agregar metadatos del archivo
-            for doc in docs:
-                doc.metadata.update({
-                    'source': str(file_path),
-                    'filename': file_path.name,
-                    'file_type': file_path.suffix.lower()
-                })
-            
-            documents.extend(docs)
-            logger.info(f"✅ {file_path.name}: {len(docs)} páginas cargadas")
-            
-        except Exception as e:
-            logger.error(f"❌ Error procesando {file_path.name}: {e}")
-            continue
+    if reader.pages and total_chars < MIN_CHARS_PER_PAGE * len(reader.pages):
+        logger.info(f"{file_path.name}: sin capa de texto, usando Unstructured")
+        return _extract_pdf_unstructured(file_path)
+    return docs
+
+# Extractores disponibles por extensión; el primero de cada lista es el default
+EXTRACTORS: Dict[str, Dict[str, Callable[[Path], List[Document]]]] = {
+    '.txt': {'text': _extract_txt},
+    '.pdf': {'pypdf': _extract_pdf_pypdf, 'unstructured': _extract_pdf_unstructured},
+    '.docx': {'docx2txt': _extract_docx},
+}
+
+def extractor_name(file_path: Path, pdf_extractor: str = PDF_EXTRACTOR) -> Optional[str]:
+    """
+    Nombre del extractor que se usará para un archivo.
+    """
+    options = EXTRACTORS.get(file_path.suffix.lower())
+    if not options:
+        return None
+    if file_path.suffix.lower() == '.pdf':
+        if pdf_extractor == 'pypdf' and not _PYPDF_AVAILABLE:
+            return 'unstructured'
+        if pdf_extractor in options:
+            return pdf_extractor
+    return next(iter(options))
+
+def load_file(file_path: Path, pdf_extractor: str = PDF_EXTRACTOR) -> List[Document]:
+    """
+    Carga un archivo con el extractor registrado para su extensión
+    y le agrega los metadatos del origen.
+    """
+    name = extractor_name(file_path, pdf_extractor)
+    if name is None:
+        return []
+    
+    docs = EXTRACTORS[file_path.suffix.lower()][name](file_path)
     
-    return documents
+    # Agregar metadatos del archivo
+    for doc in docs:
+        doc.metadata.update({
+            'source': str(file_path),
+            'filename': file_path.name,
+            'file_type': file_path.suffix.lower()
+        })
+    
+    return docs
 
 def split_documents(documents: List[Document]) -> List[Document]:
     """
@@ -119,58 +185,348 @@ def split_documents(documents: List[Document]) -> List[Document]:
     split_docs = text_splitter.split_documents(documents)
     
     logger.info(f"Documentos fragmentados: {len(split_docs)} chunks")
-    logger.info(f"Tamaño promedio de chunk: {sum(len(doc.page_content) for doc in split_docs) // len(split_docs)} caracteres")
+    if split_docs:
+        logger.info(f"Tamaño promedio de chunk: {sum(len(doc.page_content) for doc in split_docs) // len(split_docs)} caracteres")
     
     return split_docs
 
-def create_embeddings(split_docs: List[Document]) -> Chroma:
+def file_hash(file_path: Path) -> str:
     """
-    Crea embeddings y los guarda en ChromaDB.
+    Hash SHA-256 del contenido del archivo (leído por bloques).
     """
-    if not split_docs:
-        logger.error("No hay documentos para procesar")
-        return None
-    
-    logger.info("Generando embeddings...")
-    
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(persist_path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Carga el manifiesto de archivos indexados ({} si no existe o está dañado).
+    """
+    manifest_path = persist_path / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
     try:
-        # Crear embedder
-        embedder = SentenceTransformerEmbeddings(model_name=MODEL_EMBED)
-        logger.info(f"Modelo de embeddings: {MODEL_EMBED}")
-        
-        # Crear o cargar base de datos vectorial
-        persist_path = Path(PERSIST_DIR)
-        persist_path.mkdir(parents=True, exist_ok=True)
-        
-        # Verificar si ya existe una base de datos
-        if (persist_path / "chroma.sqlite3").exists():
-            logger.info("Base de datos existente encontrada. Agregando nuevos documentos...")
-            vectordb = Chroma(
-                persist_directory=str(persist_path),
-                embedding_function=embedder
-            )
-            # Agregar nuevos documentos
-            vectordb.add_documents(split_docs)
-        else:
-            logger.info("Creando nueva base de datos vectorial...")
-            vectordb = Chroma.from_documents(
-                documents=split_docs,
-                embedding=embedder,
-                persist_directory=str(persist_path)
-            )
-        
-        # Persistir la base de datos
-        vectordb.persist()
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError) as e:
+        logger.warning(f"Manifiesto ilegible ({e}), se reconstruye el índice completo")
+        return {}
+
+def save_manifest(persist_path: Path, manifest: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Guarda el manifiesto de forma atómica (archivo temporal + replace).
+    """
+    manifest_path = persist_path / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": 1, "files": manifest}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def make_chunk_ids(relative_path: str, content_hash: str, count: int) -> List[str]:
+    """
+    IDs deterministas: mismo archivo con el mismo contenido produce los mismos IDs.
+    """
+    path_hash = hashlib.sha1(relative_path.encode('utf-8')).hexdigest()[:12]
+    return [f"{path_hash}-{content_hash[:12]}-{i:05d}" for i in range(count)]
+
+def plan_ingest(files: List[Path], manifest: Dict[str, Dict[str, Any]], data_path: Path, pdf_extractor: str = PDF_EXTRACTOR) -> Tuple[List[Tuple[Path, str, Dict[str, Any]]], List[str], List[str]]:
+    """
+    Compara los archivos en disco contra el manifiesto.
+    Cambiar de extractor también obliga a re-procesar el archivo.
+    Retorna (archivos nuevos o modificados, archivos eliminados, archivos sin cambios).
+    """
+    to_index = []
+    unchanged = []
+    seen = set()
+    
+    for file_path in files:
+        relative_path = file_path.relative_to(data_path).as_posix()
+        seen.add(relative_path)
+        stat = file_path.stat()
+        extractor = extractor_name(file_path, pdf_extractor)
+        previous = manifest.get(relative_path)
+        if previous and previous.get("extractor") != extractor:
+            previous = dict(previous, sha256=None)
         
-        # Verificar el contenido
-        collection_count = vectordb._collection.count()
-        logger.info(f"✅ Base de datos vectorial creada con {collection_count} documentos")
+        # Tamaño y mtime iguales: no hace falta ni leer el archivo
+        if previous and previous["sha256"] and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+            unchanged.append(relative_path)
+            continue
         
-        return vectordb
+        content_hash = file_hash(file_path)
+        if previous and previous["sha256"] == content_hash:
+            manifest[relative_path]["mtime"] = stat.st_mtime
+            unchanged.append(relative_path)
+            continue
         
-    except Exception as e:
-        logger.error(f"Error creando embeddings: {e}")
+        to_index.append((file_path, relative_path, {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": content_hash,
+            "extractor": extractor
+        }))
+    
+    deleted = [relative_path for relative_path in manifest if relative_path not in seen]
+    return to_index, deleted, unchanged
+
+def process_file(file_path: Path, relative_path: str, entry: Dict[str, Any]) -> Tuple[str, Dict[str, Any], List[Document], Dict[str, float]]:
+    """
+    Carga y fragmenta un archivo. Corre dentro de un proceso del pool.
+    """
+    start = time.perf_counter()
+    docs = load_file(file_path, entry["extractor"])
+    loaded = time.perf_counter()
+    split_docs = split_documents(docs)
+    timings = {
+        "pages": len(docs),
+        "load": loaded - start,
+        "split": time.perf_counter() - loaded
+    }
+    return relative_path, entry, split_docs, timings
+
+def iter_processed_files(to_index: List[Tuple[Path, str, Dict[str, Any]]], jobs: int) -> Iterator[Tuple[str, Dict[str, Any], Optional[List[Document]], Dict[str, float]]]:
+    """
+    Procesa archivos en paralelo y entrega cada resultado apenas termina,
+    para que el embedder empiece sin esperar al resto del corpus.
+    Si un archivo falla se entrega con chunks = None.
+    """
+    if jobs <= 1 or len(to_index) <= 1:
+        for file_path, relative_path, entry in to_index:
+            try:
+                yield process_file(file_path, relative_path, entry)
+            except Exception as e:
+                logger.error(f"❌ Error procesando {file_path.name}: {e}")
+                yield relative_path, entry, None, {}
+        return
+    
+    # Los PDFs grandes primero, así no quedan al final ocupando un solo núcleo
+    pending = sorted(to_index, key=lambda item: item[2]["size"], reverse=True)
+    # Ventana acotada de archivos en vuelo: los resultados no se acumulan en memoria
+    # si el embedder va más lento que la carga
+    max_in_flight = jobs * 2
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        while pending or futures:
+            while pending and len(futures) < max_in_flight:
+                file_path, relative_path, entry = pending.pop(0)
+                futures[pool.submit(process_file, file_path, relative_path, entry)] = (file_path, relative_path, entry)
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path, relative_path, entry = futures.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.error(f"❌ Error procesando {file_path.name}: {e}")
+                    yield relative_path, entry, None, {}
+
+def _scalar_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Chroma solo acepta metadatos escalares (str, int, float, bool).
+    """
+    return {key: value for key, value in metadata.items() if isinstance(value, (str, int, float, bool))}
+
+def embed_and_upsert(collection: Any, embedder: Any, processed: Iterator[Tuple[str, Dict[str, Any], Optional[List[Document]], Dict[str, float]]], batch_size: int, manifest: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Etapa de embeddings en streaming: toma chunks del generador, los codifica en
+    lotes de tamaño fijo y escribe cada lote en Chroma antes de seguir.
+    La memoria pico depende del tamaño de lote, no del tamaño del corpus.
+    Un archivo entra al manifiesto solo cuando todos sus chunks quedaron escritos; si falla
+    un lote, los archivos con chunks en ese lote se descartan, sus chunks ya escritos en lotes
+    anteriores se borran del índice y se reintentan en la próxima ingesta.
+    """
+    batch_ids: List[str] = []
+    batch_docs: List[Document] = []
+    # Archivos con al menos un chunk en el lote actual, y archivos con algún lote fallido
+    batch_files: Set[str] = set()
+    failed_files: Set[str] = set()
+    # IDs de cada archivo con chunks en cola, para borrar los ya escritos si el archivo falla
+    file_ids: Dict[str, List[str]] = {}
+    # Archivos con todos sus chunks ya en cola y alguno en el lote actual
+    ready_files: List[Tuple[str, Dict[str, Any], List[str], Dict[str, float]]] = []
+    total_chunks = 0
+    embed_seconds = 0.0
+    
+    def record(relative_path: str, entry: Dict[str, Any], ids: List[str], timings: Dict[str, float]) -> None:
+        manifest[relative_path] = dict(entry, chunk_ids=ids)
+        file_ids.pop(relative_path, None)
+        logger.info(
+            f"✅ {relative_path}: {timings['pages']} páginas, {len(ids)} chunks "
+            f"(carga {timings['load']:.1f}s, fragmentación {timings['split']:.1f}s)"
+        )
+    
+    def flush() -> None:
+        nonlocal total_chunks, embed_seconds
+        start = time.perf_counter()
+        try:
+            if batch_ids:
+                embeddings = embedder.embed_documents([doc.page_content for doc in batch_docs])
+                collection.upsert(
+                    ids=list(batch_ids),
+                    embeddings=embeddings,
+                    documents=[doc.page_content for doc in batch_docs],
+                    metadatas=[_scalar_metadata(doc.metadata) for doc in batch_docs]
+                )
+                total_chunks += len(batch_ids)
+            for ready in ready_files:
+                record(*ready)
+        except Exception as e:
+            failed_files.update(batch_files)
+            failed_files.update(relative_path for relative_path, _, _, _ in ready_files)
+            for relative_path in failed_files:
+                manifest.pop(relative_path, None)
+            logger.error(f"❌ Error escribiendo lote de embeddings: {e}")
+        finally:
+            embed_seconds += time.perf_counter() - start
+            batch_ids.clear()
+            batch_docs.clear()
+            batch_files.clear()
+            ready_files.clear()
+    
+    for relative_path, entry, split_docs, timings in processed:
+        if split_docs is None:
+            manifest.pop(relative_path, None)
+            continue
+        ids = make_chunk_ids(relative_path, entry["sha256"], len(split_docs))
+        file_ids[relative_path] = ids
+        for chunk_id, doc in zip(ids, split_docs):
+            if relative_path in failed_files:
+                break  # un lote con chunks de este archivo falló: el resto no sirve
+            batch_ids.append(chunk_id)
+            batch_docs.append(doc)
+            batch_files.add(relative_path)
+            if len(batch_ids) >= batch_size:
+                flush()
+        if relative_path in failed_files:
+            logger.error(f"❌ {relative_path}: chunks sin escribir, se reintentará en la próxima ingesta")
+            continue
+        if relative_path in batch_files:
+            ready_files.append((relative_path, entry, ids, timings))
+        else:
+            record(relative_path, entry, ids, timings)  # todos sus chunks ya se escribieron
+    flush()
+    
+    # Los archivos fallidos pueden tener chunks de lotes anteriores ya en Chroma: sin esto quedarían
+    # huérfanos (fuera del manifiesto) y, si el archivo cambia, nadie los borraría
+    partial_ids = [chunk_id for relative_path in failed_files for chunk_id in file_ids.get(relative_path, [])]
+    if partial_ids:
+        try:
+            collection.delete(ids=partial_ids)
+            logger.info(f"🗑️ Chunks parciales de archivos fallidos eliminados: {len(partial_ids)}")
+        except Exception as e:
+            logger.error(f"❌ No se pudieron borrar {len(partial_ids)} chunks parciales: {e}")
+    
+    if total_chunks:
+        logger.info(f"⚡ Embeddings: {total_chunks} chunks en {embed_seconds:.1f}s ({total_chunks / max(embed_seconds, 1e-9):.1f} chunks/s)")
+    return total_chunks
+
+def iter_collection(collection: Any, include: List[str], page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Tuple[List[Dict[str, Any]], Optional[List[Any]]]]:
+    """
+    Recorre la colección por páginas: (chunks {"id", "text", "metadata"}, embeddings o None).
+    """
+    offset = 0
+    while True:
+        records = collection.get(include=include, limit=page_size, offset=offset)
+        if not records["ids"]:
+            return
+        chunks = [
+            {"id": chunk_id, "text": text or "", "metadata": metadata or {}}
+            for chunk_id, text, metadata in zip(records["ids"], records["documents"], records["metadatas"])
+        ]
+        yield chunks, records.get("embeddings")
+        offset += len(records["ids"])
+
+def export_indexes(collection: Any, persist_path: Path, page_size: int = EXPORT_PAGE_SIZE) -> int:
+    """
+    Exporta todos los chunks de la colección al índice BM25 y a la matriz NumPy.
+    Se rehacen completos para que reflejen también los archivos sin cambios. La colección
+    se lee por páginas y cada página se escribe al disco antes de pedir la siguiente,
+    así la memoria no crece con el corpus.
+    """
+    start = time.perf_counter()
+    count = collection.count()
+    NumpyVectorStore.write(
+        str(persist_path / VECTORS_DIR_NAME), count,
+        ((embeddings, chunks) for chunks, embeddings in
+         iter_collection(collection, ["documents", "metadatas", "embeddings"], page_size))
+    )
+    BM25Index.write(
+        str(persist_path / BM25_DIR_NAME),
+        (chunk for chunks, _ in iter_collection(collection, ["documents", "metadatas"], page_size) for chunk in chunks)
+    )
+    logger.info(f"🔤 Índices BM25 y NumPy: {count} chunks en {time.perf_counter() - start:.1f}s")
+    return count
+
+def open_vectordb(persist_path: Path, embedder: Any) -> Chroma:
+    """
+    Abre (o crea) la base de datos vectorial persistente.
+    """
+    return Chroma(
+        persist_directory=str(persist_path),
+        embedding_function=embedder
+    )
+
+def ingest(data_dir: str, persist_dir: str, full: bool = False, jobs: int = 1, batch_size: int = EMBED_BATCH_SIZE, pdf_extractor: str = PDF_EXTRACTOR) -> Optional[Chroma]:
+    """
+    Ingesta incremental: solo re-procesa archivos nuevos o modificados,
+    elimina los chunks de archivos modificados o borrados y omite el resto.
+    """
+    data_path = Path(data_dir)
+    persist_path = Path(persist_dir)
+    persist_path.mkdir(parents=True, exist_ok=True)
+    
+    db_exists = (persist_path / "chroma.sqlite3").exists()
+    manifest = {} if full else load_manifest(persist_path)
+    rebuild = db_exists and (full or not manifest)
+    
+    files = find_files(data_dir)
+    to_index, deleted, unchanged = plan_ingest(files, manifest, data_path, pdf_extractor)
+    logger.info(f"📋 Archivos: {len(to_index)} nuevos/modificados, {len(deleted)} eliminados, {len(unchanged)} sin cambios")
+    
+    if not to_index and not deleted and not rebuild:
+        logger.info("✅ Sin cambios: el índice ya está al día")
+        save_manifest(persist_path, manifest)
+        exported = all((persist_path / name).exists() for name in (BM25_DIR_NAME, VECTORS_DIR_NAME))
+        if db_exists and not exported:
+            # Base indexada antes de existir estos índices: no hace falta el modelo de embeddings
+            export_indexes(open_vectordb(persist_path, None)._collection, persist_path)
         return None
+    
+    embedder = create_embeddings(EMBEDDING_BACKEND, MODEL_EMBED, batch_size=batch_size)
+    logger.info(f"Modelo de embeddings: {MODEL_EMBED} ({EMBEDDING_BACKEND})")
+    vectordb = open_vectordb(persist_path, embedder)
+    
+    if rebuild:
+        # Base creada sin manifiesto (IDs aleatorios): no se puede actualizar de forma segura
+        logger.info("Reconstruyendo la base de datos vectorial desde cero...")
+        vectordb.delete_collection()
+        vectordb = open_vectordb(persist_path, embedder)
+    
+    # Purgar chunks de archivos eliminados o modificados
+    stale_ids = []
+    for relative_path in deleted:
+        stale_ids.extend(manifest.pop(relative_path).get("chunk_ids", []))
+        logger.info(f"🗑️ Eliminado: {relative_path}")
+    for _, relative_path, _ in to_index:
+        if relative_path in manifest:
+            stale_ids.extend(manifest[relative_path].get("chunk_ids", []))
+    if stale_ids and not rebuild:
+        vectordb._collection.delete(ids=stale_ids)
+        logger.info(f"Chunks obsoletos eliminados: {len(stale_ids)}")
+    
+    logger.info(f"Procesando {len(to_index)} archivos con {jobs} procesos, lotes de {batch_size} chunks...")
+    embed_and_upsert(vectordb._collection, embedder, iter_processed_files(to_index, jobs), batch_size, manifest)
+    
+    # Persistir la base de datos y el manifiesto
+    vectordb.persist()
+    save_manifest(persist_path, manifest)
+    export_indexes(vectordb._collection, persist_path)
+    
+    collection_count = vectordb._collection.count()
+    logger.info(f"✅ Base de datos vectorial con {collection_count} chunks")
+    
+    return vectordb
 
 def test_retrieval(vectordb: Chroma, test_query: str = "procedimiento judicial"):
     """
@@ -197,35 +553,29 @@ def main():
     """
     Función principal del script de ingesta.
     """
+    parser = argparse.ArgumentParser(description="Ingesta de documentos para Facilitadores Judiciales")
+    parser.add_argument("--full", action="store_true", help="Reconstruir el índice completo ignorando el manifiesto")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para cargar y fragmentar documentos en paralelo (default: núcleos disponibles)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help=f"Chunks por lote de embeddings (default: {EMBED_BATCH_SIZE})")
+    parser.add_argument("--pdf-extractor", choices=sorted(EXTRACTORS['.pdf']), default=PDF_EXTRACTOR,
+                        help=f"Extractor para PDFs (default: {PDF_EXTRACTOR}); unstructured para escaneados o complejos")
+    args = parser.parse_args()
+    
     logger.info("🚀 Iniciando ingesta de documentos para Facilitadores Judiciales")
     logger.info(f"Directorio de datos: {DATA_DIR}")
     logger.info(f"Directorio de vectores: {PERSIST_DIR}")
     
-    # 1. Cargar documentos
-    documents = load_documents(DATA_DIR)
-    
-    if not documents:
-        logger.warning("No se encontraron documentos para procesar.")
-        logger.info("Coloca archivos .txt, .pdf o .docx en la carpeta data/docs/")
-        return
-    
-    # 2. Fragmentar documentos
-    split_docs = split_documents(documents)
-    
-    # 3. Crear embeddings
-    vectordb = create_embeddings(split_docs)
+    start_time = time.time()
+    vectordb = ingest(DATA_DIR, PERSIST_DIR, full=args.full, jobs=args.jobs, batch_size=args.batch_size, pdf_extractor=args.pdf_extractor)
     
     if vectordb:
-        # 4. Probar recuperación
+        # Probar recuperación
         test_retrieval(vectordb)
-        
-        logger.info("✅ Ingesta completada exitosamente!")
-        logger.info(f"📊 Estadísticas:")
-        logger.info(f"   - Documentos originales: {len(documents)}")
-        logger.info(f"   - Chunks generados: {len(split_docs)}")
-        logger.info(f"   - Base de datos: {PERSIST_DIR}")
-    else:
-        logger.error("❌ Error en la ingesta de documentos")
+    
+    logger.info(f"✅ Ingesta completada en {time.time() - start_time:.1f}s")
+    logger.info(f"   - Base de datos: {PERSIST_DIR}")
 
 if __name__ == "__main__":
     main()
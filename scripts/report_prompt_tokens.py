@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Reporte de tokens de entrada por consulta: antes y después de unificar las instrucciones
+de sistema (src/prompts.py). Antes, Groq recibía su mensaje de sistema y además el prompt
+RAG repetía casi las mismas reglas; el modelo local usaba solo el preámbulo RAG.
+
+Para el modelo local muestra además cuánto lugar queda para historial, contexto y pregunta
+dentro de N_CTX (menos los tokens de respuesta) según qué instrucciones lleve de prefijo.
+
+Cuenta con la estimación por caracteres, o con un tokenizador real (tokenizer.json del
+paquete `tokenizers`, por ejemplo el de models/embeddings/ o el de Llama 3.1).
+
+Uso: python scripts/report_prompt_tokens.py [--tokenizer ruta/tokenizer.json] [--n-ctx 2048]
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.prompts import LOCAL_SYSTEM_PROMPT, PROMPT_TEMPLATES, SYSTEM_PROMPT, PromptBuilder, with_system_prefix
+from src.retrieval import estimate_tokens
+
+# Plantillas anteriores, tal como estaban en src/api.py
+LEGACY_GROQ_SYSTEM_PROMPT = """Sos un asistente virtual del Servicio Nacional de Facilitadoras y Facilitadores Judiciales de Costa Rica.
+
+TU OBJETIVO PRINCIPAL:
+Ayudar al usuario a resolver su problema POR SÍ MISMO, reduciendo la necesidad de contactar facilitadores judiciales. Sos LA SOLUCIÓN, no un intermediario.
+
+TU DOMINIO DE ESPECIALIZACIÓN (CRÍTICO):
+SOLO respondes consultas sobre temas legales y judiciales en Costa Rica:
+✅ Pensiones alimentarias, conciliaciones, problemas laborales, trámites judiciales, derechos, leyes
+❌ Matemáticas, programación, recetas, consejos generales, tareas escolares, etc.
+
+Si te preguntan algo FUERA de tu dominio:
+1. Reconoce amablemente que no es tu área
+2. Explica que te especializás en temas legales/judiciales
+3. Invita al usuario a hacer consultas legales
+4. NO intentes responder temas fuera de tu especialidad
+
+Ejemplo: "Disculpá, pero no soy un asistente matemático. Me especializo en temas legales y judiciales de Costa Rica. ¿Tenés alguna consulta sobre pensiones, trámites judiciales, derechos laborales o algo similar?"
+
+CONTEXTO CONVERSACIONAL (CRÍTICO):
+- SIEMPRE lee y entiende el historial de la conversación COMPLETO
+- Mantén continuidad con el tema que el usuario está consultando
+- Si el usuario pregunta sobre "hacer trámites en otra ciudad", se refiere al MISMO PROBLEMA que ya estaba discutiendo
+- NO cambies de tema a menos que el usuario lo haga explícitamente
+- Adapta tus respuestas al problema ESPECÍFICO que el usuario mencionó inicialmente
+- Para PREGUNTAS DE SEGUIMIENTO: sé más directo y conciso, no repitas toda la info anterior
+
+INSTRUCCIONES DE FORMATO:
+Tu respuesta debe ser natural y bien estructurada. NO uses etiquetas como "**Empatía inicial**".
+
+ESTRUCTURA DE TU RESPUESTA:
+1. Si es primera consulta: Da respuesta completa con todos los pasos
+2. Si es pregunta de seguimiento: Sé DIRECTO y conciso, enfocándote solo en lo nuevo
+3. Incluye información práctica:
+   - Teléfonos y direcciones con REFERENCIAS REALES
+   - Horarios de atención
+   - Documentos específicos si es necesario
+   - Costos si aplica
+4. Termina preguntando: "¿Necesitás que te aclare algo más sobre [tema específico]?"
+
+DIRECCIONES CON REFERENCIAS REALES (IMPORTANTE):
+- NO des solo "Calle X, Avenida Y"
+- SÍ da referencias conocidas: "frente al Parque Central", "100 metros norte del McDonald's", "al lado del Banco Nacional", "diagonal a la Iglesia", etc.
+- Adapta las referencias según la ciudad mencionada
+- Usa puntos de referencia que cualquier persona local conocería
+
+INFORMACIÓN DE CONTACTO REAL EN COSTA RICA:
+- Ministerio de Trabajo: 800-8722256
+- Defensa Pública: 2287-3700
+- PANI: 1147 o 2523-0800
+- Poder Judicial: 2295-3000
+- OIJ: 2295-3643
+- Policía: 911
+- INAMU: 2527-8400
+- CCSS: 2539-0821
+
+IMPORTANTE:
+- MANTÉN CONTINUIDAD: no cambies de tema sin razón
+- Sé COMPLETO: da toda la info para que NO necesiten a un facilitador
+- Da direcciones EXACTAS según la ciudad que mencionen
+- NO ofrezcas contactar facilitadores judiciales
+- NO digas "llámanos" o "contactános"
+- Tu seguimiento debe ser: "¿Qué más puedo aclararte?" (VOS sos la ayuda)
+- Usa lenguaje inclusivo
+
+Si NO tienes información específica, dilo claramente y sugiere dónde buscarla."""
+
+LEGACY_RAG_PREAMBLE = """Sos un asistente virtual del SNFJ. Tu objetivo es que el usuario pueda resolver su problema POR SÍ MISMO.
+
+CRÍTICO - DOMINIO DE ESPECIALIZACIÓN:
+SOLO respondes temas legales/judiciales de Costa Rica. Si preguntan matemáticas, recetas, consejos generales, etc:
+Responde: "Disculpá, me especializo solo en temas legales y judiciales. ¿Tenés alguna consulta sobre pensiones, trámites o derechos?"
+NO respondas temas fuera de tu área.
+
+CRÍTICO - CONTINUIDAD CONVERSACIONAL:
+Lee TODO el historial de conversación. Si el usuario hace una pregunta de seguimiento, mantené el tema original.
+Ejemplo: Si habló de problemas laborales en Alajuela y pregunta por Heredia, sigue con el MISMO tema laboral pero en Heredia.
+
+PREGUNTAS DE SEGUIMIENTO:
+Si el usuario ya tiene contexto (pregunta de seguimiento), SÉ MÁS DIRECTO Y CONCISO. No repitas info ya dada.
+
+DIRECCIONES (MUY IMPORTANTE):
+Da referencias REALES que la gente conoce:
+✅ "Frente al Parque Central de Alajuela"
+✅ "100 metros norte del McDonald's"
+✅ "Al lado del Banco Nacional"
+✅ "Diagonal a la Catedral"
+❌ NO solo: "Calle 2, Avenida 4"
+
+Respondé de forma natural. NO uses etiquetas. 
+
+Da una respuesta:
+1. Reconoce el contexto previo si existe (breve)
+2. Info nueva: teléfonos, direcciones CON REFERENCIAS, horarios
+3. Solo documentos si es necesario
+4. Al final: "¿Necesitás que te aclare algo más sobre [tema específico]?"
+
+NO ofrezcas contactar facilitadores. VOS sos la solución completa.
+
+TELÉFONOS REALES:
+- Ministerio de Trabajo: 800-8722256
+- Defensa Pública: 2287-3700
+- PANI: 1147
+
+"""
+
+DOCS_DIR = PROJECT_ROOT / "data" / "docs"
+# LocalLLM.MAX_TOKENS: lugar reservado para la respuesta dentro de N_CTX
+RESPONSE_TOKENS = 400
+
+SCENARIOS = [
+    ("primera consulta", "¿Cómo solicito una pensión alimentaria para mi hijo?", []),
+    ("seguimiento", "¿Y si vivo en Heredia?", [
+        {"role": "user", "content": "Mi jefe no me paga las vacaciones, soy de Alajuela"},
+        {"role": "assistant", "content": "Entiendo tu situación laboral. Primero documentá todo y acudí al Ministerio de Trabajo."},
+    ]),
+]
+
+
+def context_sections(top_k: int = 4, context_tokens: int = 300) -> list:
+    """Fragmentos de los documentos de ejemplo, como los que arma la búsqueda (RAG_TOP_K, RAG_CONTEXT_TOKENS)."""
+    files = sorted(DOCS_DIR.glob("*.txt"))[:top_k]
+    chars = context_tokens * 4 // max(len(files), 1)
+    return [(f.name, f.read_text(encoding="utf-8")[:chars]) for f in files]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens de entrada por consulta, antes y después")
+    parser.add_argument("--tokenizer", help="tokenizer.json para contar tokens reales")
+    parser.add_argument("--max-prompt-tokens", type=int, default=int(os.getenv("PROMPT_MAX_TOKENS", "3000")))
+    parser.add_argument("--n-ctx", type=int, default=int(os.getenv("N_CTX", "2048")),
+                        help="Contexto del modelo local (N_CTX)")
+    args = parser.parse_args()
+
+    count = estimate_tokens
+    counter_name = "estimación por caracteres (src.retrieval.estimate_tokens)"
+    if args.tokenizer:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_file(args.tokenizer)
+        count = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+        counter_name = args.tokenizer
+
+    print(f"Conteo: {counter_name}\n")
+    print("Plantillas registradas:")
+    for name, template in PROMPT_TEMPLATES.items():
+        print(f"  {name:<20} {count(template):>6} tokens")
+    print(f"  {'(antes) groq system':<20} {count(LEGACY_GROQ_SYSTEM_PROMPT):>6} tokens")
+    print(f"  {'(antes) preámbulo':<20} {count(LEGACY_RAG_PREAMBLE):>6} tokens\n")
+
+    sections = context_sections()
+
+    print(f"Groq (PROMPT_MAX_TOKENS={args.max_prompt_tokens}): mensaje de sistema + mensaje del usuario")
+    builder = PromptBuilder(SYSTEM_PROMPT, args.max_prompt_tokens, count)
+    print(f"{'Consulta':<18} {'Antes':>8} {'Ahora':>8}")
+    print("-" * 36)
+    for name, question, history in SCENARIOS:
+        message, _ = builder.build(question, history, sections)
+        before = count(LEGACY_GROQ_SYSTEM_PROMPT) + count(LEGACY_RAG_PREAMBLE + message)
+        after = count(SYSTEM_PROMPT) + count(message)
+        print(f"{name:<18} {before:>8} {after:>8}")
+
+    local_limit = min(args.max_prompt_tokens, args.n_ctx - RESPONSE_TOKENS)
+    print(f"\nModelo local (N_CTX={args.n_ctx}, {RESPONSE_TOKENS} para la respuesta: prompt de hasta {local_limit} tokens)")
+    print(f"{'Instrucciones':<24} {'Consulta':<18} {'Prefijo':>8} {'Mensaje':>8} {'Total':>6} {'Libre':>6} {'Contexto':>9} {'Historial':>10}")
+    print("-" * 95)
+    prefixes = [
+        ("preámbulo anterior", LEGACY_RAG_PREAMBLE),
+        ("instrucciones completas", SYSTEM_PROMPT),
+        ("compactas (actual)", LOCAL_SYSTEM_PROMPT),
+    ]
+    for label, system_prompt in prefixes:
+        builder = PromptBuilder(system_prompt, local_limit, count)
+        prefix_tokens = count(with_system_prefix("", system_prompt))
+        for name, question, history in SCENARIOS:
+            message, used = builder.build(question, history, sections)
+            history_used = message.count("\nUsuario: ") + message.count("\nTú (Facilitador): ")
+            history_label = f"{history_used}/{len(history)}" if history else "-"
+            total = prefix_tokens + count(message)
+            print(f"{label:<24} {name:<18} {prefix_tokens:>8} {count(message):>8} {total:>6} {local_limit - total:>6} "
+                  f"{used:>7}/{len(sections)} {history_label:>10}")
+    print("\nLocal: con el estado KV del prefijo, llama.cpp solo evalúa el mensaje en cada consulta;")
+    print("el prefijo igual ocupa lugar en N_CTX y resta espacio para contexto e historial.")
+
+
+if __name__ == "__main__":
+    main()
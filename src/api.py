@@ -12,7 +12,10 @@ import asyncio
 import time
 import json
 import hashlib
-from typing import Dict, Any, List, Optional, AsyncGenerator
+import math
+from typing import Dict, Any, List, Optional, AsyncGenerator, Callable, Tuple
+
+import numpy as np
 
 # Cargar variables de entorno desde config/config.env
 from dotenv import load_dotenv
@@ -21,16 +24,33 @@ load_dotenv()  # .env si existe (prioridad)
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-from collections import defaultdict, OrderedDict
+from collections import defaultdict, OrderedDict, deque
 from pathlib import Path
 
+# Permitir "from src..." tanto con uvicorn src.api:app como ejecutando este archivo
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.normalization import fold_text
+from src.intents import IntentRouter
+from src.postprocess import AnswerFilter
+from src.semantic_cache import SemanticCache
+from src.cache_backends import SQLiteCacheBackend, TieredCache
+from src.embeddings import CachedEmbeddings, EmbeddingBatcher, create_embeddings
+from src.retrieval import BM25Index, assemble_context, estimate_tokens, reciprocal_rank_fusion
+from src.prompts import LOCAL_SYSTEM_PROMPT, SYSTEM_PROMPT, PromptBuilder, with_system_prefix
+from src.vector_store import NumpyVectorStore
+from src.resilience import CircuitBreaker, jittered_backoff
+from config.security import rate_limit_client, security_manager
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Importaciones de FastAPI
 try:
-    from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+    from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Depends
     from fastapi.middleware.cors import CORSMiddleware
     from fastapi.responses import StreamingResponse, JSONResponse
     from pydantic import BaseModel
@@ -43,7 +63,6 @@ except ImportError as e:
 # Importaciones de LangChain
 try:
     from langchain_community.vectorstores import Chroma
-    from langchain_community.embeddings import SentenceTransformerEmbeddings
     from langchain.schema import Document
 except ImportError as e:
     logger.error(f"Error importando LangChain: {e}")
@@ -58,23 +77,107 @@ except Exception:
 
 # Intentar importar Groq para API en la nube
 try:
-    from groq import Groq  # type: ignore
+    import httpx  # type: ignore
+    import groq  # type: ignore
+    from groq import AsyncGroq  # type: ignore
     _GROQ_AVAILABLE = True
 except Exception:
     _GROQ_AVAILABLE = False
 
+# tokenizers es opcional: cuenta los tokens reales del prompt de Groq (GROQ_TOKENIZER_PATH)
+try:
+    from tokenizers import Tokenizer  # type: ignore
+    _TOKENIZERS_AVAILABLE = True
+except Exception:
+    _TOKENIZERS_AVAILABLE = False
+
+# PyYAML es opcional: solo para leer las respuestas precomputadas en YAML
+try:
+    import yaml  # type: ignore
+    _YAML_AVAILABLE = True
+except Exception:
+    _YAML_AVAILABLE = False
+
 # Configuración
 PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIRECTORY", "./data/chroma")
 MODEL_PATH = os.getenv("MODEL_PATH", "./models/Phi-3-mini-4k-instruct-q4.gguf")
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 MODEL_EMBED = EMBEDDING_MODEL_NAME
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx | onnx-int8
 DISABLE_PRECOMPUTED = os.getenv("DISABLE_PRECOMPUTED", "false").lower() == "true"  # Hybrid: MockLLM primero, LLM después
+PRECOMPUTED_ANSWERS_PATH = os.getenv("PRECOMPUTED_ANSWERS_PATH", "./data/precomputed_answers.json")
+PRECOMPUTED_RELOAD_INTERVAL = float(os.getenv("PRECOMPUTED_RELOAD_INTERVAL", "5"))  # segundos, 0 = sin recarga
 NUM_THREADS = int(os.getenv("NUM_THREADS", "4"))
+ALLOW_CONTACTS = os.getenv("ALLOW_CONTACTS", "false").lower() == "true"  # false = ocultar teléfonos en respuestas
+# Pool del LLM local: contextos en paralelo (por defecto núcleos / NUM_THREADS) y peticiones en espera
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", str(max(1, (os.cpu_count() or 1) // NUM_THREADS))))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "8"))
+# Rate limiting por IP en /ask y /ask/stream (MAX_REQUESTS_PER_MINUTE; con RATE_LIMIT_DB_PATH se comparte entre workers).
+# Los clientes locales (interfaz Streamlit, consola) o proxies de confianza no se limitan, salvo que
+# reenvíen X-Forwarded-For: en ese caso cuenta la IP que agregó el proxy (la primera ajena desde la derecha)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_TRUSTED_IPS = {ip.strip() for ip in os.getenv("RATE_LIMIT_TRUSTED_IPS", "127.0.0.1,::1").split(",") if ip.strip()}
 
 # Configuración de Groq API
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 USE_GROQ_API = os.getenv("USE_GROQ_API", "true").lower() == "true"
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None  # None = API oficial
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "15"))  # segundos por intento
+GROQ_DEADLINE = float(os.getenv("GROQ_DEADLINE", "30"))  # segundos en total, reintentos incluidos
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_BREAKER_FAILURES = int(os.getenv("GROQ_BREAKER_FAILURES", "5"))
+GROQ_BREAKER_RESET = float(os.getenv("GROQ_BREAKER_RESET", "30"))
+# Conteo de tokens para PROMPT_MAX_TOKENS con Groq: tokenizer.json del modelo si está disponible;
+# si no, la estimación por caracteres multiplicada por este margen (en español rinde menos de 4 caracteres por token)
+GROQ_TOKENIZER_PATH = os.getenv("GROQ_TOKENIZER_PATH", "")
+GROQ_TOKEN_MARGIN = float(os.getenv("GROQ_TOKEN_MARGIN", "1.3"))
+
+# Cache de respuestas: "memory" (solo L1) o "sqlite" (L1 en memoria + L2 persistente en disco)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite").lower()
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "./data/cache/answers.sqlite3")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Cada cuántos segundos un worker revisa si otro limpió el cache compartido (/clear-cache), 0 = nunca
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "2"))
+
+# Cache semántico (preguntas parafraseadas)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_NEAR_MISS = float(os.getenv("SEMANTIC_CACHE_NEAR_MISS", "0.85"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "500"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+# Mensajes del historial que entran al prompt (y por lo tanto a la llave del cache)
+HISTORY_WINDOW = 4
+
+# Backend vectorial: chroma o numpy (matriz exportada por scripts/ingest.py, abierta con memory-map)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma").lower()
+NUMPY_VECTORS_DIR = os.getenv("NUMPY_VECTORS_DIR", os.path.join(PERSIST_DIR, "vectors"))
+
+# Búsqueda híbrida: BM25 (construido por scripts/ingest.py) + vectores, fusionados por rango recíproco
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join(PERSIST_DIR, "bm25"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Ensamblado de contexto: candidatos recuperados, presupuesto de tokens y relevancia mínima
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "300"))
+RAG_MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", "0.25"))
+
+# Presupuesto del prompt (el modelo local además lo limita a N_CTX menos la respuesta)
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "3000"))
+HISTORY_MESSAGE_TOKENS = int(os.getenv("HISTORY_MESSAGE_TOKENS", "200"))
+
+# Warmup al iniciar (LLM local, embeddings, búsqueda y prefijo del prompt)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+# Cache LRU de embeddings de preguntas (compartido por búsqueda y cache semántico)
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1000"))
+# Micro-lotes: preguntas concurrentes se codifican juntas (espera máxima en ms y tamaño de lote)
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "16"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
 
 
 # Modelos de Pydantic para la API
@@ -98,6 +201,27 @@ class QueryResponse(BaseModel):
     cached: bool = False
 
 
+def build_cache_key(question: str, history: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, str]:
+    """
+    Deriva la llave de cache de una pregunta.
+    La pregunta se normaliza (tildes, puntuación, espacios) y, si hay historial,
+    se agrega un digest de la misma ventana de mensajes que usa el prompt.
+    Retorna (llave, clase) donde la clase es "standalone" o "followup".
+    """
+    normalized = fold_text(question)
+    window = (history or [])[-HISTORY_WINDOW:]
+    if not window:
+        return f"q:{normalized}", "standalone"
+    
+    digest = hashlib.blake2b(digest_size=8)
+    for msg in window:
+        digest.update(str(msg.get("role", "")).encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(fold_text(str(msg.get("content", ""))).encode("utf-8"))
+        digest.update(b"\x1e")
+    return f"h:{digest.hexdigest()}:{normalized}", "followup"
+
+
 class SmartCache:
     """Cache inteligente con TTL y límite de tamaño."""
     def __init__(self, max_size: int = 1000, ttl: int = 3600):
@@ -106,15 +230,18 @@ class SmartCache:
         self.ttl = ttl
         self.hits = 0
         self.misses = 0
+        # Contadores por clase de llave: {"standalone": [hits, misses], ...}
+        self.class_counts: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
         self.lock = threading.Lock()
     
-    def get(self, key: str) -> Optional[Dict[str, Any]]:
+    def get(self, key: str, key_class: str = "standalone") -> Optional[Dict[str, Any]]:
         """Obtener valor del cache si existe y no ha expirado."""
         with self.lock:
             if key in self.cache:
                 value, timestamp = self.cache[key]
                 if time.time() - timestamp < self.ttl:
                     self.hits += 1
+                    self.class_counts[key_class][0] += 1
                     # Mover al final (más reciente)
                     self.cache.move_to_end(key)
                     return value
@@ -122,14 +249,19 @@ class SmartCache:
                     # Expiró, eliminar
                     del self.cache[key]
             self.misses += 1
+            self.class_counts[key_class][1] += 1
             return None
     
-    def set(self, key: str, value: Dict[str, Any]) -> None:
-        """Guardar valor en cache."""
+    async def get_async(self, key: str, key_class: str = "standalone") -> Optional[Dict[str, Any]]:
+        """Misma interfaz que TieredCache.get_async (en memoria no hay nada que esperar)."""
+        return self.get(key, key_class)
+    
+    def set(self, key: str, value: Dict[str, Any], created: Optional[float] = None) -> None:
+        """Guardar valor en cache; `created` conserva la hora original de una entrada promovida desde L2."""
         with self.lock:
             if key in self.cache:
                 self.cache.move_to_end(key)
-            self.cache[key] = (value, time.time())
+            self.cache[key] = (value, time.time() if created is None else created)
             # Limitar tamaño del cache
             if len(self.cache) > self.max_size:
                 self.cache.popitem(last=False)
@@ -139,205 +271,328 @@ class SmartCache:
         with self.lock:
             self.cache.clear()
     
+    def sync(self) -> bool:
+        """Solo en memoria no hay otros procesos que avisen (misma interfaz que TieredCache)."""
+        return False
+    
+    def close(self) -> None:
+        """Nada que liberar en memoria (misma interfaz que TieredCache)."""
+        pass
+    
+    @staticmethod
+    def _hit_rate(hits: int, misses: int) -> str:
+        total = hits + misses
+        return f"{(hits / total * 100) if total > 0 else 0:.1f}%"
+    
     def stats(self) -> Dict[str, Any]:
         """Estadísticas del cache."""
-        total = self.hits + self.misses
-        hit_rate = (self.hits / total * 100) if total > 0 else 0
+        with self.lock:
+            by_class = {
+                key_class: {"hits": hits, "misses": misses, "hit_rate": self._hit_rate(hits, misses)}
+                for key_class, (hits, misses) in self.class_counts.items()
+            }
         return {
             "size": len(self.cache),
             "hits": self.hits,
             "misses": self.misses,
-            "hit_rate": f"{hit_rate:.1f}%"
+            "hit_rate": self._hit_rate(self.hits, self.misses),
+            "by_class": by_class
         }
 
 
-class PrecomputedResponses:
-    """Respuestas precomputadas para consultas comunes."""
-    def __init__(self):
-        self.responses = {
-            "pension": {
-                "keywords": ["pensión", "alimentos", "manutención", "pago", "hijo", "ex esposo", "ex esposa"],
-                "answer": """Entiendo tu situación con la pensión alimentaria. Te explico paso a paso qué hacer:
-
-🏛️ **Dónde ir:**
-• Juzgado de Familia de tu circuito judicial
-• Defensa Pública (gratuita si calificas económicamente)
-• PANI para orientación adicional
-
-📋 **Documentos necesarios:**
-• Acta de nacimiento del menor (original y copia)
-• Tu cédula de identidad
-• Cédula del otro progenitor (si la tienes)
-• Comprobantes de gastos del menor
-• Tu comprobante de ingresos
-
-🚀 **Qué hacer:**
-1. Presenta demanda en el Juzgado de Familia
-2. Solicita medidas cautelares si hay urgencia
-3. Pide retención salarial automática
-4. Si no paga, puede haber apremio corporal
-
-⚡ **Importante:** El incumplimiento puede llevar a retención de salario, embargo de bienes e incluso prisión.
-
-💡 **Consejo:** Lleva todo organizado y pregunta por "medidas provisionales" para pensión urgente.
-
----
-
-**¿En qué más puedo ayudarte?**
-• ¿Necesitás que te explique más sobre alguno de estos pasos?
-• ¿Querés saber qué hacer si el padre/madre vive en otro país?
-• ¿Te gustaría conocer cuánto tiempo tarda cada etapa del proceso?
-• ¿Tenés dudas sobre los costos o si hay manera de hacerlo gratis?
-
-Estoy aquí para ayudarte con lo que necesites. ¡No dudes en preguntar! 😊"""
-            },
-            "duracion_conciliacion": {
-                "keywords": ["cuánto dura", "duración", "tiempo", "demora", "tarda", "cuanto tiempo"],
-                "answer": """Una conciliación generalmente dura:
-
-⏱️ **Duración típica:**
-• **Primera sesión:** 1-2 horas
-• **Proceso completo:** 1-3 sesiones (dependiendo del caso)
-• **Plazo total:** Usualmente se resuelve en 1-2 meses
+def create_answer_cache() -> Any:
+    """Crea el cache de respuestas según CACHE_BACKEND."""
+    l1 = SmartCache(ttl=CACHE_TTL)
+    if CACHE_BACKEND == "sqlite":
+        try:
+            l2 = SQLiteCacheBackend(CACHE_DB_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
+            logger.info(f"💾 Cache persistente en {CACHE_DB_PATH}")
+            return TieredCache(l1, l2)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo abrir el cache en disco ({e}). Usando solo memoria")
+    return l1
+
+
+# Frases que enruta IntentRouter (se comparan sin tildes ni mayúsculas)
+GREETING_PHRASES = ["hola", "buenos días", "buenas tardes", "buenas noches", "hey", "holi", "ola"]
+FAREWELL_PHRASES = ["adiós", "chao", "hasta luego", "gracias", "bye"]
+ABOUT_PHRASES = ["quién sos", "qué sos", "qué haces", "para qué sirves"]
+LOCATIONS = ["San José", "Cartago", "Alajuela", "Heredia", "Puntarenas", "Guanacaste",
+             "Limón", "Liberia", "Pérez Zeledón", "Desamparados", "Escazú", "Goicoechea"]
+# Temas que usa MockLLM, en orden de prioridad ("*": también plurales y derivadas, ver src/intents.py)
+MOCK_TOPICS = {
+    "pension": ["pensión*", "alimentos", "manutención", "hijo*", "hija*"],
+    "laboral": ["laboral*", "trabajo*", "empleador*", "jefe*", "salario*"],
+    "facilitador": ["facilitador*", "conciliación*", "mediación*"],
+}
+
+
+def build_intent_router(precomputed: Optional[Dict[str, Dict[str, Any]]] = None) -> IntentRouter:
+    """Un solo enrutador para saludos, despedidas, preguntas sobre el bot, ubicaciones, temas y precomputadas."""
+    groups = {
+        "greeting": {"greeting": GREETING_PHRASES},
+        "farewell": {"farewell": FAREWELL_PHRASES},
+        "about": {"about": ABOUT_PHRASES},
+        "location": {name: [name] for name in LOCATIONS},
+        "topic": MOCK_TOPICS,
+        "precomputed": {category: data["keywords"] for category, data in (precomputed or {}).items()},
+    }
+    return IntentRouter(groups, exact_groups={"greeting"})
 
-📅 **Factores que influyen:**
-• Complejidad del caso
-• Disponibilidad de las partes
-• Documentación necesaria
-• Si hay acuerdo o no
 
-✅ **Ventajas vs juicio:**
-• Conciliación: 1-2 meses
-• Juicio tradicional: 6 meses a 2+ años
+class PrecomputedResponses:
+    """
+    Respuestas precomputadas para consultas comunes, definidas en PRECOMPUTED_ANSWERS_PATH
+    (JSON, o YAML si PyYAML está instalado):
+
+        {"version": 1, "answers": {"pension": {"keywords": [...], "answer": "..."}}}
+
+    Al cargar el archivo se compila una instantánea inmutable (versión, respuestas, enrutador).
+    Una recarga arma la instantánea nueva aparte y la instala con una sola asignación:
+    las consultas leen `snapshot` sin locks y nunca ven una mezcla de dos versiones.
+    """
+    def __init__(self, path: str = None):
+        self.path = Path(path or PRECOMPUTED_ANSWERS_PATH)
+        self.reloads = 0
+        self.loaded_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._failed_signature: Optional[Tuple[int, int]] = None
+        self.snapshot: Tuple[Optional[str], Dict[str, Dict[str, Any]], IntentRouter] = (None, {}, build_intent_router())
+        if not self.reload():
+            logger.warning(f"⚠️ Sin respuestas precomputadas ({self.last_error})")
+    
+    @property
+    def version(self) -> Optional[str]:
+        return self.snapshot[0]
+    
+    @property
+    def responses(self) -> Dict[str, Dict[str, Any]]:
+        return self.snapshot[1]
+    
+    @property
+    def router(self) -> IntentRouter:
+        return self.snapshot[2]
+    
+    def _parse(self, raw: bytes) -> Dict[str, Any]:
+        if self.path.suffix in (".yaml", ".yml"):
+            if not _YAML_AVAILABLE:
+                raise RuntimeError("PyYAML no está instalado")
+            return yaml.safe_load(raw)
+        return json.loads(raw)
+    
+    def reload(self) -> bool:
+        """Recarga el archivo si cambió. Retorna True si se instaló una versión nueva."""
+        signature = None
+        try:
+            stat = self.path.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature in (self._signature, self._failed_signature):
+                return False
+            raw = self.path.read_bytes()
+            data = self._parse(raw)
+            responses = {
+                str(category): {"keywords": [str(k) for k in entry["keywords"]], "answer": str(entry["answer"])}
+                for category, entry in data["answers"].items()
+            }
+            # El hash del contenido cambia con cualquier edición aunque no se suba "version"
+            version = f"{data.get('version', 0)}-{hashlib.blake2b(raw, digest_size=4).hexdigest()}"
+            snapshot = (version, responses, build_intent_router(responses))
+        except Exception as e:
+            # Archivo a medio escribir o inválido: se conserva la versión actual y se reintenta
+            # cuando el archivo vuelva a cambiar
+            error = f"{type(e).__name__}: {e}"
+            if self._signature is not None and error != self.last_error:
+                logger.error(f"❌ No se pudo recargar {self.path}: {error}")
+            self.last_error = error
+            self._failed_signature = signature
+            return False
+        
+        self.snapshot = snapshot
+        self._signature = signature
+        self.loaded_at = time.time()
+        self.last_error = None
+        self.reloads += 1
+        logger.info(f"📚 {len(responses)} respuestas precomputadas cargadas (versión {version})")
+        return True
+    
+    def find_match(self, categories: List[str], responses: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[str]:
+        """Respuesta de la primera categoría detectada por el enrutador de intenciones."""
+        responses = self.responses if responses is None else responses
+        for category in categories:
+            if category in responses:
+                return responses[category]["answer"]
+        return None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "version": self.version,
+            "entries": len(self.responses),
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "last_error": self.last_error
+        }
 
-🏛️ **Tipos de conciliación:**
-• **Pre-procesal:** Antes de juicio (más rápida)
-• **Procesal:** Durante el juicio
-• **Judicial:** En el juzgado
 
-💡 **Consejo:** La rapidez depende mucho de la actitud colaborativa de ambas partes.
+async def _iterate_in_thread(make_iterator, executor=None) -> AsyncGenerator[Any, None]:
+    """Consume un iterador bloqueante en un hilo y entrega cada elemento al event loop apenas llega."""
+    loop = asyncio.get_event_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
 
-----
+    def _producer() -> None:
+        try:
+            for item in make_iterator():
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (None, e))
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, (done, None))
 
-**¿Te puedo ayudar con algo más?**
-• ¿Querés saber cómo prepararte para una conciliación?
-• ¿Necesitás información sobre qué pasa si no hay acuerdo?
-• ¿Te interesa conocer qué casos se pueden conciliar?
-• ¿Tenés dudas sobre los requisitos para iniciar?
-
-Estoy aquí para ayudarte. 😊"""
-            },
-            "facilitador": {
-                "keywords": ["facilitador judicial", "ser facilitador", "requisitos facilitador", "trabajo facilitador", "certificación facilitador", "curso facilitador"],
-                "answer": """Para ser Facilitador Judicial en Costa Rica, necesitas:
-
-📋 **Requisitos:**
-• Ser costarricense o extranjero con residencia legal
-• Mayor de 25 años
-• Título universitario o experiencia comprobada
-• No tener antecedentes penales
-• Capacitación certificada por el Poder Judicial
-
-📚 **Capacitación:**
-• Curso oficial del Poder Judicial
-• Temas: mediación, conciliación, técnicas de facilitación
-• Duración: variable según programa
-
-🏛️ **Dónde informarte:**
-• Poder Judicial: 2295-3000
-• Dirección de Resolución Alterna de Conflictos
-
-💼 **Funciones:**
-• Facilitar procesos de conciliación
-• Ayudar a las partes a llegar a acuerdos
-• Orientar sobre procedimientos
-
-💡 **Consejo:** Contacta directamente al Poder Judicial para información sobre próximas capacitaciones.
+    loop.run_in_executor(executor, _producer)
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                break
+            yield item
+    finally:
+        # Si el cliente se desconecta, el hilo deja de producir en el siguiente token
+        stop.set()
 
----
 
-**¿Algo más en lo que te pueda ayudar?**
-• ¿Querés saber más sobre el proceso de capacitación?
-• ¿Te interesa conocer las funciones específicas de un facilitador?
-• ¿Necesitás información sobre dónde dar el curso?
-• ¿Tenés dudas sobre los requisitos o documentos?
+class PrefixSnapshot:
+    """
+    Estado KV del preámbulo compartido por los contextos de un mismo modelo: el primero que
+    lo necesita lo evalúa y lo guarda, y los demás restauran esa misma copia (un snapshot
+    puede pesar cientos de MB, no conviene uno por contexto).
+    """
 
-Estoy aquí para ayudarte. ¡Seguí preguntando! 📚"""
-            },
-            "proceso_conciliacion": {
-                "keywords": ["cómo funciona conciliación", "proceso de conciliación", "qué es conciliación", "conciliación judicial", "conciliar"],
-                "answer": """La conciliación es un proceso voluntario para resolver conflictos. Te explico cómo funciona:
-
-🤝 **¿Qué es?**
-Es un proceso donde un facilitador neutral ayuda a las partes a llegar a un acuerdo sin ir a juicio.
-
-📋 **Pasos del proceso:**
-1. **Solicitud:** Una o ambas partes piden la conciliación
-2. **Citación:** Se notifica a la otra parte
-3. **Sesión:** El facilitador modera el diálogo
-4. **Acuerdo:** Si hay acuerdo, se firma y tiene validez legal
-5. **Sin acuerdo:** Se puede acudir a juicio
-
-✅ **Ventajas:**
-• Más rápido que un juicio
-• Menos costoso
-• Las partes mantienen el control
-• Acuerdos más flexibles
-• Menos conflictivo
-
-🏛️ **Casos que se pueden conciliar:**
-• Pensión alimentaria
-• Regulación de visitas
-• Conflictos laborales (algunos)
-• Asuntos de familia
-• Conflictos vecinales
-
-⚠️ **No se concilia:**
-• Delitos graves
-• Violencia doméstica
-• Derechos irrenunciables
-
-💡 **Consejo:** La conciliación funciona mejor cuando ambas partes quieren llegar a un acuerdo.
-
-----
-
-**¿En qué más te puedo ayudar?**
-• ¿Necesitás saber dónde solicitar una conciliación?
-• ¿Querés conocer qué documentos llevar?
-• ¿Te interesa saber cuánto cuesta?
-• ¿Tenés dudas sobre si tu caso se puede conciliar?
-
-Preguntame lo que necesites. 😊"""
-            }
-        }
-    
-    def find_match(self, question: str) -> Optional[str]:
-        """Buscar respuesta precomputada."""
-        question_lower = question.lower()
-        for category, data in self.responses.items():
-            if any(keyword in question_lower for keyword in data["keywords"]):
-                return data["answer"]
-        return None
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state: Any = None
 
 
 class LocalLLM:
-    """LLM local basado en llama.cpp para modelos GGUF (CPU/GPU)."""
-    def __init__(self, model_path: str, n_ctx: int = 4096, n_threads: int = 4, n_gpu_layers: int = 0):
+    """
+    LLM local basado en llama.cpp para modelos GGUF (CPU/GPU).
+
+    Si se indica `static_prefix` (las instrucciones de sistema), se antepone a cada mensaje,
+    se evalúa una sola vez y se guarda su estado KV; cada consulta restaura ese estado
+    y llama.cpp solo evalúa el resto (historial, contexto y pregunta). Los contextos de un
+    pool comparten el snapshot a través de `prefix_snapshot`.
+    """
+    MAX_TOKENS = 400  # Reducido para respuestas más rápidas
+
+    def __init__(self, model_path: str, n_ctx: int = 4096, n_threads: int = 4, n_gpu_layers: int = 0,
+                 static_prefix: Optional[str] = None, executor: Optional[ThreadPoolExecutor] = None,
+                 prefix_snapshot: Optional[PrefixSnapshot] = None):
         self.model_path = model_path
+        self.executor = executor
         self.n_ctx = n_ctx
         self.n_threads = n_threads
         self.n_gpu_layers = n_gpu_layers
+        self.static_prefix = static_prefix
+        self.prefix_snapshot = prefix_snapshot or PrefixSnapshot()
         self._llama: Optional[Llama] = None
+        self._load_lock = threading.Lock()
+        # llama.cpp no es thread-safe: una generación a la vez sobre el mismo contexto
+        self._generate_lock = threading.Lock()
+        self._prefix_state: Any = None
+        self.prefix_tokens = 0
+        self.prefix_reused = 0
+        self.prefix_restored = 0
 
     def _ensure_loaded(self) -> None:
+        # El warmup y la primera consulta pueden llegar a la vez: cargar una sola vez
+        with self._load_lock:
+            if self._llama is None:
+                self._llama = Llama(
+                    model_path=self.model_path,
+                    n_ctx=self.n_ctx,
+                    n_threads=self.n_threads,
+                    n_gpu_layers=self.n_gpu_layers,
+                    verbose=False,
+                )
+
+    def load(self) -> None:
+        """Carga anticipada del modelo (warmup al iniciar la API)."""
+        self._ensure_loaded()
+
+    def prime_prefix(self) -> None:
+        """Evalúa el preámbulo fijo y guarda el estado KV resultante (snapshot)."""
+        self._ensure_loaded()
+        with self._generate_lock:
+            self._save_prefix_state()
+
+    def _save_prefix_state(self) -> None:
+        # Se llama con _generate_lock tomado
+        if not self.static_prefix or self._prefix_state is not None:
+            return
+        assert self._llama is not None
+        snapshot = self.prefix_snapshot
+        with snapshot.lock:
+            if snapshot.state is None:
+                tokens = self._llama.tokenize(self.static_prefix.encode("utf-8"))
+                self._llama.reset()
+                self._llama.eval(tokens)
+                snapshot.state = self._llama.save_state()
+                logger.info(f"🧠 Estado KV del preámbulo guardado ({len(tokens)} tokens)")
+        self._prefix_state = snapshot.state
+        self.prefix_tokens = snapshot.state.n_tokens
+
+    def _restore_prefix(self, prompt: str) -> None:
+        """
+        Deja el contexto de llama.cpp con el preámbulo ya evaluado. Si los primeros tokens
+        en memoria ya son el preámbulo (consulta anterior), no hace falta restaurar.
+        create_completion reutiliza el prefijo común y evalúa solo el sufijo.
+        """
+        if not self.static_prefix or not prompt.startswith(self.static_prefix):
+            return
+        self._save_prefix_state()
+        assert self._llama is not None
+        n = self._prefix_state.n_tokens
+        current = self._llama.input_ids[:self._llama.n_tokens]
+        if len(current) >= n and np.array_equal(current[:n], self._prefix_state.input_ids[:n]):
+            self.prefix_reused += 1
+        else:
+            self._llama.load_state(self._prefix_state)
+            self.prefix_restored += 1
+
+    @property
+    def max_prompt_tokens(self) -> int:
+        """Tokens de prompt que entran en el contexto dejando lugar para la respuesta."""
+        return self.n_ctx - self.MAX_TOKENS
+
+    def count_tokens(self, text: str) -> int:
+        """Tokens según el tokenizador del modelo (estimación si todavía no está cargado)."""
         if self._llama is None:
-            self._llama = Llama(
-                model_path=self.model_path,
-                n_ctx=self.n_ctx,
-                n_threads=self.n_threads,
-                n_gpu_layers=self.n_gpu_layers,
-                verbose=False,
-            )
+            return estimate_tokens(text)
+        return len(self._llama.tokenize(text.encode("utf-8"), add_bos=False))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "prefix_tokens": self.prefix_tokens,
+            "prefix_reused": self.prefix_reused,
+            "prefix_restored": self.prefix_restored
+        }
+
+    def _completion_kwargs(self, prompt: str) -> Dict[str, Any]:
+        return dict(
+            prompt=prompt,
+            max_tokens=self.MAX_TOKENS,
+            temperature=0.7,
+            top_p=0.9,
+            top_k=40,
+            repeat_penalty=1.1,
+            stop=["\n\nCONTEXTO:", "\n\nPREGUNTA:", "###", "</s>"]
+        )
 
     async def generate_async(self, prompt: str) -> str:
         loop = asyncio.get_event_loop()
@@ -345,130 +600,381 @@ class LocalLLM:
         def _run() -> str:
             self._ensure_loaded()
             assert self._llama is not None
-            out = self._llama.create_completion(
-                prompt=prompt,
-                max_tokens=400,  # Reducido para respuestas más rápidas
-                temperature=0.7,
-                top_p=0.9,
-                top_k=40,
-                repeat_penalty=1.1,
-                stop=["\n\nCONTEXTO:", "\n\nPREGUNTA:", "###", "</s>"]
-            )
+            full_prompt = (self.static_prefix or "") + prompt
+            with self._generate_lock:
+                self._restore_prefix(full_prompt)
+                out = self._llama.create_completion(**self._completion_kwargs(full_prompt))
             return out["choices"][0]["text"].strip()
 
-        return await loop.run_in_executor(None, _run)
+        return await loop.run_in_executor(self.executor, _run)
+
+    async def stream_async(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Entrega los tokens a medida que llama.cpp los genera."""
+        def _iterator():
+            self._ensure_loaded()
+            assert self._llama is not None
+            full_prompt = (self.static_prefix or "") + prompt
+            with self._generate_lock:
+                self._restore_prefix(full_prompt)
+                for chunk in self._llama.create_completion(stream=True, **self._completion_kwargs(full_prompt)):
+                    yield chunk["choices"][0]["text"]
+
+        async for token in _iterate_in_thread(_iterator, self.executor):
+            if token:
+                yield token
+
+
+class LLMOverloadedError(Exception):
+    """La cola del LLM local está llena: responder 503 con Retry-After en lugar de acumular esperas."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Cola del modelo local llena, reintentar en {retry_after}s")
+        self.retry_after = retry_after
+
+
+class StreamInterruptedError(Exception):
+    """El stream del LLM se cortó después de entregar parte de la respuesta: no hay respaldo posible."""
+
+
+class LocalLLMPool:
+    """
+    Pool acotado de contextos llama.cpp con cola FIFO y contrapresión.
+
+    Cada instancia tiene su propio contexto (su propio cache KV de N_CTX tokens); los pesos
+    del GGUF se comparten vía mmap y el snapshot del preámbulo es uno solo para todo el pool. Una petición toma una instancia libre o espera en la cola; si ya
+    hay `max_queue` esperando se rechaza de inmediato con LLMOverloadedError.
+    El tiempo en cola y el tiempo de generación se miden por separado.
+    """
+
+    def __init__(self, size: int, max_queue: int, factory: Callable[[ThreadPoolExecutor], LocalLLM]):
+        self.size = size
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="llm")
+        self.instances = [factory(self.executor) for _ in range(size)]
+        self._idle: List[LocalLLM] = list(self.instances)
+        self._waiters: deque = deque()
+        self.rejected = 0
+        self.completed = 0
+        self.queue_waits: deque = deque(maxlen=1000)
+        self.generation_times: deque = deque(maxlen=1000)
+
+    def load(self) -> None:
+        for instance in self.instances:
+            instance.load()
+
+    def prime_prefix(self) -> None:
+        for instance in self.instances:
+            instance.prime_prefix()
+
+    @property
+    def max_prompt_tokens(self) -> int:
+        return self.instances[0].max_prompt_tokens
+
+    def count_tokens(self, text: str) -> int:
+        return self.instances[0].count_tokens(text)
+
+    def _retry_after(self) -> int:
+        """Segundos estimados hasta que se libere lugar en la cola."""
+        if not self.generation_times:
+            return 5
+        avg = sum(self.generation_times) / len(self.generation_times)
+        return max(1, min(60, math.ceil(avg * (len(self._waiters) + 1) / self.size)))
+
+    def saturated(self) -> Optional[int]:
+        """Retry-After si una nueva petición sería rechazada, None si hay lugar."""
+        if not self._idle and len(self._waiters) >= self.max_queue:
+            return self._retry_after()
+        return None
+
+    async def _acquire(self) -> LocalLLM:
+        start = time.perf_counter()
+        if self._idle and not self._waiters:
+            instance = self._idle.pop()
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise LLMOverloadedError(self._retry_after())
+            waiter = asyncio.get_event_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                instance = await waiter
+            except asyncio.CancelledError:
+                # Si ya se le había asignado una instancia, devolverla al pool
+                if waiter.done() and not waiter.cancelled():
+                    self._release(waiter.result())
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        self.queue_waits.append(time.perf_counter() - start)
+        return instance
+
+    def _release(self, instance: LocalLLM) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(instance)
+                return
+        self._idle.append(instance)
+
+    async def generate_async(self, prompt: str) -> str:
+        instance = await self._acquire()
+        start = time.perf_counter()
+        try:
+            return await instance.generate_async(prompt)
+        finally:
+            self.generation_times.append(time.perf_counter() - start)
+            self.completed += 1
+            self._release(instance)
+
+    async def stream_async(self, prompt: str) -> AsyncGenerator[str, None]:
+        instance = await self._acquire()
+        start = time.perf_counter()
+        try:
+            async for token in instance.stream_async(prompt):
+                yield token
+        finally:
+            self.generation_times.append(time.perf_counter() - start)
+            self.completed += 1
+            self._release(instance)
+
+    @staticmethod
+    def _summary_ms(samples: deque) -> Dict[str, float]:
+        if not samples:
+            return {"avg_ms": 0.0, "p95_ms": 0.0}
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return {"avg_ms": round(sum(ordered) / len(ordered) * 1000, 1), "p95_ms": round(p95 * 1000, 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        prefix = [instance.stats() for instance in self.instances]
+        return {
+            "pool_size": self.size,
+            "idle": len(self._idle),
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait": self._summary_ms(self.queue_waits),
+            "generation": self._summary_ms(self.generation_times),
+            "prefix_tokens": prefix[0]["prefix_tokens"] if prefix else 0,
+            "prefix_reused": sum(p["prefix_reused"] for p in prefix),
+            "prefix_restored": sum(p["prefix_restored"] for p in prefix)
+        }
 
 
 # LLM usando Groq API (ultra-rápido y gratuito)
 class GroqLLM:
-    """LLM usando Groq API en la nube - 1-2 segundos por respuesta."""
-    def __init__(self, api_key: str, model: str = "llama-3.1-8b-instant"):
+    """
+    LLM usando Groq API en la nube - 1-2 segundos por respuesta.
+
+    Cliente asíncrono nativo (AsyncGroq sobre httpx) con conexiones keep-alive reutilizadas,
+    límite de tiempo por intento y por petición, reintentos con backoff y jitter ante 429/5xx,
+    y un circuit breaker: con Groq caído las consultas van directo al `fallback` (LocalLLM o MockLLM).
+    """
+    def __init__(self, api_key: str, model: str = "llama-3.1-8b-instant", fallback: Any = None,
+                 base_url: Optional[str] = None, timeout: float = 15.0, deadline: float = 30.0,
+                 max_retries: int = 2, max_connections: int = 20,
+                 breaker: Optional[CircuitBreaker] = None,
+                 tokenizer_path: Optional[str] = None, token_margin: float = 1.3):
         if not api_key:
             raise ValueError("GROQ_API_KEY no está configurada. Obtén una gratis en: https://console.groq.com")
-        self.client = Groq(api_key=api_key)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=min(5.0, timeout))
+        )
+        # Los reintentos los maneja esta clase (con jitter y dentro del deadline)
+        self.client = AsyncGroq(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                                http_client=self.http_client)
         self.model = model
         self.name = f"Groq {model}"
+        self.fallback = fallback if fallback is not None else MockLLM()
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.token_margin = token_margin
+        self.tokenizer = self._load_tokenizer(tokenizer_path)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.fallbacks = 0
     
-    async def generate_async(self, prompt: str) -> str:
-        """Generación asíncrona ultra-rápida con Groq."""
+    @staticmethod
+    def _load_tokenizer(path: Optional[str]) -> Any:
+        if not path:
+            return None
+        if not _TOKENIZERS_AVAILABLE:
+            logger.warning("⚠️ GROQ_TOKENIZER_PATH configurado pero falta el paquete tokenizers; se estiman los tokens")
+            return None
+        try:
+            return Tokenizer.from_file(path)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo abrir el tokenizador de Groq ({e}); se estiman los tokens")
+            return None
+    
+    def count_tokens(self, text: str) -> int:
+        """Tokens reales con el tokenizador del modelo; si no hay, estimación por caracteres con margen."""
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        return math.ceil(estimate_tokens(text) * self.token_margin)
+    
+    # Instrucciones fijas del sistema (src/prompts.py), compartidas por la generación completa y el streaming.
+    # Van siempre idénticas como primer mensaje, así Groq puede cachear ese prefijo entre consultas.
+    SYSTEM_PROMPT = SYSTEM_PROMPT
+
+    def _messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """429, 5xx, timeouts y errores de conexión se reintentan; el resto (401, 400...) no."""
+        if isinstance(error, (asyncio.TimeoutError, groq.APIConnectionError)):
+            return True
+        status = getattr(error, "status_code", None)
+        return status == 429 or (status is not None and status >= 500)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        value = response.headers.get("retry-after") if response is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    async def _create(self, prompt: str, stream: bool, give_up_at: float) -> Any:
+        """Llamada a Groq con reintentos; cada intento queda dentro del deadline total (`give_up_at`, en loop.time())."""
         loop = asyncio.get_event_loop()
-        
-        def _run() -> str:
+        attempt = 0
+        while True:
+            remaining = give_up_at - loop.time()
             try:
-                completion = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": """Sos un asistente virtual del Servicio Nacional de Facilitadoras y Facilitadores Judiciales de Costa Rica.
-
-TU OBJETIVO PRINCIPAL:
-Ayudar al usuario a resolver su problema POR SÍ MISMO, reduciendo la necesidad de contactar facilitadores judiciales. Sos LA SOLUCIÓN, no un intermediario.
-
-TU DOMINIO DE ESPECIALIZACIÓN (CRÍTICO):
-SOLO respondes consultas sobre temas legales y judiciales en Costa Rica:
-✅ Pensiones alimentarias, conciliaciones, problemas laborales, trámites judiciales, derechos, leyes
-❌ Matemáticas, programación, recetas, consejos generales, tareas escolares, etc.
-
-Si te preguntan algo FUERA de tu dominio:
-1. Reconoce amablemente que no es tu área
-2. Explica que te especializás en temas legales/judiciales
-3. Invita al usuario a hacer consultas legales
-4. NO intentes responder temas fuera de tu especialidad
-
-Ejemplo: "Disculpá, pero no soy un asistente matemático. Me especializo en temas legales y judiciales de Costa Rica. ¿Tenés alguna consulta sobre pensiones, trámites judiciales, derechos laborales o algo similar?"
-
-CONTEXTO CONVERSACIONAL (CRÍTICO):
-- SIEMPRE lee y entiende el historial de la conversación COMPLETO
-- Mantén continuidad con el tema que el usuario está consultando
-- Si el usuario pregunta sobre "hacer trámites en otra ciudad", se refiere al MISMO PROBLEMA que ya estaba discutiendo
-- NO cambies de tema a menos que el usuario lo haga explícitamente
-- Adapta tus respuestas al problema ESPECÍFICO que el usuario mencionó inicialmente
-- Para PREGUNTAS DE SEGUIMIENTO: sé más directo y conciso, no repitas toda la info anterior
-
-INSTRUCCIONES DE FORMATO:
-Tu respuesta debe ser natural y bien estructurada. NO uses etiquetas como "**Empatía inicial**".
-
-ESTRUCTURA DE TU RESPUESTA:
-1. Si es primera consulta: Da respuesta completa con todos los pasos
-2. Si es pregunta de seguimiento: Sé DIRECTO y conciso, enfocándote solo en lo nuevo
-3. Incluye información práctica:
-   - Teléfonos y direcciones con REFERENCIAS REALES
-   - Horarios de atención
-   - Documentos específicos si es necesario
-   - Costos si aplica
-4. Termina preguntando: "¿Necesitás que te aclare algo más sobre [tema específico]?"
-
-DIRECCIONES CON REFERENCIAS REALES (IMPORTANTE):
-- NO des solo "Calle X, Avenida Y"
-- SÍ da referencias conocidas: "frente al Parque Central", "100 metros norte del McDonald's", "al lado del Banco Nacional", "diagonal a la Iglesia", etc.
-- Adapta las referencias según la ciudad mencionada
-- Usa puntos de referencia que cualquier persona local conocería
-
-INFORMACIÓN DE CONTACTO REAL EN COSTA RICA:
-- Ministerio de Trabajo: 800-8722256
-- Defensa Pública: 2287-3700
-- PANI: 1147 o 2523-0800
-- Poder Judicial: 2295-3000
-- OIJ: 2295-3643
-- Policía: 911
-- INAMU: 2527-8400
-- CCSS: 2539-0821
-
-IMPORTANTE:
-- MANTÉN CONTINUIDAD: no cambies de tema sin razón
-- Sé COMPLETO: da toda la info para que NO necesiten a un facilitador
-- Da direcciones EXACTAS según la ciudad que mencionen
-- NO ofrezcas contactar facilitadores judiciales
-- NO digas "llámanos" o "contactános"
-- Tu seguimiento debe ser: "¿Qué más puedo aclararte?" (VOS sos la ayuda)
-- Usa lenguaje inclusivo
-
-Si NO tienes información específica, dilo claramente y sugiere dónde buscarla."""
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.7,
-                    max_tokens=1500,  # Aumentado para respuestas más completas
-                    top_p=0.9,
-                    stream=False
+                return await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=self.model,
+                        messages=self._messages(prompt),
+                        temperature=0.7,
+                        max_tokens=1500,  # Aumentado para respuestas más completas
+                        top_p=0.9,
+                        stream=stream
+                    ),
+                    timeout=max(0.1, min(self.timeout, remaining))
                 )
-                return completion.choices[0].message.content.strip()
             except Exception as e:
-                logger.error(f"Error en Groq API: {e}")
-                return f"Lo siento, hubo un error al procesar tu pregunta. Por favor intenta de nuevo."
-        
-        return await loop.run_in_executor(None, _run)
+                delay = jittered_backoff(attempt)
+                retry_after = self._retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if attempt >= self.max_retries or not self._is_retryable(e) or loop.time() + delay >= give_up_at:
+                    raise
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"⚠️ Groq API: {type(e).__name__}, reintento {attempt}/{self.max_retries} en {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def _on_failure(self, error: Exception) -> None:
+        self.failures += 1
+        self.fallbacks += 1
+        self.breaker.record_failure()
+        logger.error(f"Error en Groq API ({type(error).__name__}: {error}), usando {type(self.fallback).__name__}")
+
+    async def generate_async(self, prompt: str) -> str:
+        """Generación asíncrona con Groq; si falla (o el breaker está abierto) responde el respaldo."""
+        self.requests += 1
+        if not self.breaker.allow():
+            self.fallbacks += 1
+            return await self.fallback.generate_async(prompt)
+        probe = self.breaker.state == "half_open"
+        settled = False
+        try:
+            give_up_at = asyncio.get_event_loop().time() + self.deadline
+            completion = await self._create(prompt, stream=False, give_up_at=give_up_at)
+            settled = True
+            self.breaker.record_success()
+            return completion.choices[0].message.content.strip()
+        except Exception as e:
+            settled = True
+            self._on_failure(e)
+            return await self.fallback.generate_async(prompt)
+        finally:
+            if probe and not settled:
+                # Cancelada (CancelledError no es Exception): sin esto el breaker quedaría en half_open para siempre
+                self.breaker.release_probe()
+
+    async def _next_chunk(self, chunks: Any, give_up_at: float) -> Any:
+        """Siguiente chunk del stream, sin esperar más que `timeout` ni pasar del deadline total."""
+        remaining = give_up_at - asyncio.get_event_loop().time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Deadline de Groq agotado durante el stream")
+        return await asyncio.wait_for(chunks.__anext__(), timeout=min(self.timeout, remaining))
+
+    async def stream_async(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Entrega los tokens de Groq a medida que llegan (stream=True), todo dentro del mismo deadline."""
+        self.requests += 1
+        if not self.breaker.allow():
+            self.fallbacks += 1
+            async for token in self.fallback.stream_async(prompt):
+                yield token
+            return
+
+        probe = self.breaker.state == "half_open"
+        emitted = False
+        settled = False
+        stream = None
+        try:
+            give_up_at = asyncio.get_event_loop().time() + self.deadline
+            stream = await self._create(prompt, stream=True, give_up_at=give_up_at)
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await self._next_chunk(chunks, give_up_at)
+                except StopAsyncIteration:
+                    break
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    emitted = True
+                    yield token
+            settled = True
+            self.breaker.record_success()
+            return
+        except Exception as e:
+            settled = True
+            self._on_failure(e)
+            if emitted:
+                # Ya se mandó parte de la respuesta: no se puede empezar otra
+                raise StreamInterruptedError(f"Stream de Groq interrumpido: {type(e).__name__}: {e}") from e
+        finally:
+            if stream is not None:
+                # Cortado, vencido o abandonado: devolver la conexión al pool
+                await stream.close()
+            if probe and not settled:
+                # Cancelada o cliente desconectado (GeneratorExit): liberar la prueba del breaker
+                self.breaker.release_probe()
+        async for token in self.fallback.stream_async(prompt):
+            yield token
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+            "fallback": type(self.fallback).__name__,
+            "circuit_breaker": self.breaker.stats()
+        }
+
+    async def aclose(self) -> None:
+        await self.http_client.aclose()
 
 
 # LLM simulado optimizado
 class MockLLM:
-    def __init__(self):
+    def __init__(self, router: Optional[IntentRouter] = None):
         self.name = "Optimized Mock LLM"
         self.response_cache = {}
+        self.router = router or build_intent_router()
     
     async def generate_async(self, prompt: str) -> str:
         """Generación asíncrona simulada con análisis inteligente."""
@@ -484,7 +990,13 @@ class MockLLM:
         
         # Respuestas para preguntas que no encontraron contexto
         return await self._generate_fallback_response(prompt)
-    
+
+    async def stream_async(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Entrega la respuesta simulada en fragmentos, conservando espacios y saltos de línea."""
+        answer = await self.generate_async(prompt)
+        for token in re.findall(r"\S+\s*|\s+", answer):
+            yield token
+
     def _add_proactive_followup(self, base_response: str, topic: str) -> str:
         """Agrega seguimiento proactivo al final de la respuesta."""
         followup_templates = {
@@ -540,23 +1052,12 @@ Con gusto te ayudo con lo que necesites. ¡Preguntá sin pena! 😊"""
     
     async def _generate_contextual_response(self, prompt: str) -> str:
         """Genera respuesta basada en contexto de documentos."""
-        prompt_lower = prompt.lower()
-        
-        # Analizar el tipo de consulta y extraer ubicación si está presente
-        location_mentioned = None
-        costa_rica_locations = {
-            "san josé": "San José", "cartago": "Cartago", "alajuela": "Alajuela", 
-            "heredia": "Heredia", "puntarenas": "Puntarenas", "guanacaste": "Guanacaste",
-            "limón": "Limón", "liberia": "Liberia", "pérez zeledón": "Pérez Zeledón",
-            "desamparados": "Desamparados", "escazú": "Escazú", "goicoechea": "Goicoechea"
-        }
-        
-        for location, proper_name in costa_rica_locations.items():
-            if location in prompt_lower:
-                location_mentioned = proper_name
-                break
+        # Analizar el tipo de consulta y extraer ubicación si está presente (una sola pasada)
+        intents = self.router.route(prompt)
+        location_mentioned = intents.get("location", [None])[0]
+        topic = intents.get("topic", [None])[0]
         
-        if any(word in prompt_lower for word in ["pensión", "alimentos", "manutención", "hijo", "hija"]):
+        if topic == "pension":
             if location_mentioned:
                 response = f"""Entiendo tu situación con la pensión alimentaria. Como sos de {location_mentioned}, te explico exactamente dónde ir:
 
@@ -641,7 +1142,7 @@ Con gusto te ayudo con lo que necesites. ¡Preguntá sin pena! 😊"""
 💡 **CONSEJO:** Lleva todo organizado y no tengas miedo de preguntar en el juzgado. Es tu derecho y el del menor."""
                 return self._add_proactive_followup(response, "pensión")
         
-        elif any(word in prompt_lower for word in ["laboral", "trabajo", "empleador", "jefe", "salario"]):
+        elif topic == "laboral":
             if location_mentioned:
                 return f"""Entiendo tu situación laboral. Como sos de {location_mentioned}, te explico exactamente dónde ir:
 
@@ -711,7 +1212,7 @@ Con gusto te ayudo con lo que necesites. ¡Preguntá sin pena! 😊"""
 
 💡 **IMPORTANTE:** No esperes, muchos derechos laborales tienen plazos específicos para reclamar."""
         
-        elif any(word in prompt_lower for word in ["facilitador", "conciliación", "mediación"]):
+        elif topic == "facilitador":
             return """Excelente consulta sobre facilitación judicial:
 
 📚 **Marco normativo:**
@@ -784,142 +1285,358 @@ class JudicialBot:
     def __init__(self, persist_dir: str):
         self.persist_dir = persist_dir
         self.vectordb = None
-        self.llm: Any = MockLLM()
-        self.cache = SmartCache()
+        self.vector_store: Optional[NumpyVectorStore] = None
+        self.lexical_index: Optional[BM25Index] = None
         self.precomputed = PrecomputedResponses()
+        self.answer_filter = AnswerFilter(redact_contacts=not ALLOW_CONTACTS)
+        self.llm: Any = MockLLM(self.router)
+        self.prompt_builder = self._make_prompt_builder()
+        self.cache = create_answer_cache()
+        self.semantic_cache = SemanticCache(
+            max_size=SEMANTIC_CACHE_SIZE,
+            ttl=SEMANTIC_CACHE_TTL,
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            near_miss_threshold=SEMANTIC_CACHE_NEAR_MISS
+        )
         self.executor = ThreadPoolExecutor(max_workers=4)
         self.embedder = None
+        self.embed_batcher: Optional[EmbeddingBatcher] = None
         # Gate para usar o no precomputadas segun env
         self.use_precomputed: bool = not DISABLE_PRECOMPUTED
+        # Arranque en caliente: /health reporta ready=false hasta terminar warmup()
+        self.ready = False
+        self.load_timings: Dict[str, float] = {}
+        # Single-flight: tarea en curso por llave de cache y cuántas peticiones se sumaron a una
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self.coalesced = 0
+        # Sube con cada limpieza de caches: una respuesta empezada antes no se guarda después
+        self.cache_epoch = 0
+    
+    @staticmethod
+    def _load_embedder() -> CachedEmbeddings:
+        """Modelo de embeddings envuelto en el cache de consultas."""
+        return CachedEmbeddings(create_embeddings(EMBEDDING_BACKEND, MODEL_EMBED), max_size=QUERY_EMBED_CACHE_SIZE)
         
+    def preload(self) -> None:
+        """
+        Carga síncrona del modelo de embeddings antes de hacer fork (gunicorn --preload).
+        Los pesos quedan compartidos copy-on-write entre workers. Chroma se abre en cada
+        worker durante initialize(), porque su conexión SQLite no se puede heredar.
+        """
+        if self.embedder is None:
+            logger.info("📦 Precargando modelo de embeddings en el proceso maestro...")
+            start = time.perf_counter()
+            self.embedder = self._load_embedder()
+            self._record_timing("embeddings", start)
+    
+    def _record_timing(self, component: str, start: float) -> None:
+        self.load_timings[component] = round(time.perf_counter() - start, 3)
+    
     async def initialize(self):
         """Inicialización asíncrona."""
         try:
             logger.info("🚀 Inicializando sistema...")
             
-            # Cargar embeddings en paralelo
+            # Cargar embeddings en paralelo (salvo que ya vengan precargados del proceso maestro)
             loop = asyncio.get_event_loop()
-            self.embedder = await loop.run_in_executor(
-                self.executor, 
-                lambda: SentenceTransformerEmbeddings(model_name=MODEL_EMBED)
+            if self.embedder is None:
+                start = time.perf_counter()
+                self.embedder = await loop.run_in_executor(self.executor, self._load_embedder)
+                self._record_timing("embeddings", start)
+            self.embed_batcher = EmbeddingBatcher(
+                self.embedder, self.executor,
+                max_batch_size=EMBED_BATCH_MAX_SIZE, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS
             )
             
             # Seleccionar modelo de lenguaje (prioridad: Groq API > Local > MockLLM)
+            # El modelo local (o MockLLM) queda además como respaldo de Groq
+            local_llm: Any = MockLLM(self.router)
+            if _LLAMA_AVAILABLE and os.path.exists(MODEL_PATH):
+                n_gpu_layers = int(os.getenv("N_GPU_LAYERS", "-1"))
+                n_ctx = int(os.getenv("N_CTX", "2048"))
+                prefix_snapshot = PrefixSnapshot()
+                local_llm = LocalLLMPool(
+                    size=LLM_POOL_SIZE,
+                    max_queue=LLM_MAX_QUEUE,
+                    factory=lambda executor: LocalLLM(
+                        model_path=MODEL_PATH, n_ctx=n_ctx, n_threads=NUM_THREADS, n_gpu_layers=n_gpu_layers,
+                        static_prefix=with_system_prefix("", LOCAL_SYSTEM_PROMPT), executor=executor,
+                        prefix_snapshot=prefix_snapshot
+                    )
+                )
+            
             if USE_GROQ_API and _GROQ_AVAILABLE and GROQ_API_KEY:
                 try:
-                    logger.info(f"🚀 Usando Groq API: {GROQ_MODEL} (ultra-rápido)")
-                    self.llm = GroqLLM(api_key=GROQ_API_KEY, model=GROQ_MODEL)
+                    logger.info(f"🚀 Usando Groq API: {GROQ_MODEL} (ultra-rápido), respaldo: {type(local_llm).__name__}")
+                    self.llm = GroqLLM(
+                        api_key=GROQ_API_KEY, model=GROQ_MODEL, fallback=local_llm, base_url=GROQ_BASE_URL,
+                        timeout=GROQ_TIMEOUT, deadline=GROQ_DEADLINE, max_retries=GROQ_MAX_RETRIES,
+                        max_connections=GROQ_MAX_CONNECTIONS,
+                        breaker=CircuitBreaker(GROQ_BREAKER_FAILURES, GROQ_BREAKER_RESET),
+                        tokenizer_path=GROQ_TOKENIZER_PATH, token_margin=GROQ_TOKEN_MARGIN
+                    )
                 except Exception as e:
-                    logger.warning(f"⚠️ Error configurando Groq: {e}. Usando MockLLM")
-                    self.llm = MockLLM()
-            elif _LLAMA_AVAILABLE and os.path.exists(MODEL_PATH):
+                    logger.warning(f"⚠️ Error configurando Groq: {e}. Usando {type(local_llm).__name__}")
+                    self.llm = local_llm
+            elif isinstance(local_llm, LocalLLMPool):
                 logger.info(f"🧠 Usando modelo local GGUF: {MODEL_PATH}")
-                n_gpu_layers = int(os.getenv("N_GPU_LAYERS", "-1"))
-                n_ctx = int(os.getenv("N_CTX", "2048"))
-                self.llm = LocalLLM(model_path=MODEL_PATH, n_ctx=n_ctx, n_threads=NUM_THREADS, n_gpu_layers=n_gpu_layers)
+                logger.info(f"🧠 Pool de {LLM_POOL_SIZE} contextos, cola máxima de {LLM_MAX_QUEUE} peticiones")
+                self.llm = local_llm
             else:
                 logger.warning("⚠️ Usando MockLLM de respaldo (configura GROQ_API_KEY para más flexibilidad)")
 
             # Cargar base de datos vectorial
             if os.path.exists(self.persist_dir):
-                self.vectordb = await loop.run_in_executor(
-                    self.executor,
-                    lambda: Chroma(
-                        persist_directory=self.persist_dir,
-                        embedding_function=self.embedder
+                start = time.perf_counter()
+                if VECTOR_STORE == "numpy":
+                    self.vector_store = await loop.run_in_executor(
+                        self.executor, lambda: NumpyVectorStore.load(NUMPY_VECTORS_DIR)
                     )
-                )
+                    if self.vector_store:
+                        logger.info(f"⚡ Índice vectorial NumPy: {NUMPY_VECTORS_DIR}")
+                    else:
+                        logger.warning("⚠️ Índice NumPy no encontrado (ejecuta scripts/ingest.py), usando Chroma")
                 
-                doc_count = await loop.run_in_executor(
-                    self.executor,
-                    lambda: self.vectordb._collection.count()
-                )
+                if self.vector_store:
+                    doc_count = self.vector_store.count()
+                else:
+                    self.vectordb = await loop.run_in_executor(
+                        self.executor,
+                        lambda: Chroma(
+                            persist_directory=self.persist_dir,
+                            embedding_function=self.embedder
+                        )
+                    )
+                    
+                    doc_count = await loop.run_in_executor(
+                        self.executor,
+                        lambda: self.vectordb._collection.count()
+                    )
                 
+                self._record_timing("vector_store", start)
                 logger.info(f"✅ Sistema inicializado con {doc_count} documentos")
+                
+                if HYBRID_SEARCH_ENABLED:
+                    start = time.perf_counter()
+                    self.lexical_index = await loop.run_in_executor(
+                        self.executor, lambda: BM25Index.load(LEXICAL_INDEX_DIR)
+                    )
+                    self._record_timing("lexical_index", start)
+                    if self.lexical_index:
+                        logger.info(f"🔤 Índice BM25 cargado: {self.lexical_index.num_docs} chunks, {len(self.lexical_index.vocabulary)} términos")
+                    else:
+                        logger.warning("⚠️ Índice BM25 no encontrado (ejecuta scripts/ingest.py), solo búsqueda vectorial")
             else:
                 logger.warning("⚠️ Base de datos vectorial no encontrada, usando solo respuestas precomputadas")
             
+            self.prompt_builder = self._make_prompt_builder()
             return True
             
         except Exception as e:
             logger.error(f"❌ Error en inicialización: {e}")
             return False
     
+    def _make_prompt_builder(self) -> PromptBuilder:
+        """
+        Presupuesto del prompt: PROMPT_MAX_TOKENS (con Groq contado con GroqLLM.count_tokens), y si el
+        LLM (o su respaldo) es el modelo local, además lo que entra en su contexto (con sus instrucciones
+        compactas), contado con su tokenizador. Manda el modelo que deja menos lugar para el mensaje.
+        """
+        candidates = []
+        if not hasattr(self.llm, "max_prompt_tokens"):
+            candidates.append((SYSTEM_PROMPT, PROMPT_MAX_TOKENS, getattr(self.llm, "count_tokens", estimate_tokens)))
+        for llm in (getattr(self.llm, "fallback", None), self.llm):
+            if hasattr(llm, "max_prompt_tokens"):
+                candidates.append((LOCAL_SYSTEM_PROMPT, min(PROMPT_MAX_TOKENS, llm.max_prompt_tokens), llm.count_tokens))
+        system_prompt, limit, count_tokens = min(
+            candidates, key=lambda c: c[1] - c[2](with_system_prefix("", c[0]))
+        )
+        return PromptBuilder(
+            system_prompt, limit, count_tokens,
+            history_window=HISTORY_WINDOW, history_message_tokens=HISTORY_MESSAGE_TOKENS
+        )
+    
+    async def warmup(self) -> None:
+        """
+        Calentamiento antes de recibir tráfico: carga el LLM local (también cuando es el
+        respaldo de Groq, para que la primera consulta con el breaker abierto no pague la carga),
+        hace un embedding y una búsqueda de prueba y precarga en llama.cpp el prefijo fijo del prompt.
+        Al terminar (aunque algún paso falle) marca ready=True.
+        """
+        loop = asyncio.get_event_loop()
+        total_start = time.perf_counter()
+        # Modelos locales a calentar: el principal y/o el respaldo de Groq
+        local_llms = [
+            (name, llm) for name, llm in (("llm", self.llm), ("llm_fallback", getattr(self.llm, "fallback", None)))
+            if hasattr(llm, "load")
+        ]
+        try:
+            for name, llm in local_llms:
+                start = time.perf_counter()
+                await loop.run_in_executor(self.executor, llm.load)
+                self._record_timing(name, start)
+            if local_llms:
+                # Con el modelo cargado, el presupuesto del prompt se cuenta con su tokenizador
+                self.prompt_builder = self._make_prompt_builder()
+            
+            if self.embedder is not None:
+                # Directo al modelo: la pregunta de prueba no debe quedar en el cache ni en las métricas
+                start = time.perf_counter()
+                vector = await loop.run_in_executor(
+                    self.executor, lambda: np.asarray(self.embedder.embedder.embed_query("¿Cómo solicito una pensión alimentaria?"), dtype=np.float32)
+                )
+                self._record_timing("warmup_embedding", start)
+                
+                if self.vectordb or self.vector_store:
+                    start = time.perf_counter()
+                    await loop.run_in_executor(self.executor, lambda: self._hybrid_search("pensión alimentaria", vector, 1))
+                    self._record_timing("warmup_retrieval", start)
+            
+            for name, llm in local_llms:
+                if hasattr(llm, "prime_prefix"):
+                    start = time.perf_counter()
+                    await loop.run_in_executor(self.executor, llm.prime_prefix)
+                    self._record_timing(f"{name}_prefix", start)
+        except Exception as e:
+            logger.error(f"❌ Error en warmup: {e}")
+        finally:
+            self._record_timing("warmup_total", total_start)
+            self.ready = True
+            logger.info(f"🔥 Warmup completo: {self.load_timings}")
+    
     async def search_documents_async(self, query: str, k: int = 2) -> List[Document]:
         """Búsqueda asíncrona de documentos."""
-        if not self.vectordb:
+        return [doc for doc, _ in await self.search_scored_async(query, k)]
+    
+    async def search_scored_async(self, query: str, k: int = 4) -> List[Tuple[Document, Dict[str, Any]]]:
+        """Búsqueda asíncrona de documentos con sus puntajes, de mejor a peor."""
+        if not self.vectordb and not self.vector_store:
             return []
         
         try:
+            query_vector = await self._query_vector(query)
             loop = asyncio.get_event_loop()
             results = await loop.run_in_executor(
                 self.executor,
-                lambda: self.vectordb.similarity_search(query, k=k)
+                lambda: self._hybrid_search(query, query_vector, k)
             )
             return results
         except Exception as e:
             logger.error(f"Error en búsqueda: {e}")
             return []
     
-    def clean_answer(self, raw_text: str) -> str:
-        """Limpia metainstrucciones de la respuesta."""
-        if not raw_text:
-            return ""
-        
-        lines = raw_text.splitlines()
-        cleaned_lines = []
-        
-        # Construir patrones prohibidos, respetando ALLOW_CONTACTS
-        redact_contacts = os.getenv("ALLOW_CONTACTS", "false").lower() != "true"
-        forbidden_patterns = [
-            r"^\s*fuente\s*:",
-            r"^\s*fuentes\s*:",
-            r"^\s*tiempo\s*:",
-            r"estructura\s+sugerida",
-            r"si no hay provincia",
-            r"^\s*contexto\s*:",
-            r"^\s*pregunta\s*:",
-            r"^\s*respuesta\s*:",
-            r"ahora responde",
-            r"respuesta estructurada"
+    async def _query_vector(self, text: str) -> np.ndarray:
+        """Embedding de una pregunta: cache LRU y, si falta, micro-lote con otras preguntas concurrentes."""
+        if self.embed_batcher is not None:
+            return await self.embed_batcher.embed(text)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, lambda: self.embedder.embed_query_vector(text))
+    
+    def _vector_search(self, query_vector: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        """Top-k vectorial como (documento, relevancia 0-1) con el backend configurado."""
+        if self.vector_store:
+            return [
+                (Document(page_content=self.vector_store.chunks[idx]["text"], metadata=self.vector_store.chunks[idx]["metadata"]), score)
+                for idx, score in self.vector_store.search(query_vector, k=k)
+            ]
+        relevance = self.vectordb._select_relevance_score_fn()
+        return [
+            (doc, relevance(distance))
+            for doc, distance in self.vectordb.similarity_search_by_vector_with_relevance_scores(query_vector.tolist(), k=k)
         ]
-        if redact_contacts:
-            forbidden_patterns.append(r"^\s*tel")
-        
-        forbidden_regexes = [re.compile(pat, re.IGNORECASE) for pat in forbidden_patterns]
-        
-        for line in lines:
-            if any(rx.search(line) for rx in forbidden_regexes):
-                continue
-            # Evitar placeholders obvios
-            if "XXXX" in line:
-                continue
-            cleaned_lines.append(line)
+    
+    def _hybrid_search(self, query: str, query_vector: np.ndarray, k: int) -> List[Tuple[Document, Dict[str, Any]]]:
+        """
+        Búsqueda vectorial y BM25 fusionadas por rango recíproco (RRF).
+        Puntajes por chunk: relevance (similitud vectorial 0-1), bm25 y rrf; None si no aplica.
+        El vector de la pregunta viene del cache de embeddings (el mismo que usa el cache semántico).
+        """
+        vector_results = self._vector_search(query_vector, k)
         
-        cleaned = "\n".join(cleaned_lines).strip()
-        cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
+        # El texto del chunk identifica el mismo resultado en ambas listas
+        candidates: Dict[str, Tuple[Document, Dict[str, Any]]] = {}
+        for doc, score in vector_results:
+            candidates.setdefault(doc.page_content, (doc, {"relevance": round(score, 4), "bm25": None, "rrf": None}))
+        if not self.lexical_index:
+            return list(candidates.values())
         
-        # Filtrar números telefónicos (según variable de entorno)
-        if redact_contacts:
-            phone_like = re.compile(r"(?:\+?\d[\d\s().-]{7,}\d)")
-            cleaned = phone_like.sub("[consultar directorio oficial]", cleaned)
+        lexical_keys = []
+        for idx, score in self.lexical_index.search(query, k=k):
+            chunk = self.lexical_index.chunks[idx]
+            _, scores = candidates.setdefault(
+                chunk["text"],
+                (Document(page_content=chunk["text"], metadata=chunk["metadata"]), {"relevance": None, "bm25": None, "rrf": None})
+            )
+            scores["bm25"] = round(score, 4)
+            lexical_keys.append(chunk["text"])
         
-        return cleaned
+        fused = reciprocal_rank_fusion([[doc.page_content for doc, _ in vector_results], lexical_keys], k=RRF_K)
+        results = []
+        for key, rrf_score in fused[:k]:
+            doc, scores = candidates[key]
+            scores["rrf"] = round(rrf_score, 4)
+            results.append((doc, scores))
+        return results
     
-    async def ask_async(self, question: str, history: List[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Procesamiento asíncrono ultra-rápido de preguntas con contexto conversacional."""
-        start_time = time.time()
-        if history is None:
-            history = []
+    def clean_answer(self, raw_text: str) -> str:
+        """Limpia metainstrucciones de la respuesta."""
+        return self.answer_filter.clean(raw_text)
+    
+    def clean_answer_stream(self, tokens: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+        """Versión incremental de clean_answer: filtra línea por línea a medida que llegan los tokens."""
+        return self.answer_filter.stream(tokens)
+    
+    @property
+    def router(self) -> IntentRouter:
+        """Enrutador de intenciones de la versión actual de las respuestas precomputadas."""
+        return self.precomputed.router
+    
+    async def watch_precomputed(self, interval: float) -> None:
+        """Revisa cada `interval` segundos si cambió el archivo de respuestas precomputadas."""
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Leer y compilar fuera del event loop; la instalación es una sola asignación
+                await loop.run_in_executor(self.executor, self.precomputed.reload)
+            except Exception as e:
+                logger.error(f"❌ Error revisando respuestas precomputadas: {e}")
+    
+    def _on_cache_cleared(self) -> None:
+        """Vacía el estado local que depende del cache de respuestas."""
+        self.semantic_cache.clear()
+        self.cache_epoch += 1
+        self._inflight.clear()
+    
+    async def clear_caches(self) -> None:
+        """Limpia el cache de respuestas (L1 y, si hay, el archivo compartido) y el cache semántico."""
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, self.cache.clear)
+        self._on_cache_cleared()
+    
+    async def watch_cache(self, interval: float) -> None:
+        """Revisa cada `interval` segundos si otro worker limpió el cache compartido."""
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await loop.run_in_executor(self.executor, self.cache.sync):
+                    self._on_cache_cleared()
+                    logger.info("🧹 Cache limpiado por otro worker")
+            except Exception as e:
+                logger.error(f"❌ Error revisando el cache compartido: {e}")
+    
+    async def _quick_response(self, question: str, cache_key: str, key_class: str, start_time: float) -> Optional[Dict[str, Any]]:
+        """Respuestas que no necesitan RAG: saludos, preguntas sobre el bot, cache y precomputadas."""
+        # 1. Detectar saludos y consultas simples (ANTES de buscar documentos)
+        # Una sola lectura de la instantánea: enrutador y respuestas de la misma versión
+        faq_version, faq_responses, router = self.precomputed.snapshot
+        intents = router.route(question)
         
-        try:
-            # 1. Detectar saludos y consultas simples (ANTES de buscar documentos)
-            question_lower = question.lower().strip()
-            
-            # Saludos simples
-            if question_lower in ["hola", "buenos días", "buenas tardes", "buenas noches", "hey", "holi", "ola"]:
-                response = {
-                    "answer": """¡Hola! 👋 Soy Chat FJ, del Servicio Nacional de Facilitadoras y Facilitadores Judiciales de Costa Rica.
+        # Saludos simples
+        if "greeting" in intents:
+            response = {
+                "answer": """¡Hola! 👋 Soy Chat FJ, del Servicio Nacional de Facilitadoras y Facilitadores Judiciales de Costa Rica.
 
 Estoy aquí para ayudarte con:
 • Pensiones alimentarias
@@ -930,32 +1647,32 @@ Estoy aquí para ayudarte con:
 • Y mucho más
 
 ¿En qué te puedo ayudar hoy? Contame tu situación.""",
-                    "sources": [],
-                    "processing_time": time.time() - start_time,
-                    "cached": False
-                }
-                self.cache.set(question, response)
-                return response
-            
-            # Despedidas
-            if any(word in question_lower for word in ["adiós", "adios", "chao", "hasta luego", "gracias", "bye"]):
-                response = {
-                    "answer": """¡Con mucho gusto! 😊 
+                "sources": [],
+                "processing_time": time.time() - start_time,
+                "cached": False
+            }
+            self.cache.set(cache_key, response)
+            return response
+        
+        # Despedidas
+        if "farewell" in intents:
+            response = {
+                "answer": """¡Con mucho gusto! 😊 
 
 Si necesitás más ayuda en el futuro, no dudes en volver. Estamos aquí para ayudarte.
 
 ¡Que tengas un excelente día! 🌟""",
-                    "sources": [],
-                    "processing_time": time.time() - start_time,
-                    "cached": False
-                }
-                self.cache.set(question, response)
-                return response
-            
-            # Preguntas sobre el bot
-            if any(phrase in question_lower for phrase in ["quién sos", "quien sos", "qué sos", "que sos", "qué haces", "que haces", "para qué sirves", "para que sirves"]):
-                response = {
-                    "answer": """Soy Chat FJ, un asistente virtual del Servicio Nacional de Facilitadoras y Facilitadores Judiciales de Costa Rica. 🇨🇷
+                "sources": [],
+                "processing_time": time.time() - start_time,
+                "cached": False
+            }
+            self.cache.set(cache_key, response)
+            return response
+        
+        # Preguntas sobre el bot
+        if "about" in intents:
+            response = {
+                "answer": """Soy Chat FJ, un asistente virtual del Servicio Nacional de Facilitadoras y Facilitadores Judiciales de Costa Rica. 🇨🇷
 
 Mi función es:
 ✅ Orientarte en temas legales y judiciales
@@ -971,138 +1688,122 @@ Mi función es:
 💡 **Importante:** Te doy orientación, pero siempre verifica la información con fuentes oficiales.
 
 ¿En qué te puedo ayudar específicamente?""",
-                    "sources": [],
-                    "processing_time": time.time() - start_time,
-                    "cached": False
-                }
-                self.cache.set(question, response)
-                return response
-            
-            # 2. Verificar cache (más rápido)
-            cached_response = self.cache.get(question)
-            if cached_response:
+                "sources": [],
+                "processing_time": time.time() - start_time,
+                "cached": False
+            }
+            self.cache.set(cache_key, response)
+            return response
+        
+        precomputed_answer = None
+        if self.use_precomputed:
+            precomputed_answer = self.precomputed.find_match(intents.get("precomputed", []), faq_responses)
+        else:
+            faq_version = None
+        
+        # 2. Verificar cache (más rápido)
+        cached_response = await self.cache.get_async(cache_key, key_class)
+        if cached_response:
+            # Si cambiaron las precomputadas, no sirven las respuestas precomputadas de otra versión
+            # ni las del LLM para preguntas que ahora tienen respuesta precomputada
+            cached_version = cached_response.get("faq_version")
+            if (cached_version is None and precomputed_answer is None) or cached_version == faq_version:
                 cached_response['processing_time'] = time.time() - start_time
                 return cached_response
-            
-            # 3. Verificar respuestas precomputadas (opcional)
-            if self.use_precomputed:
-                precomputed_answer = self.precomputed.find_match(question)
-                if precomputed_answer:
-                    response = {
-                        "answer": precomputed_answer,
-                        "sources": [],
-                        "processing_time": time.time() - start_time,
-                        "cached": False
-                    }
-                    # Guardar en cache
-                    self.cache.set(question, response)
-                    return response
-            
-            # 4. Procesamiento con RAG (solo para consultas reales)
-            # Intensificar retrieval para respuestas más ricas
-            relevant_docs = await self.search_documents_async(question, k=4)
-            
-            # Crear contexto limitado
-            context = ""
-            sources = []
-            
-            for doc in relevant_docs[:2]:
-                filename = doc.metadata.get('filename', 'Documento')
-                context += f"\n--- {filename} ---\n"
-                context += (doc.page_content[:400] if doc.page_content else "") + "\n"
-                
-                sources.append({
-                    "filename": filename,
-                    "content": doc.page_content[:150] + "...",
-                    "source": doc.metadata.get("source", "Desconocido")
-                })
-            
-            # Detectar ubicación simple en la pregunta para orientar mejor
-            detected_location = None
-            for loc in [
-                "san josé", "cartago", "alajuela", "heredia", "puntarenas",
-                "guanacaste", "limón", "liberia", "pérez zeledón", "desamparados",
-                "escazú", "goicoechea"
-            ]:
-                if loc in question.lower():
-                    detected_location = loc.title()
-                    break
-
-            location_hint = f"Ubicación detectada: {detected_location}. Adapta la guía a esa localidad, menciona oficinas locales y teléfonos oficiales si se permiten." if detected_location else ""
-
-            # Agregar historial de conversación si existe
-            conversation_context = ""
-            if history and len(history) > 0:
-                conversation_context = "\n\n**CONVERSACIÓN PREVIA:**\n"
-                for msg in history[-4:]:  # Solo las últimas 4 interacciones
-                    role_label = "Usuario" if msg.get("role") == "user" else "Tú (Facilitador)"
-                    conversation_context += f"{role_label}: {msg.get('content', '')}\n"
-                conversation_context += "\nConsidera este contexto para dar una respuesta más personalizada y coherente.\n"
-
-            # Crear prompt simplificado para respuestas más rápidas
-            prompt = f"""Sos un asistente virtual del SNFJ. Tu objetivo es que el usuario pueda resolver su problema POR SÍ MISMO.
-
-CRÍTICO - DOMINIO DE ESPECIALIZACIÓN:
-SOLO respondes temas legales/judiciales de Costa Rica. Si preguntan matemáticas, recetas, consejos generales, etc:
-Responde: "Disculpá, me especializo solo en temas legales y judiciales. ¿Tenés alguna consulta sobre pensiones, trámites o derechos?"
-NO respondas temas fuera de tu área.
-
-CRÍTICO - CONTINUIDAD CONVERSACIONAL:
-Lee TODO el historial de conversación. Si el usuario hace una pregunta de seguimiento, mantené el tema original.
-Ejemplo: Si habló de problemas laborales en Alajuela y pregunta por Heredia, sigue con el MISMO tema laboral pero en Heredia.
-
-PREGUNTAS DE SEGUIMIENTO:
-Si el usuario ya tiene contexto (pregunta de seguimiento), SÉ MÁS DIRECTO Y CONCISO. No repitas info ya dada.
-
-DIRECCIONES (MUY IMPORTANTE):
-Da referencias REALES que la gente conoce:
-✅ "Frente al Parque Central de Alajuela"
-✅ "100 metros norte del McDonald's"
-✅ "Al lado del Banco Nacional"
-✅ "Diagonal a la Catedral"
-❌ NO solo: "Calle 2, Avenida 4"
-
-Respondé de forma natural. NO uses etiquetas. 
-
-Da una respuesta:
-1. Reconoce el contexto previo si existe (breve)
-2. Info nueva: teléfonos, direcciones CON REFERENCIAS, horarios
-3. Solo documentos si es necesario
-4. Al final: "¿Necesitás que te aclare algo más sobre [tema específico]?"
-
-NO ofrezcas contactar facilitadores. VOS sos la solución completa.
-
-TELÉFONOS REALES:
-- Ministerio de Trabajo: 800-8722256
-- Defensa Pública: 2287-3700
-- PANI: 1147
-
-{conversation_context}
+        
+        # 3. Respuestas precomputadas (opcional)
+        if precomputed_answer:
+            response = {
+                "answer": precomputed_answer,
+                "sources": [],
+                "processing_time": time.time() - start_time,
+                "cached": False,
+                "faq_version": faq_version
+            }
+            # Guardar en cache
+            self.cache.set(cache_key, response)
+            return response
 
-Contexto legal:
-{context}
+        return None
 
-Pregunta: {question}
+    def _semantic_scope(self, question: str) -> str:
+        """
+        Scope del cache semántico: las ubicaciones que menciona la pregunta. Preguntas casi
+        iguales sobre lugares distintos ("juzgado de Cartago" / "de Limón") no comparten respuesta.
+        """
+        return "|".join(self.router.route(question).get("location", []))
+    
+    async def _embed_question(self, question: str, key_class: str) -> Optional[np.ndarray]:
+        """Embedding de la pregunta para el cache semántico (solo preguntas sin historial)."""
+        # Un seguimiento depende del historial, así que no se compara solo por la pregunta
+        if not SEMANTIC_CACHE_ENABLED or self.embedder is None or key_class != "standalone":
+            return None
+        try:
+            return await self._query_vector(question)
+        except Exception as e:
+            logger.error(f"Error generando embedding para cache semántico: {e}")
+            return None
+    
+    async def _prepare_rag(self, question: str, history: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Busca documentos relevantes y arma el prompt con historial y contexto legal."""
+        # 4. Procesamiento con RAG (solo para consultas reales)
+        # Recuperar candidatos con puntaje y llenar el presupuesto de tokens con los mejores
+        candidates = await self.search_scored_async(question, k=RAG_TOP_K)
+        context_chunks = assemble_context(candidates, RAG_CONTEXT_TOKENS, RAG_MIN_SCORE)
+        
+        # Armar el prompt dentro del presupuesto de tokens (recorta historial y contexto si hace falta)
+        prompt, used = self.prompt_builder.build(
+            question, history,
+            [(doc.metadata.get('filename', 'Documento'), text) for doc, text, _ in context_chunks]
+        )
+        
+        sources = []
+        for doc, text, scores in context_chunks[:used]:
+            sources.append({
+                "filename": doc.metadata.get('filename', 'Documento'),
+                "content": doc.page_content[:150] + "...",
+                "source": doc.metadata.get("source", "Desconocido"),
+                "score": scores.get("relevance"),
+                "bm25_score": scores.get("bm25")
+            })
+        
+        return prompt, sources
 
-Respuesta (clara, con pasos si aplica, y al final ofrecé ayuda adicional):"""
+    async def ask_async(self, question: str, history: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Procesamiento asíncrono ultra-rápido de preguntas con contexto conversacional."""
+        start_time = time.time()
+        if history is None:
+            history = []
+        
+        try:
+            cache_key, key_class = build_cache_key(question, history)
+            quick_response = await self._quick_response(question, cache_key, key_class, start_time)
+            if quick_response:
+                return quick_response
             
-            # Generar respuesta asíncrona
-            answer_raw = await self.llm.generate_async(prompt)
-            answer = self.clean_answer(answer_raw)
+            # Single-flight: preguntas idénticas en curso esperan la misma respuesta en lugar
+            # de repetir búsqueda y LLM. El trabajo corre en su propia tarea, así que si el
+            # cliente que la inició se desconecta, los demás igual reciben la respuesta.
+            task = self._inflight.get(cache_key)
+            if task is not None:
+                self.coalesced += 1
+                response = await asyncio.shield(task)
+                return dict(response, processing_time=time.time() - start_time)
             
-            response = {
-                "answer": answer,
-                "sources": sources,
-                "processing_time": time.time() - start_time,
-                "cached": False
-            }
+            task = asyncio.ensure_future(self._answer(question, history, cache_key, key_class, start_time))
+            self._inflight[cache_key] = task
             
-            # Guardar en cache
-            self.cache.set(question, response)
+            def _release(done: "asyncio.Future") -> None:
+                # Tras /clear-cache la llave puede tener ya otra tarea: solo se quita la propia
+                if self._inflight.get(cache_key) is done:
+                    del self._inflight[cache_key]
             
-            logger.info(f"✅ Respuesta generada en {response['processing_time']:.3f}s")
-            return response
+            task.add_done_callback(_release)
+            return await asyncio.shield(task)
             
+        except LLMOverloadedError:
+            # La API responde 503 con Retry-After
+            raise
         except Exception as e:
             logger.error(f"❌ Error procesando pregunta: {e}")
             return {
@@ -1111,6 +1812,121 @@ Respuesta (clara, con pasos si aplica, y al final ofrecé ayuda adicional):"""
                 "processing_time": time.time() - start_time,
                 "cached": False
             }
+    
+    async def _answer(self, question: str, history: List[Dict[str, Any]], cache_key: str, key_class: str, start_time: float) -> Dict[str, Any]:
+        """Cache semántico, RAG y LLM para una pregunta que no estaba en cache."""
+        epoch = self.cache_epoch
+        question_vector = await self._embed_question(question, key_class)
+        scope = self._semantic_scope(question)
+        if question_vector is not None:
+            semantic_response = self.semantic_cache.get(question_vector, scope)
+            if semantic_response:
+                return dict(semantic_response, processing_time=time.time() - start_time, cached=True)
+        
+        prompt, sources = await self._prepare_rag(question, history)
+        
+        # Generar respuesta asíncrona
+        answer_raw = await self.llm.generate_async(prompt)
+        answer = self.clean_answer(answer_raw)
+        
+        response = {
+            "answer": answer,
+            "sources": sources,
+            "processing_time": time.time() - start_time,
+            "cached": False
+        }
+        
+        # Guardar en cache (salvo que lo hayan limpiado mientras se generaba)
+        if self.cache_epoch == epoch:
+            self.cache.set(cache_key, response)
+            if question_vector is not None:
+                self.semantic_cache.set(question_vector, response, scope)
+        
+        logger.info(f"✅ Respuesta generada en {response['processing_time']:.3f}s")
+        return response
+    
+    async def ask_stream_async(self, question: str, history: List[Dict[str, Any]] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Variante streaming de ask_async.
+        Emite primero las fuentes, luego el texto limpio a medida que el modelo lo genera
+        y por último un evento final con el tiempo total. Si el stream del modelo se corta a mitad,
+        el evento final lleva `incomplete: True` y la respuesta parcial no se guarda en cache.
+        """
+        start_time = time.time()
+        if history is None:
+            history = []
+        
+        epoch = self.cache_epoch
+        try:
+            cache_key, key_class = build_cache_key(question, history)
+            quick_response = await self._quick_response(question, cache_key, key_class, start_time)
+            question_vector = None
+            scope = self._semantic_scope(question)
+            if not quick_response:
+                question_vector = await self._embed_question(question, key_class)
+                if question_vector is not None:
+                    semantic_response = self.semantic_cache.get(question_vector, scope)
+                    if semantic_response:
+                        quick_response = dict(semantic_response, cached=True)
+            if quick_response:
+                yield {"sources": quick_response["sources"], "is_sources": True}
+                yield {"word": quick_response["answer"], "is_final": False}
+                yield {"word": "", "is_final": True, "processing_time": time.time() - start_time, "cached": quick_response["cached"]}
+                return
+            
+            prompt, sources = await self._prepare_rag(question, history)
+            yield {"sources": sources, "is_sources": True}
+            
+            raw_parts: List[str] = []
+            interrupted = False
+            
+            async def _raw_tokens() -> AsyncGenerator[str, None]:
+                nonlocal interrupted
+                try:
+                    async for token in self.llm.stream_async(prompt):
+                        raw_parts.append(token)
+                        yield token
+                except StreamInterruptedError as e:
+                    # Se entrega lo ya recibido (el filtro vacía su última línea) y se avisa al cliente
+                    interrupted = True
+                    logger.warning(f"⚠️ {e}")
+            
+            first_token_time = None
+            async for text in self.clean_answer_stream(_raw_tokens()):
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                yield {"word": text, "is_final": False}
+            
+            if interrupted:
+                # Respuesta incompleta: no se guarda en los caches para no servirla en las repeticiones
+                yield {"word": "\n\n⚠️ La respuesta se interrumpió. Por favor intenta de nuevo.", "is_final": False}
+                yield {"word": "", "is_final": True, "processing_time": time.time() - start_time, "cached": False, "incomplete": True}
+                return
+            
+            response = {
+                "answer": self.clean_answer("".join(raw_parts)),
+                "sources": sources,
+                "processing_time": time.time() - start_time,
+                "cached": False
+            }
+            if self.cache_epoch == epoch:
+                self.cache.set(cache_key, response)
+                if question_vector is not None:
+                    self.semantic_cache.set(question_vector, response, scope)
+            
+            if first_token_time is not None:
+                logger.info(f"✅ Primer token en {first_token_time:.3f}s, respuesta completa en {response['processing_time']:.3f}s")
+            yield {"word": "", "is_final": True, "processing_time": response["processing_time"], "cached": False}
+            
+        except LLMOverloadedError as e:
+            logger.warning(f"⏳ {e}")
+            yield {"word": "Hay muchas consultas en este momento. Por favor intenta de nuevo en unos segundos.", "is_final": False}
+            yield {"word": "", "is_final": True, "processing_time": time.time() - start_time, "cached": False}
+        except Exception as e:
+            logger.error(f"❌ Error procesando pregunta (streaming): {e}")
+            yield {"word": "Disculpa, hubo un error técnico. Por favor intenta de nuevo en un momento.", "is_final": False}
+            yield {"word": "", "is_final": True, "processing_time": time.time() - start_time, "cached": False}
+
 
 # Instancia global del bot
 bot = JudicialBot(PERSIST_DIR)
@@ -1123,9 +1939,30 @@ async def lifespan(app: FastAPI):
     success = await bot.initialize()
     if not success:
         logger.error("❌ Error en inicialización")
+    # El warmup corre en segundo plano: /health responde ready=false (503) mientras tanto
+    warmup_task = asyncio.create_task(bot.warmup()) if WARMUP_ENABLED else None
+    if warmup_task is None:
+        bot.ready = True
+    # Recarga en caliente de data/precomputed_answers.json
+    watch_task = None
+    if bot.use_precomputed and PRECOMPUTED_RELOAD_INTERVAL > 0:
+        watch_task = asyncio.create_task(bot.watch_precomputed(PRECOMPUTED_RELOAD_INTERVAL))
+    # Con varios workers, /clear-cache llega a uno solo: los demás lo notan en el archivo compartido
+    cache_sync_task = None
+    if isinstance(bot.cache, TieredCache) and CACHE_SYNC_INTERVAL > 0:
+        cache_sync_task = asyncio.create_task(bot.watch_cache(CACHE_SYNC_INTERVAL))
     yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if watch_task is not None:
+        watch_task.cancel()
+    if cache_sync_task is not None:
+        cache_sync_task.cancel()
     # Shutdown
     logger.info("👋 Cerrando API...")
+    bot.cache.close()
+    if hasattr(bot.llm, "aclose"):
+        await bot.llm.aclose()
 
 app = FastAPI(
     title="Bot de Facilitadores Judiciales",
@@ -1143,12 +1980,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def enforce_rate_limit(http_request: Request) -> None:
+    """
+    Dependencia de los endpoints de preguntas: 429 con Retry-After si la IP superó el límite.
+    Es síncrona a propósito: FastAPI la corre en el threadpool y el acceso a SQLite no bloquea el event loop.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    client_ip = rate_limit_client(
+        http_request.client.host if http_request.client else "unknown",
+        http_request.headers.get("x-forwarded-for", ""),
+        RATE_LIMIT_TRUSTED_IPS
+    )
+    if client_ip is None:
+        return
+    if not security_manager.check_rate_limit(client_ip):
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiadas consultas seguidas. Intenta de nuevo en un minuto.",
+            headers={"Retry-After": str(60 - int(time.time()) % 60)}
+        )
+
 @app.get("/health")
 async def health_check():
-    """Verificación de salud del sistema."""
+    """Verificación de salud del sistema (503 hasta que termine el warmup)."""
     cache_stats = bot.cache.stats()
-    return {
-        "status": "healthy",
+    body = {
+        "status": "healthy" if bot.ready else "warming_up",
+        "ready": bot.ready,
+        "load_timings": bot.load_timings,
         "version": "2.0.0",
         "timestamp": datetime.now().isoformat(),
         "cache_stats": cache_stats,
@@ -1160,8 +2020,9 @@ async def health_check():
             "Limpieza de respuestas"
         ]
     }
+    return body if bot.ready else JSONResponse(status_code=503, content=body)
 
-@app.post("/ask", response_model=QueryResponse)
+@app.post("/ask", response_model=QueryResponse, dependencies=[Depends(enforce_rate_limit)])
 async def ask_question(request: QueryRequest):
     """Endpoint principal para preguntas con respuestas optimizadas."""
     if not request.question.strip():
@@ -1169,45 +2030,41 @@ async def ask_question(request: QueryRequest):
     
     # Convertir history de Message a dict si es necesario
     history_dicts = [msg.dict() if hasattr(msg, 'dict') else msg for msg in request.history]
-    response = await bot.ask_async(request.question, history=history_dicts)
+    try:
+        response = await bot.ask_async(request.question, history=history_dicts)
+    except LLMOverloadedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Hay muchas consultas en este momento. Intenta de nuevo en unos segundos.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     return QueryResponse(**response)
 
-@app.post("/ask/stream")
+@app.post("/ask/stream", dependencies=[Depends(enforce_rate_limit)])
 async def ask_question_stream(request: QueryRequest):
-    """Endpoint con respuesta streaming para percepción de velocidad."""
+    """Endpoint con streaming real: fuentes primero y luego los tokens del modelo a medida que se generan."""
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="La pregunta no puede estar vacía")
     
+    # Con la cola del modelo local llena, rechazar antes de abrir el stream
+    retry_after = bot.llm.saturated() if isinstance(bot.llm, LocalLLMPool) else None
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=503,
+            detail="Hay muchas consultas en este momento. Intenta de nuevo en unos segundos.",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
     async def generate_stream():
-        # Obtener respuesta completa con historial
+        # Las fuentes llegan como primer evento y el texto a medida que el modelo lo genera
         history_dicts = [msg.dict() if hasattr(msg, 'dict') else msg for msg in request.history]
-        response = await bot.ask_async(request.question, history=history_dicts)
-        answer = response["answer"]
-        
-        # Simular streaming por palabras para percepción de velocidad
-        words = answer.split()
-        for i, word in enumerate(words):
-            chunk = {
-                "word": word,
-                "is_final": i == len(words) - 1,
-                "processing_time": response["processing_time"],
-                "cached": response["cached"]
-            }
-            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
-            await asyncio.sleep(0.05)  # 50ms entre palabras
-        
-        # Enviar fuentes al final
-        if response["sources"]:
-            sources_chunk = {
-                "sources": response["sources"],
-                "is_sources": True
-            }
-            yield f"data: {json.dumps(sources_chunk, ensure_ascii=False)}\n\n"
+        async for event in bot.ask_stream_async(request.question, history=history_dicts):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
     
     return StreamingResponse(
         generate_stream(),
-        media_type="text/plain",
-        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no"}
     )
 
 @app.get("/stats")
@@ -1215,6 +2072,14 @@ async def get_stats():
     """Estadísticas del sistema."""
     return {
         "cache_stats": bot.cache.stats(),
+        "semantic_cache_stats": bot.semantic_cache.stats(),
+        "query_embedding_stats": bot.embedder.stats() if bot.embedder else None,
+        "embedding_batch_stats": bot.embed_batcher.stats() if bot.embed_batcher else None,
+        "llm_stats": bot.llm.stats() if hasattr(bot.llm, "stats") else None,
+        "single_flight": {"coalesced": bot.coalesced, "in_flight": len(bot._inflight)},
+        "precomputed": bot.precomputed.stats(),
+        "prompt_stats": bot.prompt_builder.stats(),
+        "worker_pid": os.getpid(),
         "precomputed_responses": len(bot.precomputed.responses),
         "system_status": "optimal"
     }
@@ -1226,7 +2091,16 @@ async def get_documents():
     sample_docs = []
     
     try:
-        if bot.vectordb:
+        if bot.vector_store:
+            total_docs = bot.vector_store.count()
+            sample_docs = [
+                {
+                    "content": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"],
+                    "id": chunk["id"]
+                }
+                for chunk in bot.vector_store.chunks[:5]
+            ]
+        elif bot.vectordb:
             # Obtener conteo total de documentos
             collection = bot.vectordb._collection
             total_docs = collection.count()
@@ -1246,7 +2120,9 @@ async def get_documents():
         return {
             "total_documents": total_docs,
             "sample_documents": sample_docs,
-            "vector_db_status": "active" if bot.vectordb else "inactive"
+            "vector_db_status": "active" if bot.vectordb or bot.vector_store else "inactive",
+            "vector_store": "numpy" if bot.vector_store else "chroma",
+            "lexical_index_status": "active" if bot.lexical_index else "inactive"
         }
     except Exception as e:
         logger.error(f"Error obteniendo documentos: {e}")
@@ -1259,17 +2135,21 @@ async def get_documents():
 
 @app.post("/clear-cache")
 async def clear_cache():
-    """Limpia el cache del sistema."""
-    bot.cache.clear()
+    """
+    Limpia el cache del sistema. Con CACHE_BACKEND=sqlite los demás workers vacían su parte
+    en memoria en menos de CACHE_SYNC_INTERVAL segundos; con "memory" solo se limpia este worker.
+    """
+    await bot.clear_caches()
     return {"message": "Cache limpiado exitosamente"}
 
 if __name__ == "__main__":
+    # Para varios procesos con modelos compartidos usar: API_WORKERS=N python bin/serve.py
     uvicorn.run(
-        "api:app",
+        "src.api:app",
         host="0.0.0.0",
         port=8000,
         reload=False,
-        workers=1,
+        workers=int(os.getenv("API_WORKERS", "1")),
         loop="asyncio",
         log_level="info"
     )
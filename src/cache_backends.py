@@ -0,0 +1,342 @@
+"""
+Backends persistentes para el cache de respuestas.
+El SmartCache en memoria queda como L1 y un backend en disco como L2,
+compartido entre reinicios y entre procesos.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Interfaz mínima de un backend de cache (L2)."""
+
+    @abstractmethod
+    def get_entry(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(valor, momento en que se guardó) si existe y no ha expirado."""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Guardar un valor."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Vaciar el cache."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del backend."""
+
+    def generation(self) -> int:
+        """Contador que sube con cada clear(); los backends compartidos lo usan para avisar a otros procesos."""
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache en SQLite (modo WAL) con TTL, límite de entradas y escritura diferida.
+
+    set() solo encola la entrada; un hilo escritor la persiste en lotes,
+    así el event loop nunca espera por el disco. Las lecturas consultan
+    primero las escrituras pendientes para no perder entradas recién guardadas.
+    Un lote en escritura y clear() se excluyen (_write_lock): clear() nunca
+    deja que un lote ya tomado vuelva a escribir entradas borradas.
+    clear() además sube un contador de generación en el mismo archivo, así los
+    demás workers saben que deben vaciar su L1 (ver TieredCache.sync).
+    """
+
+    def __init__(self, path: str, ttl: int = 3600, max_entries: int = 10000,
+                 flush_interval: float = 0.5, batch_size: int = 64):
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = self._connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_created ON answers(created)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_meta ("
+            " name TEXT PRIMARY KEY,"
+            " value INTEGER NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('generation', 0)")
+        self._conn.commit()
+        self._read_lock = threading.Lock()
+
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, Tuple[str, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._start_writer()
+
+        # Con gunicorn --preload el backend se crea en el maestro: cada worker
+        # necesita su propia conexión y su propio hilo escritor
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start_writer(self) -> None:
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._writer_loop, name="cache-writer", daemon=True)
+        self._writer.start()
+
+    def _after_fork(self) -> None:
+        if self._closed.is_set():
+            return
+        self._conn = self._connect()
+        self._read_lock = threading.Lock()
+        self._pending, self._inflight = {}, {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._start_writer()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Obtener (valor, creado) si existe y no ha expirado."""
+        now = time.time()
+        with self._pending_lock:
+            entry = self._pending.get(key) or self._inflight.get(key)
+        if entry is None:
+            with self._read_lock:
+                row = self._conn.execute(
+                    "SELECT value, created FROM answers WHERE key = ?", (key,)
+                ).fetchone()
+            entry = (row[0], row[1]) if row else None
+
+        if entry is not None and now - entry[1] < self.ttl:
+            self.hits += 1
+            return json.loads(entry[0]), entry[1]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Encolar una escritura; no toca el disco en el hilo que llama."""
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Respuesta no serializable, no se persiste en cache: {e}")
+            return
+        with self._pending_lock:
+            self._pending[key] = (payload, time.time())
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        while not self._closed.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush(conn)
+        self._flush(conn)
+        conn.close()
+
+    def _flush(self, conn: sqlite3.Connection) -> None:
+        with self._write_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return
+                self._inflight, self._pending = self._pending, {}
+                batch = [(key, payload, created) for key, (payload, created) in self._inflight.items()]
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO answers (key, value, created) VALUES (?, ?, ?)", batch
+                    )
+                    self._evict(conn)
+                self.writes += len(batch)
+            except sqlite3.Error as e:
+                logger.error(f"Error escribiendo cache en disco: {e}")
+            finally:
+                with self._pending_lock:
+                    self._inflight = {}
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Eliminar entradas vencidas y, si sobra espacio, las más antiguas."""
+        conn.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY created ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        """Limpiar cache (pendientes y disco). Espera a que termine el lote en escritura, si hay uno."""
+        with self._write_lock:
+            with self._pending_lock:
+                self._pending.clear()
+                self._inflight.clear()
+            with self._read_lock:
+                with self._conn:
+                    self._conn.execute("DELETE FROM answers")
+                    self._conn.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'")
+
+    def generation(self) -> int:
+        """Cuántas veces se limpió el archivo, por cualquier proceso."""
+        with self._read_lock:
+            (value,) = self._conn.execute(
+                "SELECT value FROM cache_meta WHERE name = 'generation'"
+            ).fetchone()
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del backend en disco."""
+        with self._read_lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total > 0 else 0
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "size": size,
+            "pending_writes": len(self._pending),
+            "writes": self.writes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{hit_rate:.1f}%"
+        }
+
+    def close(self) -> None:
+        """Persistir lo pendiente y cerrar conexiones."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wakeup.set()
+        self._writer.join(timeout=5)
+        self._conn.close()
+
+
+class TieredCache:
+    """
+    Cache de dos niveles: L1 en memoria (SmartCache) delante de un backend L2.
+    Expone la misma interfaz que SmartCache, así JudicialBot no distingue entre ambos.
+    """
+
+    def __init__(self, l1: Any, l2: CacheBackend):
+        self.l1 = l1
+        self.l2 = l2
+        self.hits = 0
+        self.misses = 0
+        # Contadores por clase de llave: {"standalone": [hits, misses], ...}
+        self.class_counts: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self.lock = threading.Lock()
+        self._generation = l2.generation()
+
+    def _promote(self, key: str, entry: Optional[Tuple[Dict[str, Any], float]]) -> Optional[Dict[str, Any]]:
+        """Copia a L1 un acierto de L2 con su hora de creación original (no renueva el TTL)."""
+        if entry is None:
+            return None
+        value, created = entry
+        self.l1.set(key, value, created=created)
+        return value
+
+    def get(self, key: str, key_class: str = "standalone") -> Optional[Dict[str, Any]]:
+        """Buscar en L1 y luego en L2; un acierto en L2 se promueve a L1."""
+        value = self.l1.get(key, key_class)
+        if value is None:
+            value = self._promote(key, self.l2.get_entry(key))
+        self._count(key_class, value)
+        return value
+
+    async def get_async(self, key: str, key_class: str = "standalone") -> Optional[Dict[str, Any]]:
+        """Como get, pero la lectura de L2 (disco) corre en un hilo y no bloquea el event loop."""
+        value = self.l1.get(key, key_class)
+        if value is None:
+            value = self._promote(key, await asyncio.to_thread(self.l2.get_entry, key))
+        self._count(key_class, value)
+        return value
+
+    def _count(self, key_class: str, value: Optional[Dict[str, Any]]) -> None:
+        with self.lock:
+            counts = self.class_counts[key_class]
+            if value is not None:
+                self.hits += 1
+                counts[0] += 1
+            else:
+                self.misses += 1
+                counts[1] += 1
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Guardar en ambos niveles (L2 con escritura diferida)."""
+        self.l1.set(key, value)
+        self.l2.set(key, value)
+
+    def clear(self) -> None:
+        """Limpiar ambos niveles."""
+        self.l1.clear()
+        self.l2.clear()
+        self._generation = self.l2.generation()
+
+    def sync(self) -> bool:
+        """
+        Vacía L1 si otro proceso limpió L2 desde la última revisión.
+        Devuelve True si hubo que vaciar (el llamador limpia también sus caches derivados).
+        """
+        generation = self.l2.generation()
+        if generation == self._generation:
+            return False
+        self._generation = generation
+        self.l1.clear()
+        return True
+
+    @staticmethod
+    def _hit_rate(hits: int, misses: int) -> str:
+        total = hits + misses
+        return f"{(hits / total * 100) if total > 0 else 0:.1f}%"
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas combinadas y por nivel."""
+        with self.lock:
+            by_class = {
+                key_class: {"hits": hits, "misses": misses, "hit_rate": self._hit_rate(hits, misses)}
+                for key_class, (hits, misses) in self.class_counts.items()
+            }
+        l1_stats = self.l1.stats()
+        return {
+            "size": l1_stats["size"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self._hit_rate(self.hits, self.misses),
+            "by_class": by_class,
+            "l1": l1_stats,
+            "l2": self.l2.stats()
+        }
+
+    def close(self) -> None:
+        self.l2.close()
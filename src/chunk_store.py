@@ -0,0 +1,100 @@
+"""
+Almacenamiento de chunks compartible entre procesos.
+
+Cada chunk {"id", "text", "metadata"} se guarda como JSON UTF-8, uno detrás de otro,
+en un solo archivo (chunks.bin); chunk_offsets.npy marca dónde empieza cada uno.
+La API abre ambos archivos con memory-map: los workers comparten las páginas del
+sistema operativo y solo se decodifican los chunks que una búsqueda devuelve.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+
+def staging_directory(target: Path) -> Path:
+    """Directorio temporal vacío junto a `target` donde se arma un índice antes de publicarlo."""
+    tmp = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    return tmp
+
+
+def replace_directory(tmp: Path, target: Path) -> None:
+    """Reemplaza `target` por `tmp` de una vez: la API nunca ve un índice a medio escribir."""
+    old = target.with_name(target.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if target.exists():
+        os.replace(target, old)
+    os.replace(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+class ChunkStore(Sequence):
+    """Secuencia de solo lectura de chunks sobre un blob con offsets."""
+
+    DATA_FILE = "chunks.bin"
+    OFFSETS_FILE = "chunk_offsets.npy"
+    # Formato anterior (una lista JSON completa); se sigue pudiendo abrir
+    LEGACY_FILE = "chunks.json"
+
+    def __init__(self, offsets: np.ndarray, data: Union[np.ndarray, bytes]):
+        self.offsets = offsets
+        self.data = data
+
+    @staticmethod
+    def _encode(chunk: Dict[str, Any]) -> bytes:
+        return json.dumps(chunk, ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_list(cls, chunks: Iterable[Dict[str, Any]]) -> "ChunkStore":
+        """Store en memoria (para índices construidos sin pasar por disco)."""
+        encoded = [cls._encode(chunk) for chunk in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item) for item in encoded])
+        return cls(offsets, b"".join(encoded))
+
+    @classmethod
+    def write(cls, directory: Path, chunks: Iterable[Dict[str, Any]]) -> int:
+        """Escribe los chunks a medida que llegan (sin juntarlos en memoria); retorna cuántos hubo."""
+        directory = Path(directory)
+        offsets: List[int] = [0]
+        with open(directory / cls.DATA_FILE, "wb") as f:
+            for chunk in chunks:
+                offsets.append(offsets[-1] + f.write(cls._encode(chunk)))
+        np.save(directory / cls.OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+        return len(offsets) - 1
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional[Union["ChunkStore", List[Dict[str, Any]]]]:
+        """Abre los chunks con memory-map (None si no existen)."""
+        directory = Path(directory)
+        if not (directory / cls.OFFSETS_FILE).exists():
+            legacy = directory / cls.LEGACY_FILE
+            if not legacy.exists():
+                return None
+            # Índice exportado antes de este formato: se lee completo hasta la próxima ingesta
+            with open(legacy, "r", encoding="utf-8") as f:
+                return json.load(f)
+        offsets = np.load(directory / cls.OFFSETS_FILE, mmap_mode="r")
+        data_path = directory / cls.DATA_FILE
+        # np.memmap no acepta archivos vacíos (índice sin chunks)
+        data = np.memmap(data_path, dtype=np.uint8, mode="r") if data_path.stat().st_size else b""
+        return cls(offsets, data)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk fuera de rango")
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return json.loads(bytes(self.data[start:end]).decode("utf-8"))
@@ -0,0 +1,305 @@
+"""
+Modelos de embeddings, cache y micro-lotes de consultas.
+
+- create_embeddings(): backend seleccionable (torch, onnx, onnx-int8) con la misma interfaz de LangChain.
+- CachedEmbeddings: LRU de embeddings de preguntas, compartido por la búsqueda y el cache semántico.
+- EmbeddingBatcher: agrupa las consultas concurrentes en una sola pasada del modelo.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.normalization import fold_text
+
+logger = logging.getLogger(__name__)
+
+# ONNX Runtime para servir embeddings en CPU sin cargar PyTorch
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    _ONNX_AVAILABLE = True
+except ImportError:
+    _ONNX_AVAILABLE = False
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_MODEL_FILES = {"onnx": "model.onnx", "onnx-int8": "model-int8.onnx"}
+# Largo máximo de secuencia de all-MiniLM-L6-v2 (igual que sentence-transformers)
+MAX_SEQ_LENGTH = 256
+
+
+def onnx_model_dir(model_name: str) -> Path:
+    """Carpeta del modelo exportado por scripts/export_onnx.py."""
+    default = Path("models") / "embeddings" / model_name.split("/")[-1]
+    return Path(os.getenv("EMBEDDING_ONNX_DIR", str(default)))
+
+
+class OnnxEmbeddings:
+    """
+    MiniLM exportado a ONNX (opcionalmente cuantizado a int8).
+    Reproduce el pipeline de sentence-transformers: mean pooling sobre la máscara
+    de atención y normalización L2, así los vectores son compatibles con el índice existente.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, batch_size: int = 32,
+                 num_threads: Optional[int] = None):
+        model_path = Path(model_dir) / ONNX_MODEL_FILES["onnx-int8" if quantized else "onnx"]
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {inp.name for inp in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+        self.model_path = str(model_path)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self._encode(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+def _torch_embeddings(model_name: str, batch_size: int) -> Any:
+    try:
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+    except ImportError:
+        from langchain.embeddings import SentenceTransformerEmbeddings
+    return SentenceTransformerEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+
+
+def create_embeddings(backend: str, model_name: str, batch_size: int = 32) -> Any:
+    """
+    Crea el modelo de embeddings del backend pedido (EMBEDDING_BACKEND).
+    Si el backend ONNX no está disponible (falta onnxruntime o el modelo exportado) se usa torch.
+    """
+    backend = backend.lower()
+    if backend not in EMBEDDING_BACKENDS:
+        logger.warning(f"⚠️ EMBEDDING_BACKEND desconocido '{backend}', usando torch")
+        backend = "torch"
+
+    if backend != "torch":
+        model_dir = onnx_model_dir(model_name)
+        model_file = model_dir / ONNX_MODEL_FILES[backend]
+        if not _ONNX_AVAILABLE:
+            logger.warning("⚠️ onnxruntime/tokenizers no instalados, usando embeddings con torch")
+        elif not model_file.exists():
+            logger.warning(f"⚠️ No existe {model_file} (ejecuta scripts/export_onnx.py), usando embeddings con torch")
+        else:
+            logger.info(f"⚡ Embeddings con ONNX Runtime: {model_file}")
+            return OnnxEmbeddings(str(model_dir), quantized=backend == "onnx-int8", batch_size=batch_size)
+
+    return _torch_embeddings(model_name, batch_size)
+
+
+class CachedEmbeddings:
+    """
+    Envoltura de un modelo de embeddings (interfaz de LangChain) con un LRU
+    acotado para embed_query. La llave es el texto normalizado, así que
+    "¿Qué es?" y "que es" comparten vector. Los vectores se guardan en float32.
+    """
+
+    def __init__(self, embedder: Any, max_size: int = 1000):
+        self.embedder = embedder
+        self.max_size = max_size
+        self.vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    @staticmethod
+    def key(text: str) -> str:
+        return fold_text(text)
+
+    def lookup(self, key: str) -> Optional[np.ndarray]:
+        """Vector ya calculado para la llave (cuenta como acierto) o None."""
+        with self.lock:
+            vector = self.vectors.get(key)
+            if vector is not None:
+                self.vectors.move_to_end(key)
+                self.hits += 1
+            return vector
+
+    def count_hit(self) -> None:
+        """Acierto servido fuera de lookup (p. ej. una consulta que esperó el lote de otra)."""
+        with self.lock:
+            self.hits += 1
+
+    def _store(self, keys: List[str], vectors: List[np.ndarray], elapsed: float) -> None:
+        with self.lock:
+            self.misses += len(keys)
+            self.encode_seconds += elapsed
+            for key, vector in zip(keys, vectors):
+                self.vectors[key] = vector
+                self.vectors.move_to_end(key)
+            while len(self.vectors) > self.max_size:
+                self.vectors.popitem(last=False)
+
+    def encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Codifica varias consultas en una sola pasada del modelo y las guarda en el cache."""
+        start = time.perf_counter()
+        matrix = np.asarray(self.embedder.embed_documents(texts), dtype=np.float32)
+        elapsed = time.perf_counter() - start
+        matrix.setflags(write=False)
+        vectors = list(matrix)
+        self._store([self.key(text) for text in texts], vectors, elapsed)
+        return vectors
+
+    def embed_query_vector(self, text: str) -> np.ndarray:
+        """Vector float32 de la consulta, desde el cache si ya se codificó."""
+        key = self.key(text)
+        vector = self.lookup(key)
+        if vector is not None:
+            return vector
+
+        start = time.perf_counter()
+        vector = np.asarray(self.embedder.embed_query(text), dtype=np.float32)
+        elapsed = time.perf_counter() - start
+        vector.setflags(write=False)
+        self._store([key], [vector], elapsed)
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        """Interfaz de LangChain: misma consulta, misma lista de floats."""
+        return self.embed_query_vector(text).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Los documentos no se cachean: se codifican una sola vez durante la ingesta."""
+        return self.embedder.embed_documents(texts)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.vectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Aciertos, fallos y latencia promedio de codificación."""
+        with self.lock:
+            total = self.hits + self.misses
+            hit_rate = (self.hits / total * 100) if total > 0 else 0
+            avg_ms = (self.encode_seconds / self.misses * 1000) if self.misses else 0.0
+            return {
+                "size": len(self.vectors),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": f"{hit_rate:.1f}%",
+                "avg_encode_ms": round(avg_ms, 2),
+                "encode_seconds_saved": round(self.hits * avg_ms / 1000, 2)
+            }
+
+
+class EmbeddingBatcher:
+    """
+    Agrupa los embeddings de consultas concurrentes en micro-lotes.
+
+    Cada consulta que no está en el cache espera hasta `max_wait_ms` (o hasta
+    juntar `max_batch_size`) y el lote completo se codifica con una sola llamada
+    a embed_documents en el executor. Consultas iguales comparten el mismo futuro.
+    Se usa solo desde el event loop.
+    """
+
+    def __init__(self, embeddings: CachedEmbeddings, executor: Optional[Executor] = None,
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending: "OrderedDict[str, Tuple[str, asyncio.Future]]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.batched_queries = 0
+        self.max_seen_batch = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Vector float32 de la consulta (cache, lote en curso o nuevo lote)."""
+        key = self.embeddings.key(text)
+        vector = self.embeddings.lookup(key)
+        if vector is not None:
+            return vector
+
+        future = self.inflight.get(key)
+        if future is None and key in self.pending:
+            future = self.pending[key][1]
+        if future is not None:
+            self.embeddings.count_hit()
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.pending[key] = (text, future)
+            if len(self.pending) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait, self._flush)
+        # shield: si una petición se cancela, el resto del lote sigue esperando el resultado
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.pending:
+            return
+        batch = list(self.pending.items())
+        self.pending.clear()
+        for key, (_, future) in batch:
+            self.inflight[key] = future
+        asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, Tuple[str, asyncio.Future]]]) -> None:
+        texts = [text for _, (text, _) in batch]
+        self.batches += 1
+        self.batched_queries += len(texts)
+        self.max_seen_batch = max(self.max_seen_batch, len(texts))
+        try:
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(self.executor, self.embeddings.encode_batch, texts)
+            for (_, (_, future)), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            for _, (_, future) in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key, _ in batch:
+                self.inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cantidad de lotes y tamaño promedio."""
+        avg = self.batched_queries / self.batches if self.batches else 0.0
+        return {
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "avg_batch_size": round(avg, 2),
+            "max_batch_size_seen": self.max_seen_batch,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
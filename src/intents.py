@@ -0,0 +1,116 @@
+"""
+Enrutador de intenciones: detecta saludos, despedidas, temas, respuestas precomputadas
+y ubicaciones en una sola pasada sobre el texto normalizado.
+
+Todas las frases se compilan en una expresión regular con forma de trie
+("pension(?:es)?|pago" -> "p(?:ension(?:es)?|ago)"), así el costo por consulta depende
+del largo del texto y no de cuántas frases haya registradas.
+
+Una frase coincide con palabras completas ("chao" no encuentra "chaos"); terminada en
+"*" coincide también como inicio de palabra ("hijo*" encuentra "hijos" e "hijo").
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.normalization import fold_text
+
+# Fin de una frase en el trie: "" exige fin de palabra, "*" admite que la palabra siga
+_WORD_END = ""
+_PREFIX_END = "*"
+
+
+def _trie_regex(phrases: Iterable[Tuple[str, bool]]) -> str:
+    """
+    Expresión regular equivalente a la alternancia de `phrases` (frase, como_prefijo),
+    con prefijos compartidos. Las frases completas deben terminar en fin de palabra.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase, as_prefix in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[_PREFIX_END if as_prefix else _WORD_END] = {}
+
+    def walk(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + walk(child) for ch, child in sorted(node.items())
+                    if ch not in (_WORD_END, _PREFIX_END)]
+        # Fin de frase en este nodo: la continuación es opcional (y codiciosa, gana la más larga)
+        if _PREFIX_END in node:
+            end = ""
+        elif _WORD_END in node:
+            end = "(?= |$)"
+        else:
+            end = None
+        if end is not None:
+            branches.append(end)
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return walk(trie)
+
+
+class IntentRouter:
+    """
+    Detecta intenciones por frases clave sobre texto normalizado con fold_text.
+
+    `groups` es {grupo: {etiqueta: [frases]}}. Una frase coincide si aparece en el texto
+    como palabras completas ("hijo" no encuentra "hijos" ni "prohijo"); con "*" al final
+    basta con que empiece una palabra ("hijo*" encuentra "hijos", no "prohijo").
+    Los grupos en `exact_groups` solo coinciden si el texto completo es la frase ("hola").
+
+    route() devuelve {grupo: [etiquetas]} con las etiquetas en el orden en que se declararon,
+    para que cada llamador aplique su propia prioridad.
+    """
+
+    def __init__(self, groups: Dict[str, Dict[str, Iterable[str]]], exact_groups: Optional[Set[str]] = None):
+        exact_groups = exact_groups or set()
+        self._order: Dict[Tuple[str, str], int] = {}
+        self._exact: Dict[str, List[Tuple[str, str]]] = {}
+        labels_by_phrase: Dict[Tuple[str, bool], List[Tuple[str, str]]] = {}
+
+        for group, labels in groups.items():
+            for label, phrases in labels.items():
+                self._order.setdefault((group, label), len(self._order))
+                for phrase in phrases:
+                    as_prefix = phrase.rstrip().endswith(_PREFIX_END)
+                    folded = fold_text(phrase)
+                    if not folded:
+                        continue
+                    if group in exact_groups:
+                        self._exact.setdefault(folded, []).append((group, label))
+                    else:
+                        labels_by_phrase.setdefault((folded, as_prefix), []).append((group, label))
+
+        # La regex devuelve la frase más larga que empieza en cada palabra; las frases más cortas
+        # que empiezan ahí son prefijos de esa y también coinciden si son "*" o si terminan donde
+        # termina una palabra de la frase larga. Cada frase hereda esas etiquetas: (siempre, solo
+        # si el texto sigue con fin de palabra), lo segundo para la frase completa de igual texto.
+        self._labels: Dict[str, Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]] = {}
+        for phrase, _ in labels_by_phrase:
+            always: List[Tuple[str, str]] = []
+            for end in range(1, len(phrase) + 1):
+                always.extend(labels_by_phrase.get((phrase[:end], True), ()))
+                if end < len(phrase) and phrase[end] == " ":
+                    always.extend(labels_by_phrase.get((phrase[:end], False), ()))
+            self._labels[phrase] = (always, labels_by_phrase.get((phrase, False), []))
+
+        self.num_phrases = len(labels_by_phrase) + len(self._exact)
+        self._pattern = None
+        if labels_by_phrase:
+            self._pattern = re.compile(r"(?:^|(?<= ))(?=(" + _trie_regex(labels_by_phrase) + "))")
+
+    def route(self, text: str) -> Dict[str, List[str]]:
+        """Todas las intenciones presentes en el texto, agrupadas."""
+        folded = fold_text(text)
+        found = set(self._exact.get(folded, ()))
+        if self._pattern is not None:
+            for match in self._pattern.finditer(folded):
+                always, at_word_end = self._labels[match.group(1)]
+                found.update(always)
+                if match.end(1) == len(folded) or folded[match.end(1)] == " ":
+                    found.update(at_word_end)
+
+        result: Dict[str, List[str]] = {}
+        for group, label in sorted(found, key=self._order.__getitem__):
+            result.setdefault(group, []).append(label)
+        return result
@@ -0,0 +1,23 @@
+"""
+Normalización de texto compartida por el cache y la detección de consultas.
+"""
+
+import re
+import unicodedata
+
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+
+
+def fold_text(text: str) -> str:
+    """
+    Normaliza texto para comparaciones: minúsculas, sin tildes,
+    sin signos de puntuación y con espacios colapsados.
+
+    "¿Cuánto dura?" -> "cuanto dura"
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_accents = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    without_punctuation = _PUNCTUATION.sub(" ", without_accents.lower())
+    return " ".join(without_punctuation.split())
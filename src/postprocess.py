@@ -0,0 +1,123 @@
+"""
+Post-procesamiento de las respuestas del LLM: quita líneas con metainstrucciones
+("Fuente:", "Contexto:", "Ahora responde"...), colapsa líneas en blanco y oculta teléfonos.
+
+AnswerFilter se construye una vez al arrancar y compila todos los patrones prohibidos
+en una sola alternancia. El mismo filtro sirve para respuestas completas (clean) y para
+tokens en streaming (stream), con el mismo resultado en ambos casos.
+"""
+
+import re
+from typing import AsyncGenerator, AsyncIterator, List
+
+# Líneas que empiezan con estas etiquetas ("Fuente:", "Respuesta :") se descartan
+FORBIDDEN_LABELS = ["fuente", "fuentes", "tiempo", "contexto", "pregunta", "respuesta"]
+# Líneas que contienen estas frases en cualquier parte se descartan
+FORBIDDEN_PHRASES = [r"estructura\s+sugerida", "si no hay provincia", "ahora responde", "respuesta estructurada"]
+# Placeholder obvio (distingue mayúsculas)
+PLACEHOLDER = "XXXX"
+PHONE_REPLACEMENT = "[consultar directorio oficial]"
+
+# \s sin saltos de línea: cada patrón se evalúa dentro de una sola línea
+_SPACE = r"[^\S\n]"
+
+
+class _LineAssembler:
+    """Une las líneas que sobreviven al filtro: sin espacios finales y con una sola línea en blanco entre párrafos."""
+
+    def __init__(self):
+        self.started = False
+        self.pending_blank = False
+
+    def push(self, line: str) -> str:
+        line = line.rstrip()
+        if not line:
+            self.pending_blank = self.started
+            return ""
+        if not self.started:
+            self.started = True
+            return line.lstrip()
+        separator = "\n\n" if self.pending_blank else "\n"
+        self.pending_blank = False
+        return separator + line
+
+
+class AnswerFilter:
+    """Filtro de respuestas precompilado; `redact_contacts` equivale a ALLOW_CONTACTS=false."""
+
+    def __init__(self, redact_contacts: bool = True):
+        self.redact_contacts = redact_contacts
+        labels = FORBIDDEN_LABELS + (["tel"] if redact_contacts else [])
+        label_alternatives = [rf"{label}{_SPACE}*:" if label != "tel" else label for label in labels]
+        phrases = [phrase.replace(r"\s", _SPACE) for phrase in FORBIDDEN_PHRASES]
+        # Se busca sobre el texto en minúsculas: re.IGNORECASE hace mucho más lenta la alternancia
+        self._forbidden = re.compile(
+            rf"^{_SPACE}*(?:{'|'.join(label_alternatives)})|{'|'.join(phrases)}",
+            re.MULTILINE
+        )
+        self._phone = re.compile(r"[+\d](?<!\+(?!\d))[\d().\- \t\r\f\v]{7,}\d") if redact_contacts else None
+
+    def is_forbidden(self, line: str) -> bool:
+        return self._forbidden.search(line.lower()) is not None or PLACEHOLDER in line
+
+    def _drop_forbidden(self, text: str) -> str:
+        """Quita las líneas prohibidas con una sola búsqueda sobre todo el texto."""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Algunos caracteres cambian de largo al pasar a minúsculas: las posiciones no sirven
+            return "\n".join(line for line in text.split("\n") if not self.is_forbidden(line))
+
+        starts = [match.start() for match in self._forbidden.finditer(lowered)]
+        position = text.find(PLACEHOLDER)
+        while position != -1:
+            starts.append(position)
+            position = text.find(PLACEHOLDER, position + 1)
+        if not starts:
+            return text
+
+        pieces: List[str] = []
+        kept_from = 0
+        for start in sorted(starts):
+            line_start = text.rfind("\n", 0, start) + 1
+            if line_start < kept_from:
+                continue  # otra coincidencia en una línea ya descartada
+            pieces.append(text[kept_from:line_start])
+            line_end = text.find("\n", start)
+            kept_from = len(text) if line_end == -1 else line_end + 1
+        pieces.append(text[kept_from:])
+        return "".join(pieces)
+
+    def clean(self, text: str) -> str:
+        """Limpia una respuesta completa."""
+        if not text:
+            return ""
+        assembler = _LineAssembler()
+        cleaned = "".join([assembler.push(line) for line in self._drop_forbidden(text).split("\n")])
+        if self._phone is not None:
+            cleaned = self._phone.sub(PHONE_REPLACEMENT, cleaned)
+        return cleaned
+
+    async def stream(self, tokens: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """Versión incremental de clean: filtra línea por línea a medida que llegan los tokens."""
+        assembler = _LineAssembler()
+        buffer = ""
+
+        def _process(line: str) -> str:
+            if self.is_forbidden(line):
+                return ""
+            out = assembler.push(line)
+            if out and self._phone is not None:
+                out = self._phone.sub(PHONE_REPLACEMENT, out)
+            return out
+
+        async for token in tokens:
+            buffer += token
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                out = _process(line)
+                if out:
+                    yield out
+        if buffer:
+            out = _process(buffer)
+            if out:
+                yield out
@@ -0,0 +1,235 @@
+"""
+Plantillas de prompt y armado del prompt RAG dentro de un presupuesto de tokens.
+
+Las instrucciones fijas existen una sola vez: Groq recibe SYSTEM_PROMPT como mensaje de
+sistema (prefijo estable que el proveedor puede cachear) y el modelo local recibe la versión
+compacta LOCAL_SYSTEM_PROMPT como prefijo del prompt (estado KV reutilizado), para que en su
+contexto (N_CTX) quede lugar para el historial y el contexto legal. El mensaje de cada
+consulta lleva solo historial, contexto legal y pregunta.
+
+El mensaje tiene secciones con distinta prioridad: las instrucciones y la plantilla
+nunca se recortan; después va la pregunta, luego el contexto legal y por último el
+historial de conversación. Si no alcanza el presupuesto se recorta primero lo de menor
+prioridad: mensajes viejos del historial, mensajes largos (se dejan inicio y final),
+los chunks de contexto de menor rango y, solo en casos extremos, la pregunta.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from src.retrieval import estimate_tokens
+
+SYSTEM_PROMPT = """Sos un asistente virtual del Servicio Nacional de Facilitadoras y Facilitadores Judiciales (SNFJ) de Costa Rica.
+
+TU OBJETIVO PRINCIPAL:
+Ayudar al usuario a resolver su problema POR SÍ MISMO, reduciendo la necesidad de contactar facilitadores judiciales. Sos LA SOLUCIÓN, no un intermediario.
+
+TU DOMINIO DE ESPECIALIZACIÓN (CRÍTICO):
+SOLO respondes consultas sobre temas legales y judiciales en Costa Rica:
+✅ Pensiones alimentarias, conciliaciones, problemas laborales, trámites judiciales, derechos, leyes
+❌ Matemáticas, programación, recetas, consejos generales, tareas escolares, etc.
+
+Si te preguntan algo FUERA de tu dominio, reconocé amablemente que no es tu área, explicá que te especializás en temas legales/judiciales e invitá a hacer consultas legales. NO intentes responderlo.
+Ejemplo: "Disculpá, pero no soy un asistente matemático. Me especializo en temas legales y judiciales de Costa Rica. ¿Tenés alguna consulta sobre pensiones, trámites judiciales, derechos laborales o algo similar?"
+
+CONTEXTO CONVERSACIONAL (CRÍTICO):
+- SIEMPRE lee y entiende el historial de la conversación (CONVERSACIÓN PREVIA) COMPLETO
+- Mantén continuidad con el tema que el usuario está consultando; NO cambies de tema a menos que el usuario lo haga explícitamente
+- Si el usuario pregunta sobre "hacer trámites en otra ciudad", se refiere al MISMO PROBLEMA. Ejemplo: si habló de problemas laborales en Alajuela y pregunta por Heredia, sigue con el MISMO tema laboral pero en Heredia
+- Para PREGUNTAS DE SEGUIMIENTO: sé más directo y conciso, no repitas toda la info anterior
+
+CONTEXTO LEGAL:
+Cada consulta trae fragmentos de documentos oficiales ("Contexto legal"). Basá tu respuesta en ellos. Si NO tienes información específica, dilo claramente y sugiere dónde buscarla.
+
+ESTRUCTURA DE TU RESPUESTA:
+Tu respuesta debe ser natural y bien estructurada. NO uses etiquetas como "**Empatía inicial**".
+1. Si es primera consulta: Da respuesta completa con todos los pasos
+2. Si es pregunta de seguimiento: reconoce el contexto previo (breve) y enfocate solo en lo nuevo
+3. Incluye información práctica: teléfonos, direcciones CON REFERENCIAS, horarios; documentos y costos solo si aplica
+4. Termina preguntando: "¿Necesitás que te aclare algo más sobre [tema específico]?"
+
+DIRECCIONES CON REFERENCIAS REALES (IMPORTANTE):
+- NO des solo "Calle 2, Avenida 4"
+- SÍ da referencias conocidas: "frente al Parque Central", "100 metros norte del McDonald's", "al lado del Banco Nacional", "diagonal a la Catedral", etc.
+- Adapta las referencias según la ciudad mencionada: puntos que cualquier persona local conocería
+
+INFORMACIÓN DE CONTACTO REAL EN COSTA RICA:
+- Ministerio de Trabajo: 800-8722256
+- Defensa Pública: 2287-3700
+- PANI: 1147 o 2523-0800
+- Poder Judicial: 2295-3000
+- OIJ: 2295-3643
+- Policía: 911
+- INAMU: 2527-8400
+- CCSS: 2539-0821
+
+IMPORTANTE:
+- Sé COMPLETO: da toda la info para que NO necesiten a un facilitador
+- NO ofrezcas contactar facilitadores judiciales
+- NO digas "llámanos" o "contactános": VOS sos la ayuda
+- Usa lenguaje inclusivo"""
+
+# Versión compacta para el modelo local: con N_CTX=2048 las instrucciones completas dejan
+# muy poco lugar para el historial y el contexto legal
+LOCAL_SYSTEM_PROMPT = """Sos un asistente virtual del Servicio Nacional de Facilitadoras y Facilitadores Judiciales (SNFJ) de Costa Rica. Ayudá al usuario a resolver su problema POR SÍ MISMO: VOS sos la solución, no ofrezcas contactar facilitadores.
+
+SOLO respondés temas legales y judiciales de Costa Rica. Si preguntan otra cosa (matemáticas, recetas, consejos generales), respondé: "Disculpá, me especializo solo en temas legales y judiciales. ¿Tenés alguna consulta sobre pensiones, trámites o derechos?"
+
+Leé toda la CONVERSACIÓN PREVIA y mantené el tema: si habló de un problema laboral en Alajuela y pregunta por Heredia, seguí con el MISMO tema en Heredia. En preguntas de seguimiento sé directo y no repitas lo ya dicho.
+
+Basá la respuesta en el "Contexto legal"; si no tenés la información, decilo y sugerí dónde buscarla.
+
+Respondé de forma natural, sin etiquetas, con lenguaje inclusivo:
+1. Pasos concretos; teléfonos, horarios y direcciones con referencias conocidas ("frente al Parque Central", "100 metros norte del Banco Nacional"), no solo "Calle 2, Avenida 4"
+2. Documentos y costos solo si aplica
+3. Al final: "¿Necesitás que te aclare algo más sobre [tema específico]?"
+
+TELÉFONOS: Ministerio de Trabajo 800-8722256, Defensa Pública 2287-3700, PANI 1147, Poder Judicial 2295-3000, Policía 911"""
+
+# El modelo local recibe las instrucciones como prefijo del prompt, separadas del mensaje
+SYSTEM_SEPARATOR = "\n\n"
+HISTORY_HEADER = "**CONVERSACIÓN PREVIA:**\n"
+HISTORY_FOOTER = "\nConsidera este contexto para dar una respuesta más personalizada y coherente.\n\n"
+CONTEXT_HEADER = "Contexto legal:\n"
+QUESTION_HEADER = "\n\nPregunta: "
+ANSWER_CUE = "\n\nRespuesta (clara, con pasos si aplica, y al final ofrecé ayuda adicional):"
+ELLIPSIS = " [...] "
+
+# Registro único de plantillas (scripts/report_prompt_tokens.py cuenta sus tokens)
+PROMPT_TEMPLATES: Dict[str, str] = {
+    "system": SYSTEM_PROMPT,
+    "system_local": LOCAL_SYSTEM_PROMPT,
+    "system_separator": SYSTEM_SEPARATOR,
+    "history_header": HISTORY_HEADER,
+    "history_footer": HISTORY_FOOTER,
+    "context_header": CONTEXT_HEADER,
+    "question_header": QUESTION_HEADER,
+    "answer_cue": ANSWER_CUE,
+}
+
+
+def with_system_prefix(message: str, system_prompt: str = SYSTEM_PROMPT) -> str:
+    """Prompt completo para modelos sin mensajes de sistema (llama.cpp): instrucciones + mensaje."""
+    return system_prompt + SYSTEM_SEPARATOR + message
+
+
+class PromptBuilder:
+    """
+    Mensaje de la consulta = historial + contexto + pregunta. Junto con las instrucciones
+    de sistema no pasa de `max_prompt_tokens`.
+
+    `count_tokens` es el tokenizador del modelo (llama.cpp) o la estimación por caracteres.
+    Los tokens de las partes fijas se cuentan una sola vez al crear el builder.
+    """
+
+    def __init__(self, system_prompt: str, max_prompt_tokens: int,
+                 count_tokens: Callable[[str], int] = estimate_tokens,
+                 history_window: int = 4, history_message_tokens: int = 200, safety_tokens: int = 32):
+        self.system_prompt = system_prompt
+        self.max_prompt_tokens = max_prompt_tokens
+        self.count_tokens = count_tokens
+        self.history_window = history_window
+        self.history_message_tokens = history_message_tokens
+        self.static_tokens = count_tokens(
+            with_system_prefix(CONTEXT_HEADER + QUESTION_HEADER + ANSWER_CUE, system_prompt)
+        ) + safety_tokens
+        self.history_frame_tokens = count_tokens(HISTORY_HEADER + HISTORY_FOOTER)
+
+        self.lock = threading.Lock()
+        self.builds = 0
+        self.total_tokens = 0
+        self.truncated = {"question": 0, "context": 0, "history": 0}
+
+    def _truncate(self, text: str, max_tokens: int, keep_tail: bool = True) -> str:
+        """Recorta `text` a `max_tokens` conservando el inicio (y el final si keep_tail)."""
+        if max_tokens <= 0:
+            return ""
+        tokens = self.count_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        size = int(len(text) * max_tokens / tokens)
+        while size > 0:
+            if keep_tail:
+                candidate = text[:size // 2].rstrip() + ELLIPSIS + text[len(text) - size // 2:].lstrip()
+            else:
+                candidate = text[:size].rstrip() + ELLIPSIS.rstrip()
+            if self.count_tokens(candidate) <= max_tokens:
+                return candidate
+            size = int(size * 0.9)
+        return ""
+
+    def build(self, question: str, history: Sequence[Dict[str, Any]],
+              context_sections: Sequence[Tuple[str, str]]) -> Tuple[str, int]:
+        """
+        Arma el mensaje de la consulta (sin las instrucciones de sistema).
+        `context_sections` son (título, texto) de mejor a peor.
+        Devuelve (mensaje, cantidad de secciones de contexto incluidas).
+        """
+        available = self.max_prompt_tokens - self.static_tokens
+        truncated = set()
+
+        # 1. Pregunta: completa salvo que sea enorme (texto pegado); nunca más de la mitad del espacio
+        question_text = self._truncate(question, max(available // 2, 1))
+        if question_text != question:
+            truncated.add("question")
+        available -= self.count_tokens(question_text)
+
+        # 2. Contexto legal: los mejores chunks primero; el primero que no entra se recorta
+        context_parts: List[str] = []
+        for title, text in context_sections:
+            header = f"\n--- {title} ---\n"
+            cost = self.count_tokens(header + text + "\n")
+            if cost > available:
+                text = self._truncate(text, available - self.count_tokens(header) - 1, keep_tail=False)
+                truncated.add("context")
+                if text:
+                    context_parts.append(header + text + "\n")
+                    available -= self.count_tokens(context_parts[-1])
+                break
+            context_parts.append(header + text + "\n")
+            available -= cost
+
+        # 3. Historial: del mensaje más nuevo al más viejo, mientras quepa
+        history_lines: List[str] = []
+        window = list(history)[-self.history_window:] if history else []
+        if window and available > self.history_frame_tokens:
+            available -= self.history_frame_tokens
+            for msg in reversed(window):
+                role_label = "Usuario" if msg.get("role") == "user" else "Tú (Facilitador)"
+                content = str(msg.get("content", ""))
+                short = self._truncate(content, self.history_message_tokens)
+                line = f"{role_label}: {short}\n"
+                cost = self.count_tokens(line)
+                if cost > available:
+                    truncated.add("history")
+                    break
+                if short != content:
+                    truncated.add("history")
+                history_lines.append(line)
+                available -= cost
+        elif window:
+            truncated.add("history")
+
+        conversation = ""
+        if history_lines:
+            conversation = HISTORY_HEADER + "".join(reversed(history_lines)) + HISTORY_FOOTER
+
+        message = (f"{conversation}{CONTEXT_HEADER}{''.join(context_parts)}"
+                   f"{QUESTION_HEADER}{question_text}{ANSWER_CUE}")
+
+        with self.lock:
+            self.builds += 1
+            self.total_tokens += self.max_prompt_tokens - available
+            for section in truncated:
+                self.truncated[section] += 1
+        return message, len(context_parts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "max_prompt_tokens": self.max_prompt_tokens,
+                "static_tokens": self.static_tokens,
+                "builds": self.builds,
+                "avg_prompt_tokens": round(self.total_tokens / self.builds, 1) if self.builds else 0,
+                "truncated": dict(self.truncated)
+            }
@@ -0,0 +1,77 @@
+"""
+Utilidades de resiliencia para llamadas a servicios externos (Groq API):
+backoff exponencial con jitter y circuit breaker.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+def jittered_backoff(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Espera antes del reintento `attempt` (0, 1, 2...): full jitter sobre base·2^attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas a un servicio que viene fallando.
+
+    closed    -> llamadas normales; `failure_threshold` fallos seguidos lo abren.
+    open      -> se rechazan las llamadas (se usa el respaldo) durante `reset_timeout` segundos.
+    half_open -> pasa una llamada de prueba: si funciona se cierra, si falla se vuelve a abrir.
+                 Si la prueba se cancela sin resultado, `release_probe` deja pasar otra.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """¿Se puede intentar la llamada ahora?"""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """La llamada terminó sin éxito ni fallo (cancelada, cliente desconectado): libera la prueba."""
+        with self.lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened
+            }
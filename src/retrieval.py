@@ -0,0 +1,247 @@
+"""
+Recuperación léxica (BM25) y fusión con la búsqueda vectorial.
+
+El índice BM25 se construye durante la ingesta a partir de los chunks de Chroma
+y se guarda como arreglos de NumPy (y los textos en un ChunkStore) que la API abre
+con memory-map al iniciar.
+Complementa a all-MiniLM-L6-v2 en términos exactos: números de artículo,
+nombres de instituciones y vocabulario legal en español.
+"""
+
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.chunk_store import ChunkStore, replace_directory, staging_directory
+from src.normalization import fold_text
+
+
+# Palabras vacías del español (ya sin tildes, como las deja fold_text)
+STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante
+e el ella ellas ellos en entre era es esa ese eso esta estas este esto estos fue ha hay hasta
+la las le les lo los mas me mi mis mucho muy ni no nos o otra otras otro otros para pero poco
+por porque que quien quienes se sea ser si sin sobre son su sus tambien te ti todo todos tu tus
+un una uno unos y ya yo
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados para BM25: sin tildes, sin puntuación y sin palabras vacías."""
+    return [token for token in fold_text(text).split() if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Índice invertido con puntaje BM25 sobre arreglos contiguos.
+
+    Postings de todos los términos concatenados en `postings_docs` / `postings_tf`,
+    con `term_offsets[t]:term_offsets[t+1]` delimitando los del término t.
+    """
+
+    FILES = ("term_offsets.npy", "postings_docs.npy", "postings_tf.npy", "doc_lengths.npy")
+
+    def __init__(self, vocabulary: Dict[str, int], term_offsets: np.ndarray,
+                 postings_docs: np.ndarray, postings_tf: np.ndarray, doc_lengths: np.ndarray,
+                 chunks: Sequence[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.vocabulary = vocabulary
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_tf = postings_tf
+        self.doc_lengths = doc_lengths
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(chunks)
+        self.avg_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+
+    @staticmethod
+    def _collect(chunks: Iterable[Dict[str, Any]], postings: Dict[str, List[Tuple[int, int]]],
+                 doc_lengths: List[int]) -> Iterator[Dict[str, Any]]:
+        """Acumula postings y largos de cada chunk y lo vuelve a entregar (para escribirlo al pasar)."""
+        for doc_idx, chunk in enumerate(chunks):
+            tokens = tokenize(chunk["text"])
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_idx, tf))
+            yield chunk
+
+    @staticmethod
+    def _arrays(postings: Dict[str, List[Tuple[int, int]]]) -> Tuple[Dict[str, int], np.ndarray, np.ndarray, np.ndarray]:
+        """Vocabulario y postings concatenados en arreglos contiguos."""
+        vocabulary = {term: term_id for term_id, term in enumerate(sorted(postings))}
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        total = sum(len(entries) for entries in postings.values())
+        postings_docs = np.empty(total, dtype=np.int32)
+        postings_tf = np.empty(total, dtype=np.float32)
+
+        offset = 0
+        for term, term_id in vocabulary.items():
+            entries = postings[term]
+            term_offsets[term_id] = offset
+            postings_docs[offset:offset + len(entries)] = [doc_idx for doc_idx, _ in entries]
+            postings_tf[offset:offset + len(entries)] = [tf for _, tf in entries]
+            offset += len(entries)
+        term_offsets[len(vocabulary)] = offset
+        return vocabulary, term_offsets, postings_docs, postings_tf
+
+    @classmethod
+    def build(cls, chunks: Iterable[Dict[str, Any]]) -> "BM25Index":
+        """Construye el índice en memoria desde chunks {"id", "text", "metadata"}."""
+        chunks = list(chunks)
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths: List[int] = []
+        for _ in cls._collect(chunks, postings, doc_lengths):
+            pass
+        return cls(*cls._arrays(postings), np.asarray(doc_lengths, dtype=np.float32), chunks)
+
+    @classmethod
+    def write(cls, directory: str, chunks: Iterable[Dict[str, Any]]) -> int:
+        """
+        Como build + save, pero sin juntar los chunks en memoria: cada uno se indexa y se
+        escribe al disco a medida que llega. Retorna cuántos chunks se indexaron.
+        """
+        target = Path(directory)
+        tmp = staging_directory(target)
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths: List[int] = []
+        count = ChunkStore.write(tmp, cls._collect(chunks, postings, doc_lengths))
+        cls._save_arrays(tmp, *cls._arrays(postings), np.asarray(doc_lengths, dtype=np.float32))
+        replace_directory(tmp, target)
+        return count
+
+    @classmethod
+    def _save_arrays(cls, directory: Path, vocabulary: Dict[str, int], *arrays: np.ndarray) -> None:
+        for name, array in zip(cls.FILES, arrays):
+            np.save(directory / name, array)
+        with open(directory / "vocabulary.json", "w", encoding="utf-8") as f:
+            json.dump(vocabulary, f, ensure_ascii=False)
+
+    def save(self, directory: str) -> None:
+        """Guarda el índice; escribe en un directorio temporal y lo reemplaza de una vez."""
+        target = Path(directory)
+        tmp = staging_directory(target)
+        self._save_arrays(tmp, self.vocabulary, self.term_offsets, self.postings_docs,
+                          self.postings_tf, self.doc_lengths)
+        ChunkStore.write(tmp, self.chunks)
+        replace_directory(tmp, target)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        """Abre el índice con memory-map (None si no existe)."""
+        path = Path(directory)
+        if not (path / "vocabulary.json").exists():
+            return None
+        arrays = [np.load(path / name, mmap_mode="r") for name in cls.FILES]
+        with open(path / "vocabulary.json", "r", encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        return cls(vocabulary, *arrays, chunks=ChunkStore.load(path) or [])
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """Top-k (índice de chunk, puntaje) para la consulta."""
+        if not self.num_docs:
+            return []
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            matched = True
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end]
+            df = end - start
+            idf = np.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / self.avg_length)
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        if not matched:
+            return []
+
+        k = min(k, self.num_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(idx), float(scores[idx])) for idx in top if scores[idx] > 0]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fusión por rango recíproco: score(d) = sum(1 / (k + rango)).
+    Solo usa posiciones, así que no hace falta calibrar BM25 contra similitud coseno.
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+# Aproximación de tokens para español con los tokenizadores de Llama/Phi (sin cargar el tokenizador)
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens de un texto."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _overlap_length(left: str, right: str, min_overlap: int = 30, max_overlap: int = 400) -> int:
+    """Largo del sufijo de `left` que es prefijo de `right` (solapamiento del splitter)."""
+    for size in range(min(max_overlap, len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def assemble_context(candidates: Sequence[Tuple[Any, Dict[str, Any]]], token_budget: int,
+                     min_score: float = 0.0, min_tail_tokens: int = 48) -> List[Tuple[Any, str, Dict[str, Any]]]:
+    """
+    Arma el contexto del prompt con los mejores chunks hasta llenar `token_budget`.
+
+    `candidates` viene ordenado de mejor a peor como (documento, puntajes), donde
+    puntajes["relevance"] es la similitud vectorial (None si el chunk solo llegó por BM25).
+    - Descarta chunks con relevancia menor a `min_score` salvo que tengan coincidencia léxica.
+    - Quita el texto repetido entre chunks vecinos del mismo archivo y omite los contenidos en otro.
+    - Empaca de forma voraz; el último chunk se recorta si quedan al menos `min_tail_tokens`.
+
+    Devuelve [(documento, texto a usar, puntajes)].
+    """
+    selected: List[Tuple[Any, str, Dict[str, Any]]] = []
+    remaining = token_budget
+
+    for doc, scores in candidates:
+        relevance = scores.get("relevance")
+        if relevance is not None and relevance < min_score and scores.get("bm25") is None:
+            continue
+        text = (doc.page_content or "").strip()
+        source = doc.metadata.get("source")
+
+        for other_doc, other_text, _ in selected:
+            if other_doc.metadata.get("source") != source or not text:
+                continue
+            if text in other_text:
+                text = ""
+                break
+            text = text[_overlap_length(other_text, text):]
+            tail = _overlap_length(text, other_text)
+            if tail:
+                text = text[:-tail]
+        text = text.strip()
+        if not text:
+            continue
+
+        tokens = estimate_tokens(text)
+        if tokens > remaining:
+            if remaining < min_tail_tokens:
+                continue
+            text = text[:remaining * CHARS_PER_TOKEN].rsplit(" ", 1)[0] + "…"
+            tokens = remaining
+        selected.append((doc, text, scores))
+        remaining -= tokens
+        if remaining < min_tail_tokens:
+            break
+
+    return selected
@@ -0,0 +1,124 @@
+"""
+Cache semántico de respuestas.
+Reutiliza respuestas de preguntas parafraseadas comparando embeddings
+con similitud coseno sobre una matriz contigua de NumPy.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Cache de respuestas indexado por el embedding de la pregunta.
+
+    Los vectores se guardan normalizados en una matriz float32 preasignada
+    (max_size x dim), así que una búsqueda es un solo producto matriz-vector.
+    Evicción por TTL y, cuando se llena, por el slot usado hace más tiempo (LRU).
+
+    Cada entrada lleva un `scope` (por ejemplo las ubicaciones de la pregunta) y solo se
+    compara con preguntas del mismo scope: "juzgado de Cartago" y "juzgado de Limón" tienen
+    embeddings casi iguales pero no pueden compartir respuesta.
+    """
+
+    def __init__(self, max_size: int = 500, ttl: int = 3600,
+                 threshold: float = 0.92, near_miss_threshold: float = 0.85):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.near_miss_threshold = near_miss_threshold
+        self.matrix: Optional[np.ndarray] = None
+        self.values: List[Optional[Dict[str, Any]]] = [None] * max_size
+        self.created = np.zeros(max_size, dtype=np.float64)
+        self.last_used = np.zeros(max_size, dtype=np.float64)
+        self.occupied = np.zeros(max_size, dtype=bool)
+        # Scope de cada slot como entero (-1 = libre) y su tabla de equivalencias
+        self.scope_ids = np.full(max_size, -1, dtype=np.int32)
+        self._scopes: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def get(self, vector: Sequence[float], scope: str = "") -> Optional[Dict[str, Any]]:
+        """Retorna la respuesta de la pregunta más parecida del mismo scope si supera el umbral."""
+        query = self._normalize(vector)
+        now = time.time()
+        with self.lock:
+            scope_id = self._scopes.get(scope)
+            if self.matrix is None or scope_id is None or not self.occupied.any():
+                self.misses += 1
+                return None
+
+            # Expirar entradas vencidas antes de comparar
+            expired = self.occupied & (now - self.created >= self.ttl)
+            if expired.any():
+                for slot in np.flatnonzero(expired):
+                    self.values[slot] = None
+                self.occupied[expired] = False
+
+            scores = self.matrix @ query
+            scores[~self.occupied | (self.scope_ids != scope_id)] = -1.0
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+
+            if score >= self.threshold:
+                self.hits += 1
+                self.last_used[best] = now
+                return self.values[best]
+            if score >= self.near_miss_threshold:
+                self.near_misses += 1
+            self.misses += 1
+            return None
+
+    def set(self, vector: Sequence[float], value: Dict[str, Any], scope: str = "") -> None:
+        """Guarda una respuesta junto al embedding de su pregunta y su scope."""
+        vec = self._normalize(vector)
+        now = time.time()
+        with self.lock:
+            if self.matrix is None:
+                self.matrix = np.zeros((self.max_size, vec.shape[0]), dtype=np.float32)
+
+            free = np.flatnonzero(~self.occupied)
+            if free.size:
+                slot = int(free[0])
+            else:
+                # Lleno: reemplazar el menos usado recientemente
+                slot = int(np.argmin(self.last_used))
+
+            self.matrix[slot] = vec
+            self.values[slot] = value
+            self.scope_ids[slot] = self._scopes.setdefault(scope, len(self._scopes))
+            self.created[slot] = now
+            self.last_used[slot] = now
+            self.occupied[slot] = True
+
+    def clear(self) -> None:
+        """Limpiar cache."""
+        with self.lock:
+            self.values = [None] * self.max_size
+            self.occupied[:] = False
+            self.scope_ids[:] = -1
+            self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del cache semántico."""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total > 0 else 0
+        return {
+            "size": int(self.occupied.sum()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "near_misses": self.near_misses,
+            "hit_rate": f"{hit_rate:.1f}%",
+            "threshold": self.threshold
+        }
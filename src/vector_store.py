@@ -0,0 +1,130 @@
+"""
+Índice vectorial en memoria con NumPy (alternativa a Chroma para corpus pequeños).
+
+scripts/ingest.py exporta los embeddings de Chroma a una matriz float32 normalizada
+(embeddings.npy) más los textos y metadatos en un ChunkStore. La API abre ambos con
+memory-map y responde el top-k con un producto matricial y argpartition.
+"""
+
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.chunk_store import ChunkStore, replace_directory, staging_directory
+
+
+class NumpyVectorStore:
+    """Búsqueda exacta por similitud coseno sobre una matriz contigua."""
+
+    MATRIX_FILE = "embeddings.npy"
+
+    def __init__(self, matrix: np.ndarray, chunks: Sequence[Dict[str, Any]]):
+        self.matrix = matrix
+        self.chunks = chunks
+
+    @classmethod
+    def build(cls, embeddings: Sequence[Sequence[float]], chunks: List[Dict[str, Any]]) -> "NumpyVectorStore":
+        """Crea el índice desde los embeddings y los chunks {"id", "text", "metadata"}."""
+        if not chunks:
+            return cls(np.zeros((0, 0), dtype=np.float32), [])
+        matrix = cls._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(chunks), -1))
+        return cls(np.ascontiguousarray(matrix), chunks)
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.clip(norms, 1e-12, None)
+
+    @classmethod
+    def write(cls, directory: str, count: int,
+              pages: Iterable[Tuple[Sequence[Sequence[float]], List[Dict[str, Any]]]]) -> int:
+        """
+        Como build + save, pero por páginas (embeddings, chunks) de un total de `count`:
+        cada página se normaliza directo sobre un memmap del .npy y sus chunks se escriben
+        al pasar, así la memoria depende del tamaño de página y no del corpus.
+        """
+        target = Path(directory)
+        tmp = staging_directory(target)
+        matrix: Optional[np.memmap] = None
+        rows = 0
+
+        def _chunks() -> Iterator[Dict[str, Any]]:
+            nonlocal matrix, rows
+            for embeddings, page_chunks in pages:
+                if not page_chunks:
+                    continue
+                page = np.asarray(embeddings, dtype=np.float32).reshape(len(page_chunks), -1)
+                if matrix is None:
+                    matrix = np.lib.format.open_memmap(
+                        tmp / cls.MATRIX_FILE, mode="w+", dtype=np.float32, shape=(count, page.shape[1])
+                    )
+                if rows + len(page) > count:
+                    raise ValueError(f"Se esperaban {count} embeddings y llegaron más")
+                matrix[rows:rows + len(page)] = cls._normalize(page)
+                rows += len(page)
+                yield from page_chunks
+
+        ChunkStore.write(tmp, _chunks())
+        if rows != count:
+            raise ValueError(f"Se esperaban {count} embeddings y llegaron {rows}")
+        if matrix is None:
+            np.save(tmp / cls.MATRIX_FILE, np.zeros((0, 0), dtype=np.float32))
+        else:
+            matrix.flush()
+            del matrix
+        replace_directory(tmp, target)
+        return rows
+
+    def save(self, directory: str) -> None:
+        """Guarda matriz y metadatos en un directorio temporal y lo reemplaza de una vez."""
+        target = Path(directory)
+        tmp = staging_directory(target)
+        np.save(tmp / self.MATRIX_FILE, self.matrix)
+        ChunkStore.write(tmp, self.chunks)
+        replace_directory(tmp, target)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["NumpyVectorStore"]:
+        """Abre la matriz y los chunks con memory-map (None si no existe)."""
+        path = Path(directory)
+        if not (path / cls.MATRIX_FILE).exists():
+            return None
+        matrix = np.load(path / cls.MATRIX_FILE, mmap_mode="r")
+        return cls(matrix, ChunkStore.load(path) or [])
+
+    def count(self) -> int:
+        return len(self.chunks)
+
+    @staticmethod
+    def relevance(cosine: np.ndarray) -> np.ndarray:
+        """
+        Misma escala de relevancia que Chroma (distancia L2 al cuadrado) con LangChain:
+        1 - d / sqrt(2), con d = 2 - 2·coseno para vectores normalizados.
+        Así RAG_MIN_SCORE significa lo mismo con ambos backends.
+        """
+        return 1.0 - (2.0 - 2.0 * cosine) / math.sqrt(2)
+
+    def search_batch(self, vectors: np.ndarray, k: int = 4) -> List[List[Tuple[int, float]]]:
+        """Top-k (índice de chunk, relevancia) para varias consultas con un solo producto matricial."""
+        if not self.chunks:
+            return [[] for _ in range(len(vectors))]
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        scores = queries @ self.matrix.T
+
+        k = min(k, len(self.chunks))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        relevance = self.relevance(np.take_along_axis(top_scores, order, axis=1))
+        return [
+            [(int(idx), float(score)) for idx, score in zip(row_idx, row_scores)]
+            for row_idx, row_scores in zip(top, relevance)
+        ]
+
+    def search(self, vector: Sequence[float], k: int = 4) -> List[Tuple[int, float]]:
+        """Top-k (índice de chunk, relevancia) para una consulta."""
+        return self.search_batch(np.asarray(vector, dtype=np.float32)[None, :], k)[0]
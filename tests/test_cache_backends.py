@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Pruebas del cache persistente (src/cache_backends.py): TTL, límite de entradas,
+escritura diferida, persistencia entre reinicios, clear() durante un lote en
+escritura, promoción de L2 a L1 sin renovar el TTL y aviso de clear() a otros procesos.
+
+Uso: python tests/test_cache_backends.py
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.cache_backends import CacheBackend, SQLiteCacheBackend, TieredCache
+
+
+def make_backend(directory: str, **kwargs) -> SQLiteCacheBackend:
+    kwargs.setdefault("flush_interval", 0.05)
+    return SQLiteCacheBackend(str(Path(directory) / "answers.sqlite3"), **kwargs)
+
+
+def wait_flushed(backend: SQLiteCacheBackend, timeout: float = 2.0) -> None:
+    deadline = time.time() + timeout
+    while backend.stats()["pending_writes"] and time.time() < deadline:
+        time.sleep(0.01)
+    # El lote ya salió de _pending; esperar a que termine de escribirse
+    with backend._write_lock:
+        pass
+
+
+def disk_count(backend: SQLiteCacheBackend) -> int:
+    with backend._read_lock:
+        (count,) = backend._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+    return count
+
+
+def test_backend_is_abstract():
+    try:
+        CacheBackend()
+    except TypeError:
+        return
+    raise AssertionError("CacheBackend no debería poder instanciarse")
+
+
+def test_ttl_expiry():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = make_backend(directory, ttl=1)
+        try:
+            backend.set("k", {"answer": "hola"})
+            assert backend.get("k") == {"answer": "hola"}
+            time.sleep(1.1)
+            assert backend.get("k") is None
+        finally:
+            backend.close()
+
+
+def test_eviction_keeps_newest():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = make_backend(directory, max_entries=3)
+        try:
+            for i in range(5):
+                backend.set(f"k{i}", {"answer": i})
+                time.sleep(0.01)
+            wait_flushed(backend)
+            assert disk_count(backend) == 3
+            assert backend.get("k0") is None and backend.get("k1") is None
+            assert backend.get("k4") == {"answer": 4}
+        finally:
+            backend.close()
+
+
+def test_write_behind_flush():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = make_backend(directory, flush_interval=60, batch_size=2)
+        try:
+            backend.set("a", {"answer": "a"})
+            # Todavía no está en disco, pero ya se puede leer
+            assert disk_count(backend) == 0
+            assert backend.get("a") == {"answer": "a"}
+            # Al completar el lote el escritor lo persiste sin esperar el intervalo
+            backend.set("b", {"answer": "b"})
+            wait_flushed(backend)
+            assert disk_count(backend) == 2
+            assert backend.stats()["writes"] == 2
+        finally:
+            backend.close()
+
+
+def test_restart_persistence():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = make_backend(directory, flush_interval=60)
+        backend.set("k", {"answer": "persistida"})
+        backend.close()  # close() escribe lo pendiente
+
+        reopened = make_backend(directory)
+        try:
+            assert reopened.get("k") == {"answer": "persistida"}
+        finally:
+            reopened.close()
+
+
+class SlowConnection:
+    """Envuelve la conexión del escritor y frena executemany para simular un lote lento."""
+
+    def __init__(self, conn, started: threading.Event):
+        self._conn = conn
+        self._started = started
+
+    def executemany(self, *args):
+        self._started.set()
+        time.sleep(0.3)
+        return self._conn.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+
+def test_clear_during_flush_does_not_resurrect():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = make_backend(directory, flush_interval=60)
+        try:
+            backend.set("k", {"answer": "vieja"})
+            started = threading.Event()
+            conn = SlowConnection(backend._connect(), started)
+            flusher = threading.Thread(target=backend._flush, args=(conn,))
+            flusher.start()
+            assert started.wait(2)
+
+            backend.clear()
+            flusher.join()
+            assert backend.get("k") is None
+            assert disk_count(backend) == 0
+        finally:
+            backend.close()
+
+
+class RecordingL1:
+    """L1 mínimo que guarda (valor, creado) como SmartCache."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key, key_class="standalone"):
+        entry = self.entries.get(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value, created=None):
+        self.entries[key] = (value, time.time() if created is None else created)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"size": len(self.entries)}
+
+
+def test_promotion_keeps_created():
+    with tempfile.TemporaryDirectory() as directory:
+        writer = make_backend(directory, flush_interval=60)
+        writer.set("k", {"answer": "hola"})
+        writer.close()
+        stored_at = time.time()
+        time.sleep(0.05)
+
+        l1 = RecordingL1()
+        cache = TieredCache(l1, make_backend(directory))
+        try:
+            value = asyncio.run(cache.get_async("k"))
+            assert value == {"answer": "hola"}
+            # L1 hereda la hora original: el TTL no vuelve a empezar
+            assert l1.entries["k"][1] <= stored_at
+            assert cache.get("k") == {"answer": "hola"}
+            assert cache.stats()["hits"] == 2
+        finally:
+            cache.close()
+
+
+def test_clear_reaches_other_workers():
+    with tempfile.TemporaryDirectory() as directory:
+        # Dos workers: cada uno con su L1 y su conexión al mismo archivo
+        first = TieredCache(RecordingL1(), make_backend(directory))
+        second = TieredCache(RecordingL1(), make_backend(directory))
+        try:
+            second.l1.set("k", {"answer": "vieja"})
+            assert second.sync() is False
+
+            first.clear()
+            assert first.sync() is False  # quien limpia no se avisa a sí mismo
+            assert second.sync() is True
+            assert second.get("k") is None
+            assert second.sync() is False
+        finally:
+            first.close()
+            second.close()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_backend_is_abstract,
+        test_ttl_expiry,
+        test_eviction_keeps_newest,
+        test_write_behind_flush,
+        test_restart_persistence,
+        test_clear_during_flush_does_not_resurrect,
+        test_promotion_keeps_created,
+        test_clear_reaches_other_workers,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las llaves del cache de respuestas (build_cache_key en src/api.py):
+normalización de la pregunta, ventana de historial y contadores por clase de SmartCache.
+
+Uso: python tests/test_cache_keys.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.api import HISTORY_WINDOW, SmartCache, build_cache_key
+
+
+def turn(i: int):
+    return [
+        {"role": "user", "content": f"Pregunta número {i}"},
+        {"role": "assistant", "content": f"Respuesta número {i}"},
+    ]
+
+
+def test_question_normalization():
+    key, key_class = build_cache_key("¿Cómo solicito una PENSIÓN alimentaria?")
+    assert key_class == "standalone"
+    assert key == build_cache_key("como   solicito una pension alimentaria")[0]
+    assert key != build_cache_key("¿Cómo solicito un divorcio?")[0]
+
+
+def test_history_changes_the_key():
+    standalone, _ = build_cache_key("¿Y en Heredia?")
+    followup, key_class = build_cache_key("¿Y en Heredia?", turn(1))
+    assert key_class == "followup"
+    assert followup != standalone
+    # Otra conversación previa: otra respuesta
+    assert followup != build_cache_key("¿Y en Heredia?", turn(2))[0]
+    # El historial también se normaliza
+    noisy = [{"role": m["role"], "content": m["content"].upper() + "!!"} for m in turn(1)]
+    assert followup == build_cache_key("¿Y en Heredia?", noisy)[0]
+
+
+def test_history_window():
+    history = turn(1) + turn(2) + turn(3)
+    assert len(history) > HISTORY_WINDOW
+    # Solo cuentan los últimos HISTORY_WINDOW mensajes, los mismos que usa el prompt
+    older_changed = [{"role": "user", "content": "otra cosa"}] + history[1:]
+    assert build_cache_key("¿Y ahora?", history)[0] == build_cache_key("¿Y ahora?", older_changed)[0]
+    newest_changed = history[:-1] + [{"role": "assistant", "content": "otra cosa"}]
+    assert build_cache_key("¿Y ahora?", history)[0] != build_cache_key("¿Y ahora?", newest_changed)[0]
+
+
+def test_smart_cache_counts_by_class():
+    cache = SmartCache(max_size=2, ttl=60)
+    key, key_class = build_cache_key("hola mundo")
+    assert cache.get(key, key_class) is None
+    cache.set(key, {"answer": "a"})
+    assert cache.get(key, key_class) == {"answer": "a"}
+    by_class = cache.stats()["by_class"]
+    assert by_class["standalone"]["hits"] == 1 and by_class["standalone"]["misses"] == 1
+
+
+def test_smart_cache_ttl_and_size():
+    cache = SmartCache(max_size=2, ttl=60)
+    cache.set("viejo", {"answer": "v"}, created=time.time() - 61)
+    assert cache.get("viejo") is None
+    cache.set("a", {"answer": "a"})
+    cache.set("b", {"answer": "b"})
+    cache.get("a")  # "a" pasa a ser la más reciente
+    cache.set("c", {"answer": "c"})
+    assert cache.get("b") is None and cache.get("a") == {"answer": "a"}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_question_normalization,
+        test_history_changes_the_key,
+        test_history_window,
+        test_smart_cache_counts_by_class,
+        test_smart_cache_ttl_and_size,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
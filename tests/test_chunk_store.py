@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Pruebas del ChunkStore (src/chunk_store.py): ida y vuelta a disco con memory-map,
+índice vacío, formato anterior (chunks.json) y los índices BM25/NumPy que lo usan.
+
+Uso: python tests/test_chunk_store.py
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.chunk_store import ChunkStore
+from src.retrieval import BM25Index
+from src.vector_store import NumpyVectorStore
+
+CHUNKS = [
+    {"id": "a", "text": "Artículo 29 de la Constitución Política", "metadata": {"source": "constitucion.pdf", "page": 3}},
+    {"id": "b", "text": "Pensión alimentaria: requisitos y trámite ante el juzgado", "metadata": {"source": "pensiones.pdf"}},
+    {"id": "c", "text": "El facilitador judicial orienta a su comunidad 🤝", "metadata": {}},
+]
+
+
+def test_roundtrip_is_memory_mapped():
+    with tempfile.TemporaryDirectory() as directory:
+        assert ChunkStore.write(Path(directory), iter(CHUNKS)) == len(CHUNKS)
+        store = ChunkStore.load(Path(directory))
+        assert isinstance(store.data, np.memmap) and isinstance(store.offsets, np.memmap)
+        assert len(store) == 3
+        assert list(store) == CHUNKS
+        assert store[-1] == CHUNKS[-1] and store[1:] == CHUNKS[1:]
+
+
+def test_empty_and_missing():
+    with tempfile.TemporaryDirectory() as directory:
+        assert ChunkStore.load(Path(directory)) is None
+        ChunkStore.write(Path(directory), [])
+        store = ChunkStore.load(Path(directory))
+        assert len(store) == 0 and not store
+
+
+def test_legacy_json_still_loads():
+    with tempfile.TemporaryDirectory() as directory:
+        with open(Path(directory) / ChunkStore.LEGACY_FILE, "w", encoding="utf-8") as f:
+            json.dump(CHUNKS, f, ensure_ascii=False)
+        assert ChunkStore.load(Path(directory)) == CHUNKS
+
+
+def test_indexes_use_chunk_store():
+    with tempfile.TemporaryDirectory() as directory:
+        BM25Index.build(CHUNKS).save(str(Path(directory) / "bm25"))
+        index = BM25Index.load(str(Path(directory) / "bm25"))
+        assert isinstance(index.chunks, ChunkStore)
+        (idx, _), = index.search("artículo 29", k=1)
+        assert index.chunks[idx]["id"] == "a"
+
+        vectors = np.eye(3, 4, dtype=np.float32)
+        NumpyVectorStore.build(vectors, CHUNKS).save(str(Path(directory) / "vectors"))
+        store = NumpyVectorStore.load(str(Path(directory) / "vectors"))
+        assert isinstance(store.chunks, ChunkStore) and store.count() == 3
+        (idx, _), = store.search(vectors[2], k=1)
+        assert store.chunks[idx]["metadata"] == {}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_roundtrip_is_memory_mapped,
+        test_empty_and_missing,
+        test_legacy_json_still_loads,
+        test_indexes_use_chunk_store,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Paridad de embeddings: los backends ONNX deben producir vectores compatibles
+con el índice creado con sentence-transformers (torch).
+
+Requiere el modelo exportado: python scripts/export_onnx.py
+Sin onnxruntime/tokenizers o sin el modelo exportado la prueba se omite (skip).
+Uso: python tests/test_embeddings.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.embeddings import ONNX_MODEL_FILES, create_embeddings, onnx_model_dir
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Similitud coseno mínima contra torch por backend
+MIN_COSINE = {"onnx": 0.999, "onnx-int8": 0.98}
+
+SAMPLE_TEXTS = [
+    "¿Cómo solicito una pensión alimentaria para mi hijo?",
+    "tengo problemas con mi jefe, mal salario y no tengo vacaciones soy de alajuela",
+    "¿Cuáles son los requisitos para ser facilitador judicial?",
+    "Artículo 29 de la Constitución Política",
+    "Juzgado de Pensiones Alimentarias del Primer Circuito Judicial de San José",
+]
+
+
+def reference_vectors() -> np.ndarray:
+    """Vectores de torch (sentence-transformers) normalizados."""
+    reference = np.asarray(create_embeddings("torch", MODEL_NAME).embed_documents(SAMPLE_TEXTS), dtype=np.float32)
+    return reference / np.linalg.norm(reference, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("backend", sorted(MIN_COSINE))
+def test_onnx_parity(backend):
+    """Compara un backend ONNX exportado contra torch, texto por texto."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    pytest.importorskip("sentence_transformers")
+    if not (onnx_model_dir(MODEL_NAME) / ONNX_MODEL_FILES[backend]).exists():
+        pytest.skip(f"{backend}: modelo no exportado (python scripts/export_onnx.py)")
+
+    reference = reference_vectors()
+    vectors = np.asarray(create_embeddings(backend, MODEL_NAME).embed_documents(SAMPLE_TEXTS), dtype=np.float32)
+    assert vectors.shape == reference.shape, f"{backend}: forma {vectors.shape}, esperada {reference.shape}"
+    cosines = (vectors * reference).sum(axis=1)
+    assert cosines.min() >= MIN_COSINE[backend], (
+        f"{backend}: coseno mínimo {cosines.min():.4f} (requerido {MIN_COSINE[backend]})"
+    )
+
+
+if __name__ == "__main__":
+    failed = False
+    for backend in sorted(MIN_COSINE):
+        try:
+            test_onnx_parity(backend)
+            print(f"✅ {backend}")
+        except pytest.skip.Exception as e:
+            print(f"⚠️ se omite: {e}")
+        except AssertionError as e:
+            print(f"❌ {e}")
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Pruebas del cliente Groq (GroqLLM) contra un servidor local que imita la API:
+reintentos ante 429/5xx, deadline por intento, circuit breaker (incluida la prueba cancelada) y respaldo,
+y streaming (incluido un stream que se queda colgado a mitad).
+No usa la red ni una API key real.
+
+Uso: python tests/test_groq_client.py
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.api import GroqLLM, StreamInterruptedError
+from src.resilience import CircuitBreaker
+
+
+class StubGroqServer:
+    """
+    Servidor HTTP local con respuestas programadas: (status, demora en segundos, texto),
+    opcionalmente con una pausa entre chunks del stream como cuarto elemento.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests += 1
+                status, delay, text, *rest = server.script.pop(0) if server.script else (200, 0, "ok")
+                chunk_delay = rest[0] if rest else 0
+                time.sleep(delay)
+                if status != 200:
+                    payload = json.dumps({"error": {"message": "stub", "type": "server_error"}}).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    if status == 429:
+                        self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                if body.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for i, word in enumerate(text.split(" ")):
+                        if i and chunk_delay:
+                            time.sleep(chunk_delay)
+                        chunk = {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                                 "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+                payload = json.dumps({
+                    "id": "c", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+class FallbackLLM:
+    """Respaldo que registra cuántas veces se usó."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_async(self, prompt):
+        self.calls += 1
+        return "respuesta de respaldo"
+
+    async def stream_async(self, prompt):
+        self.calls += 1
+        yield "respaldo"
+
+
+def make_llm(server, fallback, **kwargs):
+    kwargs.setdefault("timeout", 2.0)
+    kwargs.setdefault("max_retries", 2)
+    return GroqLLM(api_key="test", model="stub-model", fallback=fallback, base_url=server.url, **kwargs)
+
+
+async def _test_retries_then_success(server):
+    server.script = [(503, 0, ""), (429, 0, ""), (200, 0, "Respuesta final")]
+    fallback = FallbackLLM()
+    llm = make_llm(server, fallback)
+    answer = await llm.generate_async("pregunta")
+    await llm.aclose()
+    assert answer == "Respuesta final", answer
+    assert llm.retries == 2 and fallback.calls == 0, llm.stats()
+
+
+async def _test_timeout_uses_fallback(server):
+    server.script = [(200, 1.0, "tarde")]
+    fallback = FallbackLLM()
+    llm = make_llm(server, fallback, timeout=0.2, max_retries=0)
+    answer = await llm.generate_async("pregunta")
+    await llm.aclose()
+    assert answer == "respuesta de respaldo", answer
+    assert fallback.calls == 1
+
+
+async def _test_circuit_breaker(server):
+    server.script = [(500, 0, ""), (500, 0, "")]
+    fallback = FallbackLLM()
+    llm = make_llm(server, fallback, max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    await llm.generate_async("uno")
+    await llm.generate_async("dos")
+    requests_before = server.requests
+    answer = await llm.generate_async("tres")
+    await llm.aclose()
+    assert llm.breaker.state == "open", llm.stats()
+    assert server.requests == requests_before, "Con el breaker abierto no se debe llamar a Groq"
+    assert answer == "respuesta de respaldo" and fallback.calls == 3
+
+
+def _half_open_breaker() -> CircuitBreaker:
+    """Breaker abierto con el tiempo de espera cumplido: la próxima llamada es la prueba."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return breaker
+
+
+async def _test_cancelled_probe_releases_breaker(server):
+    server.script = [(200, 1.0, "tarde"), (200, 0, "recuperado")]
+    fallback = FallbackLLM()
+    llm = make_llm(server, fallback, max_retries=0, breaker=_half_open_breaker())
+    task = asyncio.ensure_future(llm.generate_async("prueba"))
+    await asyncio.sleep(0.2)
+    assert llm.breaker.state == "half_open", llm.stats()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    answer = await llm.generate_async("otra")
+    await llm.aclose()
+    assert answer == "recuperado", "Tras cancelar la prueba el breaker debe dejar pasar otra"
+    assert llm.breaker.state == "closed" and fallback.calls == 0, llm.stats()
+
+
+async def _test_abandoned_stream_probe_releases_breaker(server):
+    server.script = [(200, 0, "uno dos tres"), (200, 0, "recuperado")]
+    fallback = FallbackLLM()
+    llm = make_llm(server, fallback, max_retries=0, breaker=_half_open_breaker())
+    stream = llm.stream_async("prueba")
+    await stream.__anext__()
+    await stream.aclose()  # el cliente SSE se desconectó a mitad de la respuesta
+    answer = await llm.generate_async("otra")
+    await llm.aclose()
+    assert answer == "recuperado" and fallback.calls == 0, llm.stats()
+
+
+async def _test_streaming(server):
+    server.script = [(200, 0, "hola desde el stub")]
+    llm = make_llm(server, FallbackLLM())
+    tokens = [token async for token in llm.stream_async("pregunta")]
+    await llm.aclose()
+    assert "".join(tokens).strip() == "hola desde el stub", tokens
+
+
+async def _test_stalled_stream_hits_deadline(server):
+    # El primer token llega y después el servidor se queda callado; el deadline total (0.8 s)
+    # vence antes que el timeout de lectura de httpx (2 s)
+    server.script = [(200, 0, "uno dos", 5)]
+    llm = make_llm(server, FallbackLLM(), timeout=2.0, deadline=0.8, max_retries=0)
+    tokens = []
+    started = time.monotonic()
+    try:
+        async for token in llm.stream_async("pregunta"):
+            tokens.append(token)
+    except StreamInterruptedError:
+        pass
+    else:
+        raise AssertionError("Un stream colgado debe cortarse con StreamInterruptedError")
+    finally:
+        await llm.aclose()
+    assert time.monotonic() - started < 1.5, "La lectura del stream debe respetar el deadline"
+    assert tokens == ["uno "] and llm.failures == 1, (tokens, llm.stats())
+
+
+def test_groq_client():
+    """Corre todos los escenarios contra el servidor stub."""
+    server = StubGroqServer()
+    try:
+        for scenario in (_test_retries_then_success, _test_timeout_uses_fallback,
+                         _test_circuit_breaker, _test_cancelled_probe_releases_breaker,
+                         _test_abandoned_stream_probe_releases_breaker, _test_streaming,
+                         _test_stalled_stream_hits_deadline):
+            asyncio.run(scenario(server))
+            print(f"✅ {scenario.__name__[6:]}")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    try:
+        test_groq_client()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
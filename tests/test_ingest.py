@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la ingesta incremental (scripts/ingest.py): plan contra el manifiesto,
+IDs deterministas, escritura por lotes (incluido un lote que falla) y exportación
+paginada a los índices BM25 y NumPy.
+Usa una colección en memoria en lugar de Chroma y embeddings falsos.
+
+Uso: python tests/test_ingest.py
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+from src.retrieval import BM25Index
+from src.vector_store import NumpyVectorStore
+
+pytest.importorskip("langchain")
+import ingest
+from ingest import Document, embed_and_upsert, load_manifest, make_chunk_ids, plan_ingest, save_manifest
+
+
+class MemoryCollection:
+    """Lo que usa la ingesta de una colección de Chroma; `fail_on` hace fallar ese upsert (1 = el primero)."""
+
+    def __init__(self, fail_on: int = 0):
+        self.rows = {}
+        self.upserts = 0
+        self.fail_on = fail_on
+        self.pages = 0
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserts += 1
+        if self.upserts == self.fail_on:
+            raise RuntimeError("Chroma no disponible")
+        for chunk_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            self.rows[chunk_id] = (embedding, document, metadata)
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.rows.pop(chunk_id, None)
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include, limit, offset):
+        self.pages += 1
+        page = list(self.rows.items())[offset:offset + limit]
+        return {
+            "ids": [chunk_id for chunk_id, _ in page],
+            "embeddings": [row[0] for _, row in page] if "embeddings" in include else None,
+            "documents": [row[1] for _, row in page],
+            "metadatas": [row[2] for _, row in page],
+        }
+
+
+class FakeEmbedder:
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def processed(files):
+    """Salida de iter_processed_files: (ruta, entrada, chunks, tiempos)."""
+    for relative_path, sha, count in files:
+        docs = [Document(page_content=f"{relative_path} chunk {i}", metadata={"source": relative_path}) for i in range(count)]
+        yield relative_path, {"sha256": sha * 64}, docs, {"pages": 1, "load": 0.0, "split": 0.0}
+
+
+def write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_chunk_ids_are_deterministic():
+    ids = make_chunk_ids("leyes/a.txt", "f" * 64, 3)
+    assert ids == make_chunk_ids("leyes/a.txt", "f" * 64, 3)
+    assert len(set(ids)) == 3
+    assert set(ids).isdisjoint(make_chunk_ids("leyes/a.txt", "e" * 64, 3))
+    assert set(ids).isdisjoint(make_chunk_ids("leyes/b.txt", "f" * 64, 3))
+
+
+def test_plan_against_manifest():
+    with tempfile.TemporaryDirectory() as directory:
+        data = Path(directory) / "docs"
+        write(data / "a.txt", "uno")
+        write(data / "b.txt", "dos")
+        files = ingest.find_files(str(data))
+        manifest = {}
+        to_index, deleted, unchanged = plan_ingest(files, manifest, data)
+        assert [relative for _, relative, _ in to_index] == ["a.txt", "b.txt"] and not deleted and not unchanged
+
+        for file_path, relative, entry in to_index:
+            manifest[relative] = dict(entry, chunk_ids=["x"])
+        save_manifest(Path(directory), manifest)
+        manifest = load_manifest(Path(directory))
+
+        # Solo cambia la fecha de b: mismo hash, no se re-procesa
+        stat = (data / "b.txt").stat()
+        os.utime(data / "b.txt", (stat.st_atime, stat.st_mtime + 10))
+        write(data / "a.txt", "uno modificado")
+        write(data / "c.txt", "tres")
+        to_index, deleted, unchanged = plan_ingest(ingest.find_files(str(data)), manifest, data)
+        assert [relative for _, relative, _ in to_index] == ["a.txt", "c.txt"]
+        assert unchanged == ["b.txt"] and manifest["b.txt"]["mtime"] == stat.st_mtime + 10
+
+        (data / "c.txt").unlink()
+        _, deleted, _ = plan_ingest(ingest.find_files(str(data)), {"c.txt": {}, **manifest}, data)
+        assert deleted == ["c.txt"]
+
+
+def test_batches_record_complete_files():
+    collection = MemoryCollection()
+    manifest = {}
+    total = embed_and_upsert(collection, FakeEmbedder(), processed([("a", "1", 3), ("b", "2", 2)]), 2, manifest)
+    assert total == 5 and len(collection.rows) == 5
+    assert manifest["a"]["chunk_ids"] == make_chunk_ids("a", "1" * 64, 3)
+    assert set(manifest) == {"a", "b"}
+
+
+def test_failed_batch_drops_file_and_partial_chunks():
+    # Lotes de 2: [a0 a1] [a2 b0] [b1 b2] (falla) [b3 c0] [c1]
+    collection = MemoryCollection(fail_on=3)
+    manifest = {}
+    embed_and_upsert(collection, FakeEmbedder(), processed([("a", "1", 3), ("b", "2", 4), ("c", "3", 2)]), 2, manifest)
+    assert set(manifest) == {"a", "c"}
+    b_ids = set(make_chunk_ids("b", "2" * 64, 4))
+    # b0 ya estaba escrito de un lote anterior: no queda huérfano en el índice
+    assert b_ids.isdisjoint(collection.rows)
+    assert set(manifest["a"]["chunk_ids"]) | set(manifest["c"]["chunk_ids"]) == set(collection.rows)
+
+
+def test_unreadable_file_is_not_recorded():
+    manifest = {"roto.pdf": {"sha256": "viejo"}}
+    items = [("roto.pdf", {"sha256": "0" * 64}, None, {})]
+    embed_and_upsert(MemoryCollection(), FakeEmbedder(), iter(items), 2, manifest)
+    assert manifest == {}
+
+
+def test_export_indexes_by_pages():
+    collection = MemoryCollection()
+    embed_and_upsert(collection, FakeEmbedder(), processed([("a", "1", 3), ("b", "2", 2)]), 2, {})
+    with tempfile.TemporaryDirectory() as directory:
+        assert ingest.export_indexes(collection, Path(directory), page_size=2) == 5
+        # 3 páginas con datos + 1 vacía, por cada índice
+        assert collection.pages == 8
+        vectors = NumpyVectorStore.load(str(Path(directory) / ingest.VECTORS_DIR_NAME))
+        bm25 = BM25Index.load(str(Path(directory) / ingest.BM25_DIR_NAME))
+        assert [chunk["id"] for chunk in vectors.chunks] == list(collection.rows)
+        assert [chunk["id"] for chunk in bm25.chunks] == list(collection.rows)
+        assert vectors.matrix.shape == (5, 2)
+        best, _ = bm25.search("b chunk 1", k=1)[0]
+        assert bm25.chunks[best]["text"] == "b chunk 1"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_chunk_ids_are_deterministic,
+        test_plan_against_manifest,
+        test_batches_record_complete_files,
+        test_failed_batch_drops_file_and_partial_chunks,
+        test_unreadable_file_is_not_recorded,
+        test_export_indexes_by_pages,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
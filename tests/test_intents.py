@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Pruebas del enrutador de intenciones (src/intents.py): coincidencia por palabras
+completas, frases con "*" que coinciden como inicio de palabra y frases exactas,
+también con las frases reales de src/api.py y data/precomputed_answers.json.
+
+Uso: python tests/test_intents.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.api import build_intent_router
+from src.intents import IntentRouter
+
+
+def make_router() -> IntentRouter:
+    return IntentRouter({
+        "greeting": {"greeting": ["hola"]},
+        "farewell": {"farewell": ["chao", "hasta luego", "hasta"]},
+        "location": {"San José": ["San José"], "Limón": ["Limón"]},
+        "topic": {"pension": ["pensión*", "hijo*"], "laboral": ["jefe"]},
+    }, exact_groups={"greeting"})
+
+
+def test_trailing_word_boundary():
+    router = make_router()
+    assert router.route("chaos") == {}
+    assert router.route("¡Chao!") == {"farewell": ["farewell"]}
+    assert router.route("hastaluego") == {}
+    assert router.route("jefes") == {}
+    assert router.route("prohijo") == {}
+
+
+def test_prefix_phrases():
+    router = make_router()
+    assert router.route("pensiones de mis hijos") == {"topic": ["pension"]}
+    assert router.route("hijo") == {"topic": ["pension"]}
+
+
+def test_multiword_and_shorter_phrases():
+    router = make_router()
+    # "hasta luego" y su prefijo "hasta" (que termina en fin de palabra) son la misma etiqueta
+    assert router.route("hasta luego") == {"farewell": ["farewell"]}
+    assert router.route("hasta lueguito") == {"farewell": ["farewell"]}
+    assert router.route("mi jefe en san jose") == {"location": ["San José"], "topic": ["laboral"]}
+
+
+def test_exact_groups():
+    router = make_router()
+    assert router.route("Hola") == {"greeting": ["greeting"]}
+    assert "greeting" not in router.route("hola, necesito ayuda con mi jefe")
+
+
+def test_real_router():
+    with open(PROJECT_ROOT / "data" / "precomputed_answers.json", "r", encoding="utf-8") as f:
+        router = build_intent_router(json.load(f)["answers"])
+    assert router.route("mis hijos y mi jefe en Limón") == {
+        "location": ["Limón"], "topic": ["pension", "laboral"], "precomputed": ["pension"]
+    }
+    assert router.route("pagos atrasados") == {"precomputed": ["pension"]}
+    assert router.route("perdí mis trabajos") == {"topic": ["laboral"]}
+    assert router.route("¿Quién sos?") == {"about": ["about"]}
+    assert router.route("¡Gracias!") == {"farewell": ["farewell"]}
+    # Palabras que solo empiezan como una frase sin "*" no cuentan
+    assert router.route("Alajuelita") == {}
+    assert router.route("tiempos") == {}
+    assert router.route("olas del mar") == {}
+    assert router.route("Heyhey") == {}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_trailing_word_boundary,
+        test_prefix_phrases,
+        test_multiword_and_shorter_phrases,
+        test_exact_groups,
+        test_real_router,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Pruebas del LLM local (LocalLLM en src/api.py) sin llama.cpp: un Llama falso
+registra qué tokens se evalúan para verificar la reutilización del estado KV
+del preámbulo. También cubre la cola de LocalLLMPool y el 503 con la cola llena.
+
+Uso: python tests/test_local_llm.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import src.api as api
+from src.api import LLMOverloadedError, LocalLLM, LocalLLMPool, PrefixSnapshot
+
+PREFIX = "INSTRUCCIONES FIJAS. "
+
+
+class FakeState:
+    def __init__(self, input_ids: np.ndarray):
+        self.input_ids = input_ids.copy()
+        self.n_tokens = len(input_ids)
+
+
+class FakeLlama:
+    """Un token por byte; create_completion evalúa solo lo que no coincide con el contexto actual."""
+
+    def __init__(self):
+        self.input_ids = np.zeros(0, dtype=np.intc)
+        self.evaluated = 0
+        self.loads = 0
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.input_ids)
+
+    def tokenize(self, text: bytes, add_bos: bool = True):
+        return list(text)
+
+    def reset(self):
+        self.input_ids = np.zeros(0, dtype=np.intc)
+
+    def eval(self, tokens):
+        self.input_ids = np.concatenate([self.input_ids, np.asarray(tokens, dtype=np.intc)])
+        self.evaluated += len(tokens)
+
+    def save_state(self):
+        return FakeState(self.input_ids)
+
+    def load_state(self, state):
+        self.input_ids = state.input_ids.copy()
+        self.loads += 1
+
+    def create_completion(self, prompt, stream=False, **kwargs):
+        tokens = np.asarray(self.tokenize(prompt.encode("utf-8")), dtype=np.intc)
+        common = 0
+        for current, new in zip(self.input_ids, tokens):
+            if current != new:
+                break
+            common += 1
+        self.input_ids = self.input_ids[:common]
+        self.eval(tokens[common:])
+        if stream:
+            return iter([{"choices": [{"text": "respuesta"}]}])
+        return {"choices": [{"text": " respuesta "}]}
+
+
+def make_llm(snapshot=None) -> LocalLLM:
+    llm = LocalLLM("modelo.gguf", n_ctx=2048, static_prefix=PREFIX, prefix_snapshot=snapshot)
+    llm._llama = FakeLlama()
+    return llm
+
+
+def test_prefix_is_evaluated_once():
+    llm = make_llm()
+    llm.prime_prefix()
+    assert llm.prefix_tokens == len(PREFIX) and llm._llama.evaluated == len(PREFIX)
+
+    assert asyncio.run(llm.generate_async("primera consulta")) == "respuesta"
+    assert asyncio.run(llm.generate_async("otra pregunta")) == "respuesta"
+    # Cada consulta evalúa solo su propio texto: el preámbulo ya estaba en el contexto
+    assert llm._llama.evaluated == len(PREFIX) + len("primera consulta") + len("otra pregunta")
+    assert llm.stats() == {"prefix_tokens": len(PREFIX), "prefix_reused": 2, "prefix_restored": 0}
+
+
+def test_prefix_restored_after_other_prompt():
+    llm = make_llm()
+    llm.prime_prefix()
+    llm._llama.create_completion("otro texto sin preámbulo")
+    evaluated = llm._llama.evaluated
+    assert asyncio.run(llm.generate_async("pregunta")) == "respuesta"
+    assert llm._llama.loads == 1 and llm.prefix_restored == 1
+    assert llm._llama.evaluated == evaluated + len("pregunta")
+
+
+def test_snapshot_shared_between_contexts():
+    snapshot = PrefixSnapshot()
+    first, second = make_llm(snapshot), make_llm(snapshot)
+    first.prime_prefix()
+    second.prime_prefix()
+    assert second._llama.evaluated == 0 and second._prefix_state is first._prefix_state
+
+    async def run():
+        return [token async for token in second.stream_async("pregunta")]
+
+    assert asyncio.run(run()) == ["respuesta"]
+    assert second.prefix_restored == 1 and second._llama.evaluated == len("pregunta")
+
+
+class BlockingLLM:
+    """Instancia del pool que no termina hasta que la prueba lo indica."""
+
+    def __init__(self, executor):
+        self.release = asyncio.Event()
+
+    async def generate_async(self, prompt: str) -> str:
+        await self.release.wait()
+        return prompt
+
+    def stats(self):
+        return {"prefix_tokens": 0, "prefix_reused": 0, "prefix_restored": 0}
+
+
+def test_pool_queue_full_is_rejected():
+    async def run():
+        pool = LocalLLMPool(size=1, max_queue=1, factory=BlockingLLM)
+        running = asyncio.ensure_future(pool.generate_async("uno"))
+        queued = asyncio.ensure_future(pool.generate_async("dos"))
+        await asyncio.sleep(0)
+        assert pool.stats()["idle"] == 0 and pool.stats()["queued"] == 1
+        assert pool.saturated() is not None
+
+        with pytest.raises(LLMOverloadedError) as error:
+            await pool.generate_async("tres")
+        assert 1 <= error.value.retry_after <= 60 and pool.rejected == 1
+
+        # La cola se atiende en orden y el pool vuelve a quedar libre
+        pool.instances[0].release.set()
+        assert await asyncio.gather(running, queued) == ["uno", "dos"]
+        assert pool.saturated() is None and pool.stats()["idle"] == 1 and pool.completed == 2
+
+    asyncio.run(run())
+
+
+def test_pool_cancelled_waiter_leaves_queue():
+    async def run():
+        pool = LocalLLMPool(size=1, max_queue=1, factory=BlockingLLM)
+        running = asyncio.ensure_future(pool.generate_async("uno"))
+        queued = asyncio.ensure_future(pool.generate_async("dos"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        await asyncio.sleep(0)
+        assert pool.stats()["queued"] == 0 and pool.saturated() is None
+
+        pool.instances[0].release.set()
+        assert await running == "uno"
+        assert pool.stats()["idle"] == 1
+
+    asyncio.run(run())
+
+
+def test_overloaded_is_503_with_retry_after():
+    class OverloadedBot:
+        llm = None
+
+        async def ask_async(self, question, history=None):
+            raise LLMOverloadedError(7)
+
+    original = api.bot
+    api.bot = OverloadedBot()
+    try:
+        with pytest.raises(api.HTTPException) as error:
+            asyncio.run(api.ask_question(api.QueryRequest(question="¿Cómo pido una pensión?")))
+    finally:
+        api.bot = original
+    assert error.value.status_code == 503
+    assert error.value.headers == {"Retry-After": "7"}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_prefix_is_evaluated_once,
+        test_prefix_restored_after_other_prompt,
+        test_snapshot_shared_between_contexts,
+        test_pool_queue_full_is_rejected,
+        test_pool_cancelled_waiter_leaves_queue,
+        test_overloaded_is_503_with_retry_after,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Pruebas del filtro de respuestas (src/postprocess.py): líneas con metainstrucciones,
+líneas en blanco, teléfonos, y mismo resultado en la versión completa y en streaming.
+
+Uso: python tests/test_postprocess.py
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.postprocess import PHONE_REPLACEMENT, AnswerFilter
+
+SAMPLES = [
+    "Fuente: documento 3\nPuedes pedir la pensión en el juzgado.\n\n\n\nLleva tu cédula.",
+    "  Respuesta : aquí va\nEl proceso es gratuito.\nAhora responde en español\nCONTEXTO: texto",
+    "Paso 1: presentar la demanda   \n\nEstructura  sugerida: intro\nLlama al +506 2222-3333 o al 8888 8888.",
+    "Tel. 2295-3000\nEl artículo 29 de la ley 7654 del año 2024.\nXXXX\n",
+    "\n\n  Hola.\nİSTANBUL fuente: no empieza la línea\nTiempo: 2s",
+]
+
+
+def stream(answer_filter: AnswerFilter, text: str, seed: int) -> str:
+    """Pasa `text` por el filtro en streaming, cortado en tokens de largo aleatorio."""
+    rng = random.Random(seed)
+    tokens = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 6)
+        tokens.append(text[position:position + size])
+        position += size
+
+    async def source():
+        for token in tokens:
+            yield token
+
+    async def run():
+        return "".join([piece async for piece in answer_filter.stream(source())])
+
+    return asyncio.run(run())
+
+
+def test_forbidden_lines_and_blank_lines():
+    answer_filter = AnswerFilter()
+    assert answer_filter.clean(SAMPLES[0]) == "Puedes pedir la pensión en el juzgado.\n\nLleva tu cédula."
+    assert answer_filter.clean(SAMPLES[1]) == "El proceso es gratuito."
+    assert answer_filter.clean("") == ""
+
+
+def test_phone_redaction():
+    redacting = AnswerFilter(redact_contacts=True)
+    cleaned = redacting.clean(SAMPLES[2])
+    assert cleaned == f"Paso 1: presentar la demanda\n\nLlama al {PHONE_REPLACEMENT} o al {PHONE_REPLACEMENT}."
+    # Números cortos (artículos, leyes, años) no son teléfonos; la línea "Tel." se descarta
+    assert redacting.clean(SAMPLES[3]) == "El artículo 29 de la ley 7654 del año 2024."
+
+    allowing = AnswerFilter(redact_contacts=False)
+    assert "+506 2222-3333" in allowing.clean(SAMPLES[2])
+    assert allowing.clean(SAMPLES[3]).startswith("Tel. 2295-3000")
+
+
+def test_stream_matches_clean():
+    for redact_contacts in (True, False):
+        answer_filter = AnswerFilter(redact_contacts=redact_contacts)
+        for text in SAMPLES:
+            for seed in range(5):
+                assert stream(answer_filter, text, seed) == answer_filter.clean(text), (text, seed)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_forbidden_lines_and_blank_lines,
+        test_phone_redaction,
+        test_stream_matches_clean,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
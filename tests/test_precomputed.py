@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la recarga en caliente de respuestas precomputadas (PrecomputedResponses
+en src/api.py): versión nueva al cambiar el archivo, archivo inválido que conserva
+la versión anterior y formato YAML.
+
+Uso: python tests/test_precomputed.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.api import PrecomputedResponses
+
+PENSION = {"version": 1, "answers": {"pension": {"keywords": ["pensión*"], "answer": "Respuesta de pensión"}}}
+LABORAL = {"version": 2, "answers": {"laboral": {"keywords": ["despido"], "answer": "Respuesta laboral"}}}
+
+
+def write(path: Path, content: str, tick: int) -> None:
+    """Escribe y fija un mtime distinto, para no depender de la resolución del reloj."""
+    path.write_text(content, encoding="utf-8")
+    os.utime(path, ns=(tick * 10**9, tick * 10**9))
+
+
+def answer_for(precomputed: PrecomputedResponses, question: str):
+    _, responses, router = precomputed.snapshot
+    return precomputed.find_match(router.route(question).get("precomputed", []), responses)
+
+
+def test_reload_swaps_version():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "answers.json"
+        write(path, json.dumps(PENSION), 1)
+        precomputed = PrecomputedResponses(str(path))
+        assert precomputed.version.startswith("1-")
+        assert answer_for(precomputed, "mis pensiones") == "Respuesta de pensión"
+        old_snapshot = precomputed.snapshot
+
+        # Sin cambios no se vuelve a leer
+        assert precomputed.reload() is False
+
+        write(path, json.dumps(LABORAL), 2)
+        assert precomputed.reload() is True
+        assert precomputed.version.startswith("2-") and precomputed.reloads == 2
+        assert answer_for(precomputed, "un despido") == "Respuesta laboral"
+        assert answer_for(precomputed, "mis pensiones") is None
+        # Quien ya leyó la instantánea anterior la sigue viendo completa
+        assert old_snapshot[2].route("un despido") == {}
+        assert "pension" in old_snapshot[1]
+
+
+def test_same_version_number_new_content():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "answers.json"
+        write(path, json.dumps(PENSION), 1)
+        precomputed = PrecomputedResponses(str(path))
+        first = precomputed.version
+        edited = dict(PENSION, answers={"pension": dict(PENSION["answers"]["pension"], answer="Otra respuesta")})
+        write(path, json.dumps(edited), 2)
+        assert precomputed.reload() is True
+        assert precomputed.version != first and precomputed.version.startswith("1-")
+
+
+def test_invalid_file_keeps_current_version():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "answers.json"
+        write(path, json.dumps(PENSION), 1)
+        precomputed = PrecomputedResponses(str(path))
+        version = precomputed.version
+
+        # Archivo a medio escribir
+        write(path, json.dumps(LABORAL)[:20], 2)
+        assert precomputed.reload() is False
+        assert precomputed.version == version and precomputed.last_error.startswith("JSONDecodeError")
+        assert answer_for(precomputed, "mis pensiones") == "Respuesta de pensión"
+        # Falta "answer": tampoco se instala a medias
+        write(path, json.dumps({"answers": {"x": {"keywords": ["x"]}}}), 3)
+        assert precomputed.reload() is False and precomputed.version == version
+
+        write(path, json.dumps(LABORAL), 4)
+        assert precomputed.reload() is True and precomputed.last_error is None
+
+
+def test_missing_file_and_yaml():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "answers.yaml"
+        precomputed = PrecomputedResponses(str(path))
+        assert precomputed.version is None and precomputed.responses == {}
+        assert precomputed.last_error.startswith("FileNotFoundError")
+
+        yaml = pytest.importorskip("yaml")
+        write(path, yaml.safe_dump(PENSION, allow_unicode=True), 1)
+        assert precomputed.reload() is True
+        assert answer_for(precomputed, "la pensión") == "Respuesta de pensión"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_reload_swaps_version,
+        test_same_version_number_new_content,
+        test_invalid_file_keeps_current_version,
+        test_missing_file_and_yaml,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
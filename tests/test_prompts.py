@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Pruebas del armado del prompt (src/prompts.py): presupuesto de tokens, orden de
+recorte (historial, contexto, pregunta) y conteo de tokens de Groq con margen.
+
+Uso: python tests/test_prompts.py
+"""
+
+import math
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.api import GroqLLM, JudicialBot
+from src.prompts import ELLIPSIS, SYSTEM_PROMPT, PromptBuilder, with_system_prefix
+from src.retrieval import estimate_tokens
+
+
+def words(count: int, word: str = "palabra") -> str:
+    return " ".join([word] * count)
+
+
+def history(turns: int, size: int = 20):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"pregunta {i} " + words(size)})
+        messages.append({"role": "assistant", "content": f"respuesta {i} " + words(size)})
+    return messages
+
+
+CONTEXT = [(f"ley{i}.txt", words(60, f"art{i}")) for i in range(4)]
+
+
+def total_tokens(builder: PromptBuilder, message: str) -> int:
+    return builder.count_tokens(with_system_prefix(message, builder.system_prompt))
+
+
+def test_everything_fits():
+    builder = PromptBuilder(SYSTEM_PROMPT, 5000)
+    message, sections = builder.build("¿Cómo pido una pensión?", history(2), CONTEXT)
+    assert sections == 4 and "pregunta 0" in message and "respuesta 1" in message
+    assert total_tokens(builder, message) <= 5000
+    assert builder.stats()["truncated"] == {"question": 0, "context": 0, "history": 0}
+
+
+def test_history_is_trimmed_before_context():
+    builder = PromptBuilder(SYSTEM_PROMPT, 5000, history_window=4)
+    # Lugar para la pregunta, todo el contexto y solo parte del historial
+    context_tokens = sum(estimate_tokens(f"\n--- {title} ---\n{text}\n") for title, text in CONTEXT)
+    builder.max_prompt_tokens = builder.static_tokens + context_tokens + 80
+    message, sections = builder.build("¿Y en Heredia?", history(4), CONTEXT)
+    assert sections == 4
+    # Se conservan los mensajes más nuevos
+    assert "respuesta 3" in message and "pregunta 0" not in message
+    assert total_tokens(builder, message) <= builder.max_prompt_tokens
+    assert builder.stats()["truncated"]["history"] == 1 and builder.stats()["truncated"]["context"] == 0
+
+
+def test_context_is_trimmed_by_rank():
+    builder = PromptBuilder(SYSTEM_PROMPT, 5000)
+    builder.max_prompt_tokens = builder.static_tokens + 200
+    message, sections = builder.build("¿Qué dice la ley?", history(2), CONTEXT)
+    # Entran los mejores chunks; el último que entra va recortado y el historial no entra
+    assert 1 <= sections < 4 and "art0" in message and "art3" not in message
+    assert "CONVERSACIÓN PREVIA" not in message
+    assert total_tokens(builder, message) <= builder.max_prompt_tokens
+    truncated = builder.stats()["truncated"]
+    assert truncated["context"] == 1 and truncated["history"] == 1 and truncated["question"] == 0
+
+
+def test_huge_question_and_long_messages():
+    builder = PromptBuilder(SYSTEM_PROMPT, 5000, history_message_tokens=30)
+    builder.max_prompt_tokens = builder.static_tokens + 400
+    pasted = "Inicio del texto " + words(2000) + " final del texto"
+    message, _ = builder.build(pasted, [{"role": "user", "content": "comienzo " + words(100) + " cierre"}], [])
+    # La pregunta pegada no pasa de la mitad del espacio y conserva inicio y final
+    assert "Inicio del texto" in message and "final del texto" in message and ELLIPSIS.strip() in message
+    assert "comienzo" in message and "cierre" in message
+    assert total_tokens(builder, message) <= builder.max_prompt_tokens
+    assert builder.stats()["truncated"]["question"] == 1
+
+
+def test_groq_token_margin():
+    groq = GroqLLM(api_key="test", token_margin=1.3)
+    text = words(100)
+    assert groq.tokenizer is None
+    assert groq.count_tokens(text) == math.ceil(estimate_tokens(text) * 1.3)
+
+    # Tokenizador configurado pero inexistente: se sigue estimando con el margen
+    missing = GroqLLM(api_key="test", tokenizer_path="/no/existe/tokenizer.json", token_margin=1.5)
+    assert missing.tokenizer is None and missing.count_tokens(text) == math.ceil(estimate_tokens(text) * 1.5)
+
+
+def test_groq_budget_uses_groq_counter():
+    with tempfile.TemporaryDirectory() as directory:
+        bot = JudicialBot(directory)
+        bot.llm = GroqLLM(api_key="test", token_margin=1.3)
+        builder = bot._make_prompt_builder()
+    assert builder.count_tokens == bot.llm.count_tokens
+    message, _ = builder.build("¿Cómo pido una pensión?", history(4, size=200), CONTEXT * 10)
+    # Con el margen, la estimación por caracteres queda holgada bajo el límite
+    assert estimate_tokens(with_system_prefix(message, builder.system_prompt)) * 1.3 <= builder.max_prompt_tokens + 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_everything_fits,
+        test_history_is_trimmed_before_context,
+        test_context_is_trimmed_by_rank,
+        test_huge_question_and_long_messages,
+        test_groq_token_margin,
+        test_groq_budget_uses_groq_counter,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los embeddings de preguntas (src/embeddings.py): LRU de CachedEmbeddings
+y micro-lotes de EmbeddingBatcher, con un modelo falso que cuenta las llamadas.
+
+Uso: python tests/test_query_embeddings.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.embeddings import CachedEmbeddings, EmbeddingBatcher
+
+
+class CountingEmbedder:
+    """Vector = [largo del texto, 1]; registra cada llamada al modelo."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_normalized_questions_share_vector():
+    model = CountingEmbedder()
+    embeddings = CachedEmbeddings(model, max_size=10)
+    first = embeddings.embed_query_vector("¿Qué es una PENSIÓN?")
+    second = embeddings.embed_query_vector("que es una pension")
+    assert second is first and len(model.calls) == 1
+    assert first.dtype == np.float32 and not first.flags.writeable
+    assert embeddings.embed_query("que es una pension") == [20.0, 1.0]
+    stats = embeddings.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["size"] == 1
+
+
+def test_lru_eviction():
+    model = CountingEmbedder()
+    embeddings = CachedEmbeddings(model, max_size=2)
+    embeddings.embed_query_vector("uno")
+    embeddings.embed_query_vector("dos")
+    embeddings.embed_query_vector("uno")  # "uno" pasa a ser la más reciente
+    embeddings.embed_query_vector("tres")
+    assert list(embeddings.vectors) == ["uno", "tres"]
+    embeddings.embed_query_vector("dos")
+    assert model.calls == [["uno"], ["dos"], ["tres"], ["dos"]]
+
+
+def test_encode_batch_fills_cache():
+    model = CountingEmbedder()
+    embeddings = CachedEmbeddings(model, max_size=10)
+    vectors = embeddings.encode_batch(["Hola", "adiós"])
+    assert len(vectors) == 2 and model.calls == [["Hola", "adiós"]]
+    assert embeddings.embed_query_vector("hola") is vectors[0]
+    # Los documentos de la ingesta no pasan por el cache
+    embeddings.embed_documents(["hola"])
+    assert len(model.calls) == 2 and embeddings.stats()["size"] == 2
+
+    embeddings.clear()
+    embeddings.embed_query_vector("hola")
+    assert len(model.calls) == 3
+
+
+def test_batcher_coalesces_concurrent_queries():
+    model = CountingEmbedder()
+    batcher = EmbeddingBatcher(CachedEmbeddings(model), max_batch_size=16, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(text) for text in ["uno", "dos", "UNO", "tres"]))
+
+    vectors = asyncio.run(run())
+    # Un solo lote; la pregunta repetida comparte el futuro de la primera
+    assert model.calls == [["uno", "dos", "tres"]]
+    assert vectors[2] is vectors[0]
+    assert batcher.stats()["batches"] == 1 and batcher.embeddings.stats()["hits"] == 1
+    assert not batcher.pending and not batcher.inflight
+
+
+def test_batcher_flushes_when_full():
+    model = CountingEmbedder()
+    batcher = EmbeddingBatcher(CachedEmbeddings(model), max_batch_size=2, max_wait_ms=1000)
+
+    async def run():
+        # Lotes llenos no esperan el timer de 1 s
+        return await asyncio.wait_for(asyncio.gather(*(batcher.embed(f"p{i}") for i in range(4))), 0.5)
+
+    vectors = asyncio.run(run())
+    assert len(vectors) == 4
+    assert model.calls == [["p0", "p1"], ["p2", "p3"]]
+    assert batcher.stats()["max_batch_size_seen"] == 2
+
+
+def test_batcher_cancelled_waiter_does_not_cancel_batch():
+    model = CountingEmbedder()
+    batcher = EmbeddingBatcher(CachedEmbeddings(model), max_wait_ms=10)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.embed("pensión"))
+        second = asyncio.ensure_future(batcher.embed("pension"))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    vector = asyncio.run(run())
+    assert vector.tolist() == [7.0, 1.0] and len(model.calls) == 1
+
+
+def test_batcher_propagates_model_errors():
+    class BrokenEmbedder(CountingEmbedder):
+        def embed_documents(self, texts):
+            raise RuntimeError("modelo caído")
+
+    batcher = EmbeddingBatcher(CachedEmbeddings(BrokenEmbedder()), max_wait_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not batcher.inflight
+
+
+if __name__ == "__main__":
+    tests = [
+        test_normalized_questions_share_vector,
+        test_lru_eviction,
+        test_encode_batch_fills_cache,
+        test_batcher_coalesces_concurrent_queries,
+        test_batcher_flushes_when_full,
+        test_batcher_cancelled_waiter_does_not_cancel_batch,
+        test_batcher_propagates_model_errors,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
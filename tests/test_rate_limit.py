@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Pruebas del rate limiting compartido (config/security.py): ventana por IP en SQLite y
+elección de la IP detrás de un proxy de confianza, incluida una cabecera X-Forwarded-For
+falsificada por el cliente.
+
+Uso: python tests/test_rate_limit.py
+"""
+
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.security import SecurityManager, SharedRateLimitStore, rate_limit_client
+
+TRUSTED = {"127.0.0.1", "::1"}
+
+
+def make_manager(directory: str, limit: int) -> SecurityManager:
+    manager = SecurityManager()
+    manager.max_requests_per_minute = limit
+    manager.shared_rate_limits = SharedRateLimitStore(str(Path(directory) / "rate_limits.sqlite3"))
+    return manager
+
+
+def test_client_selection():
+    assert rate_limit_client("200.1.1.1", "", TRUSTED) == "200.1.1.1"
+    # Un cliente directo no puede elegir su IP con la cabecera
+    assert rate_limit_client("200.1.1.1", "10.9.9.9", TRUSTED) == "200.1.1.1"
+    # Interfaz local sin cabecera: no se limita
+    assert rate_limit_client("127.0.0.1", "", TRUSTED) is None
+    # Detrás del proxy cuenta la IP que agregó el proxy, no la que escribió el cliente
+    assert rate_limit_client("127.0.0.1", "1.2.3.4, 200.1.1.1", TRUSTED) == "200.1.1.1"
+    assert rate_limit_client("127.0.0.1", "200.1.1.1, ::1", TRUSTED) == "200.1.1.1"
+
+
+def test_spoofed_forwarded_for_is_limited():
+    """Un X-Forwarded-For distinto en cada request no esquiva el límite."""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = make_manager(directory, limit=3)
+        allowed = []
+        for _ in range(5):
+            spoofed = f"10.{uuid.uuid4().int % 256}.0.1"
+            client = rate_limit_client("127.0.0.1", f"{spoofed}, 200.1.1.1", TRUSTED)
+            allowed.append(manager.check_rate_limit(client))
+        assert allowed == [True, True, True, False, False], allowed  # el 4.º recibe 429
+
+
+def test_limit_shared_between_processes():
+    """Dos stores sobre el mismo archivo (dos workers) comparten los contadores."""
+    with tempfile.TemporaryDirectory() as directory:
+        worker_a = make_manager(directory, limit=2)
+        worker_b = make_manager(directory, limit=2)
+        assert worker_a.check_rate_limit("200.1.1.1")
+        assert worker_b.check_rate_limit("200.1.1.1")
+        assert not worker_a.check_rate_limit("200.1.1.1")
+        assert worker_b.check_rate_limit("200.9.9.9")
+
+
+if __name__ == "__main__":
+    try:
+        for test in (test_client_selection, test_spoofed_forwarded_for_is_limited, test_limit_shared_between_processes):
+            test()
+            print(f"✅ {test.__name__[5:]}")
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
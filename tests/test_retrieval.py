@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la búsqueda híbrida (src/retrieval.py): BM25, fusión por rango recíproco
+y armado del contexto con presupuesto de tokens y relevancia mínima.
+
+Uso: python tests/test_retrieval.py
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.retrieval import BM25Index, assemble_context, estimate_tokens, reciprocal_rank_fusion
+
+
+class Doc:
+    def __init__(self, text: str, source: str = "ley.txt"):
+        self.page_content = text
+        self.metadata = {"source": source}
+
+
+def words(count: int, word: str = "palabra") -> str:
+    return " ".join([word] * count)
+
+
+def test_bm25_ranks_lexical_match():
+    index = BM25Index.build([
+        {"id": "a", "text": "pensión alimentaria para hijos menores", "metadata": {}},
+        {"id": "b", "text": "despido sin responsabilidad patronal", "metadata": {}},
+        {"id": "c", "text": "conciliación en materia laboral por despido", "metadata": {}},
+    ])
+    results = index.search("despido", k=3)
+    assert {index.chunks[i]["id"] for i, _ in results} == {"b", "c"}
+    assert index.search("divorcio") == []
+
+
+def test_rrf_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+    keys = [key for key, _ in fused]
+    # "b" aparece en ambas listas y supera al primero de una sola
+    assert keys[0] == "b"
+    assert set(keys) == {"a", "b", "c", "d"}
+    assert dict(fused)["b"] == 1 / 62 + 1 / 61
+    # Solo importan las posiciones
+    assert reciprocal_rank_fusion([["x"]], k=0) == [("x", 1.0)]
+
+
+def test_min_score_keeps_lexical_matches():
+    low = {"relevance": 0.1, "bm25": None}
+    low_lexical = {"relevance": 0.1, "bm25": 3.0}
+    bm25_only = {"relevance": None, "bm25": 2.0}
+    candidates = [(Doc("uno dos", "a"), low), (Doc("tres cuatro", "b"), low_lexical), (Doc("cinco", "c"), bm25_only)]
+    texts = [text for _, text, _ in assemble_context(candidates, token_budget=100, min_score=0.25)]
+    assert texts == ["tres cuatro", "cinco"]
+
+
+def test_budget_and_tail_trim():
+    first, second, third = Doc(words(40), "a"), Doc(words(40, "demanda"), "b"), Doc(words(40, "juzgado"), "c")
+    scores = {"relevance": 0.9}
+    # 40 palabras de 7 letras ≈ 80 tokens; con 130 entra uno entero y el segundo recortado
+    selected = assemble_context([(first, scores), (second, scores), (third, scores)], token_budget=130, min_tail_tokens=20)
+    assert [doc for doc, _, _ in selected] == [first, second]
+    assert selected[1][1].endswith("…")
+    assert sum(estimate_tokens(text) for _, text, _ in selected) <= 130 + 1
+
+    # Si lo que queda no llega a min_tail_tokens, el chunk se omite en lugar de recortarlo
+    selected = assemble_context([(first, scores), (second, scores)], token_budget=100, min_tail_tokens=48)
+    assert [doc for doc, _, _ in selected] == [first]
+
+
+def test_overlap_between_neighbours_is_removed():
+    shared = "el juez fija la cuota provisional de la pensión alimentaria"
+    left = Doc("La demanda se presenta en el juzgado. " + shared)
+    right = Doc(shared + " y el deudor debe pagarla cada mes.")
+    inside = Doc("se presenta en el juzgado")
+    scores = {"relevance": 0.9}
+    selected = assemble_context([(left, scores), (right, scores), (inside, scores)], token_budget=500)
+    assert [doc for doc, _, _ in selected] == [left, right]
+    assert selected[1][1] == "y el deudor debe pagarla cada mes."
+
+    # En archivos distintos no se toca el texto
+    other = Doc(right.page_content, source="otra.txt")
+    selected = assemble_context([(left, scores), (other, scores)], token_budget=500)
+    assert selected[1][1] == other.page_content
+
+
+if __name__ == "__main__":
+    tests = [
+        test_bm25_ranks_lexical_match,
+        test_rrf_rewards_agreement,
+        test_min_score_keeps_lexical_matches,
+        test_budget_and_tail_trim,
+        test_overlap_between_neighbours_is_removed,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Pruebas del cache semántico (src/semantic_cache.py): umbral, scope por ubicación
+y limpieza.
+
+Uso: python tests/test_semantic_cache.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.semantic_cache import SemanticCache
+
+# Dos preguntas casi iguales (coseno ~0.999) y una distinta
+CARTAGO = np.array([1.0, 0.02, 0.0], dtype=np.float32)
+LIMON = np.array([1.0, 0.0, 0.02], dtype=np.float32)
+OTHER = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+
+
+def test_threshold():
+    cache = SemanticCache(max_size=4, threshold=0.95)
+    cache.set(CARTAGO, {"answer": "a"})
+    assert cache.get(LIMON) == {"answer": "a"}
+    assert cache.get(OTHER) is None
+
+
+def test_scope_separates_locations():
+    cache = SemanticCache(max_size=4, threshold=0.95)
+    cache.set(CARTAGO, {"answer": "Cartago"}, scope="Cartago")
+    assert cache.get(LIMON, scope="Limón") is None
+    assert cache.get(LIMON) is None  # sin ubicación tampoco
+    assert cache.get(LIMON, scope="Cartago") == {"answer": "Cartago"}
+
+    cache.set(LIMON, {"answer": "Limón"}, scope="Limón")
+    assert cache.get(CARTAGO, scope="Limón") == {"answer": "Limón"}
+    assert cache.get(CARTAGO, scope="Cartago") == {"answer": "Cartago"}
+
+
+def test_clear():
+    cache = SemanticCache(max_size=4, threshold=0.95)
+    cache.set(CARTAGO, {"answer": "a"}, scope="Cartago")
+    cache.clear()
+    assert cache.get(CARTAGO, scope="Cartago") is None
+    assert cache.stats()["size"] == 0
+
+
+if __name__ == "__main__":
+    tests = [test_threshold, test_scope_separates_locations, test_clear]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Pruebas del single-flight de JudicialBot.ask_async (src/api.py): preguntas idénticas
+concurrentes comparten una sola generación, y cancelar a quien la inició no la
+cancela para los demás.
+
+Uso: python tests/test_single_flight.py
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.api import JudicialBot
+
+QUESTION = "¿Cómo solicito una pensión alimentaria?"
+
+
+async def settle() -> None:
+    """Deja correr las tareas pendientes del event loop."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def make_bot(directory: str) -> JudicialBot:
+    """Bot sin respuestas rápidas cuyo _answer espera a que la prueba lo libere."""
+    bot = JudicialBot(directory)
+    bot.gates = []
+
+    async def no_quick_response(*args):
+        return None
+
+    async def answer(question, history, cache_key, key_class, start_time):
+        gate = asyncio.Event()
+        bot.gates.append(gate)
+        number = len(bot.gates)
+        await gate.wait()
+        return {"answer": f"respuesta {number}", "sources": [], "processing_time": 0.0, "cached": False}
+
+    bot._quick_response = no_quick_response
+    bot._answer = answer
+    return bot
+
+
+def test_identical_questions_share_one_answer():
+    async def run(bot):
+        asks = [asyncio.ensure_future(bot.ask_async(QUESTION)) for _ in range(3)]
+        await settle()
+        assert len(bot.gates) == 1 and bot.coalesced == 2 and len(bot._inflight) == 1
+        bot.gates[0].set()
+        return await asyncio.gather(*asks)
+
+    with tempfile.TemporaryDirectory() as directory:
+        bot = make_bot(directory)
+        responses = asyncio.run(run(bot))
+    assert [response["answer"] for response in responses] == ["respuesta 1"] * 3
+    assert not bot._inflight
+
+
+def test_cancelled_first_caller_does_not_cancel_others():
+    async def run(bot):
+        first = asyncio.ensure_future(bot.ask_async(QUESTION))
+        await settle()
+        second = asyncio.ensure_future(bot.ask_async(QUESTION))
+        await settle()
+        # El cliente que inició la generación se desconecta
+        first.cancel()
+        await settle()
+        assert first.cancelled() and len(bot._inflight) == 1
+        bot.gates[0].set()
+        return await second
+
+    with tempfile.TemporaryDirectory() as directory:
+        bot = make_bot(directory)
+        response = asyncio.run(run(bot))
+    assert response["answer"] == "respuesta 1" and len(bot.gates) == 1
+    assert not bot._inflight
+
+
+def test_clear_during_flight_starts_new_generation():
+    async def run(bot):
+        old = asyncio.ensure_future(bot.ask_async(QUESTION))
+        await settle()
+        # /clear-cache: las preguntas nuevas no se suman a la generación anterior
+        bot._on_cache_cleared()
+        new = asyncio.ensure_future(bot.ask_async(QUESTION))
+        await settle()
+        assert len(bot.gates) == 2 and len(bot._inflight) == 1
+        bot.gates[0].set()
+        assert (await old)["answer"] == "respuesta 1"
+        # La tarea vieja termina sin quitar la nueva de _inflight
+        assert len(bot._inflight) == 1
+        bot.gates[1].set()
+        return await new
+
+    with tempfile.TemporaryDirectory() as directory:
+        bot = make_bot(directory)
+        response = asyncio.run(run(bot))
+    assert response["answer"] == "respuesta 2"
+    assert not bot._inflight
+
+
+if __name__ == "__main__":
+    tests = [
+        test_identical_questions_share_one_answer,
+        test_cancelled_first_caller_does_not_cancel_others,
+        test_clear_during_flight_starts_new_generation,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
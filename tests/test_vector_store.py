@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Pruebas del índice vectorial NumPy (src/vector_store.py): mismo top-k que una búsqueda
+por fuerza bruta, misma escala de relevancia que Chroma y escritura por páginas.
+
+Uso: python tests/test_vector_store.py
+"""
+
+import math
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.vector_store import NumpyVectorStore
+
+
+def corpus(count: int = 50, dim: int = 8, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(count, dim)).astype(np.float32)
+    chunks = [{"id": f"c{i}", "text": f"chunk {i}", "metadata": {"source": "ley.txt"}} for i in range(count)]
+    return embeddings, chunks
+
+
+def test_top_k_matches_brute_force():
+    embeddings, chunks = corpus()
+    store = NumpyVectorStore.build(embeddings, chunks)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = np.random.default_rng(1).normal(size=(5, embeddings.shape[1])).astype(np.float32)
+    for query, results in zip(queries, store.search_batch(queries, k=4)):
+        cosine = normalized @ (query / np.linalg.norm(query))
+        expected = list(np.argsort(-cosine)[:4])
+        assert [idx for idx, _ in results] == expected
+        single = store.search(query, k=4)
+        assert [idx for idx, _ in single] == expected
+        assert [score for _, score in single] == pytest.approx([score for _, score in results], abs=1e-5)
+
+
+def test_relevance_matches_chroma():
+    # Chroma (l2) devuelve la distancia euclidiana al cuadrado y LangChain la pasa a 1 - d / sqrt(2)
+    embeddings, chunks = corpus()
+    store = NumpyVectorStore.build(embeddings, chunks)
+    query = np.ones(embeddings.shape[1], dtype=np.float32)
+    unit_query = query / np.linalg.norm(query)
+    for idx, relevance in store.search(query, k=5):
+        distance = float(np.sum((store.matrix[idx] - unit_query) ** 2))
+        assert relevance == pytest.approx(1.0 - distance / math.sqrt(2), abs=1e-5)
+    # Vector idéntico: distancia 0, relevancia 1
+    assert store.search(embeddings[3], k=1)[0] == (3, pytest.approx(1.0, abs=1e-5))
+
+
+def test_k_larger_than_corpus_and_empty_store():
+    embeddings, chunks = corpus(count=3)
+    store = NumpyVectorStore.build(embeddings, chunks)
+    assert sorted(idx for idx, _ in store.search(embeddings[0], k=10)) == [0, 1, 2]
+    assert NumpyVectorStore.build([], []).search([1.0, 0.0], k=4) == []
+
+
+def test_paged_write_equals_build_and_save():
+    embeddings, chunks = corpus(count=11)
+    pages = [(embeddings[i:i + 4], chunks[i:i + 4]) for i in range(0, 11, 4)]
+    with tempfile.TemporaryDirectory() as directory:
+        built = NumpyVectorStore.build(embeddings, chunks)
+        built.save(str(Path(directory) / "built"))
+        assert NumpyVectorStore.write(str(Path(directory) / "paged"), 11, pages) == 11
+
+        saved = NumpyVectorStore.load(str(Path(directory) / "built"))
+        paged = NumpyVectorStore.load(str(Path(directory) / "paged"))
+        np.testing.assert_allclose(paged.matrix, saved.matrix)
+        assert list(paged.chunks) == list(saved.chunks) == chunks
+        assert [idx for idx, _ in paged.search(embeddings[5], k=3)] == [idx for idx, _ in built.search(embeddings[5], k=3)]
+
+        with pytest.raises(ValueError):
+            NumpyVectorStore.write(str(Path(directory) / "paged"), 12, pages)
+        # Si la escritura falla, el índice anterior queda intacto
+        assert NumpyVectorStore.load(str(Path(directory) / "paged")).count() == 11
+        assert NumpyVectorStore.load(str(Path(directory) / "missing")) is None
+
+
+if __name__ == "__main__":
+    tests = [
+        test_top_k_matches_brute_force,
+        test_relevance_matches_chroma,
+        test_k_larger_than_corpus_and_empty_store,
+        test_paged_write_equals_build_and_save,
+    ]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)